@@ -43,12 +43,15 @@ INSTALLED_APPS = [
     'drf_spectacular',
     'user',
     'recipe',
+    'job',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -81,14 +84,43 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Connections go back to the pool at the end of each request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'MAX_AGE': int(os.environ.get('DB_POOL_MAX_AGE', 1800)),
+        },
     }
 }
 
+# Read replicas of the primary, as a comma separated list of hosts sharing
+# its name and credentials. Test runs mirror them to the primary.
+for number, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')),
+    start=1,
+):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    # Seconds a client keeps reading from the primary after a write
+    'STICKY_SECONDS': int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5)),
+    # Cache holding those clients, it has to be shared by every process
+    'CACHE': os.environ.get('DB_REPLICA_STICKY_CACHE', 'default'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -141,9 +173,69 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+SCHEMA_CACHE = {
+    # Defaults to a digest of the sources, set it to the release instead
+    'VERSION': os.environ.get('APP_VERSION'),
+    'DIR': os.environ.get('SCHEMA_CACHE_DIR', '/vol/web/schema'),
+}
+
+SIGNED_TOKENS = {
+    'ACCESS_TTL': int(os.environ.get('SIGNED_TOKEN_ACCESS_TTL', 300)),
+    'REFRESH_TTL': int(os.environ.get('SIGNED_TOKEN_REFRESH_TTL', 86400)),
+    # Revocations held until their tokens expire, size it for the tokens
+    # revoked or refreshed within REFRESH_TTL
+    'DENYLIST_MAX_SIZE': int(
+        os.environ.get('SIGNED_TOKEN_DENYLIST_MAX_SIZE', 100000)
+    ),
+}
+
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE'),
+}
+
+SEARCH_INDEX = {
+    # Users whose in-process search index is kept when not on PostgreSQL
+    'MAX_USERS': int(os.environ.get('SEARCH_INDEX_MAX_USERS', 1000)),
+}
+
+COMPRESSION = {
+    'MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)),
+    'GZIP_LEVEL': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+    'BROTLI_QUALITY': int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5)),
+    'SKIP_CONTENT_TYPES': [
+        'image/',
+        'video/',
+        'audio/',
+        'application/zip',
+        'application/gzip',
+        'application/octet-stream',
+    ],
+}
+
+JOBS = {
+    'WORKERS': int(os.environ.get('JOBS_WORKERS', 4)),
+    'POLL_INTERVAL': float(os.environ.get('JOBS_POLL_INTERVAL', 1)),
+    'BACKOFF': float(os.environ.get('JOBS_BACKOFF', 5)),
+    'STALE_AFTER': int(os.environ.get('JOBS_STALE_AFTER', 600)),
+    'HEARTBEAT_INTERVAL': float(
+        os.environ.get('JOBS_HEARTBEAT_INTERVAL', 30)
+    ),
+}
@@ -13,18 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView
-)
+from drf_spectacular.views import SpectacularSwaggerView
 
 from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+
+from core.views import CachedSpectacularAPIView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    path(
+        'api/schema/',
+        CachedSpectacularAPIView.as_view(),
+        name='api-schema',
+    ),
     path(
         'api/docs/',
         SpectacularSwaggerView.as_view(url_name='api-schema'),
@@ -32,6 +36,7 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('api/job/', include('job.urls')),
 ]
 
 if settings.DEBUG:
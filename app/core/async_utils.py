@@ -0,0 +1,22 @@
+"""
+Helpers for async views
+"""
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    """Wrap func to run in a worker thread from async code
+
+    Unlike sync_to_async's default, calls aren't serialized on one thread,
+    so concurrent requests query the database in parallel. The worker's
+    connection is released afterwards like at the end of a request.
+    """
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
@@ -0,0 +1,30 @@
+"""
+Registry and timing helpers for benchmarks
+"""
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+registry = {}
+
+
+def register(func):
+    """Register a benchmark under its function name"""
+    registry[func.__name__] = func
+    return func
+
+
+def measure(func, repeat):
+    """Return the best time in seconds and the queries of one run"""
+    best = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best, len(ctx)
@@ -0,0 +1,82 @@
+"""
+Benchmarks for the core components
+"""
+from collections import OrderedDict
+from io import BytesIO
+
+from django.db import connections
+from django.db.utils import load_backend
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmark import register, measure
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+def _recipe_page(size):
+    """Return a recipe list page shaped like the API's responses"""
+    return OrderedDict([
+        ('next', 'http://testserver/api/recipe/recipes/?cursor=cD0xMDA%3D'),
+        ('previous', None),
+        ('results', [
+            OrderedDict([
+                ('id', i),
+                ('title', f'Recipe {i} crème brûlée'),
+                ('time_minutes', 30),
+                ('price', '12.50'),
+                ('link', f'https://example.com/recipes/{i}'),
+                ('tags', [
+                    OrderedDict([('id', tag), ('name', f'Tag {tag}')])
+                    for tag in range(3)
+                ]),
+                ('ingredients', [
+                    OrderedDict([('id', ing), ('name', f'Ingredient {ing}')])
+                    for ing in range(8)
+                ]),
+            ])
+            for i in range(size)
+        ]),
+    ])
+
+
+@register
+def json_rendering(report, repeat):
+    """Compare DRF's JSON renderer and parser with the fast ones"""
+    for size in [100, 1000]:
+        page = _recipe_page(size)
+        body = JSONRenderer().render(page)
+        for label, renderer, parser in [
+            ('json', JSONRenderer(), JSONParser()),
+            ('fast', FastJSONRenderer(), FastJSONParser()),
+        ]:
+            seconds, queries = measure(lambda: renderer.render(page), repeat)
+            report(f'render {label} ({size} recipes)', seconds, queries)
+            seconds, queries = measure(
+                lambda: parser.parse(BytesIO(body)),
+                repeat,
+            )
+            report(f'parse {label} ({size} recipes)', seconds, queries)
+
+
+@register
+def db_connection(report, repeat):
+    """Compare opening a connection per request with the pooled backend"""
+    settings_dict = connections['default'].settings_dict
+    if settings_dict['ENGINE'] != 'core.db.backends.postgresql':
+        return
+    for label, engine in [
+        ('new connection', 'django.db.backends.postgresql'),
+        ('pooled', settings_dict['ENGINE']),
+    ]:
+        backend = load_backend(engine)
+
+        def request():
+            wrapper = backend.DatabaseWrapper(settings_dict, 'default')
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            wrapper.close()
+
+        seconds, queries = measure(request, repeat)
+        report(f'connect and query ({label})', seconds, queries)
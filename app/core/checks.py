@@ -0,0 +1,33 @@
+"""
+System checks for the core settings
+"""
+from django.conf import settings
+from django.core import checks
+
+# Cache backends only visible to the process that wrote them
+PROCESS_LOCAL_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+@checks.register(checks.Tags.database, checks.Tags.caches)
+def check_replica_sticky_cache(app_configs, **kwargs):
+    """Warn when replica stickiness is kept in a per-process cache"""
+    config = settings.DATABASE_REPLICAS
+    if not config['ALIASES']:
+        return []
+
+    alias = config['CACHE']
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+
+    return [checks.Warning(
+        f'DATABASE_REPLICAS CACHE {alias!r} uses {backend}, which other '
+        'processes cannot see, so a read served by another worker after '
+        'a write may hit a lagging replica.',
+        hint='Point DB_REPLICA_STICKY_CACHE at a shared cache such as the '
+             'database, Redis or Memcached.',
+        id='core.W001',
+    )]
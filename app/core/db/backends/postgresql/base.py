@@ -0,0 +1,124 @@
+"""
+PostgreSQL backend taking its connections from a shared pool
+"""
+import weakref
+
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import PoolTimeout, close_pools, get_pool
+
+
+Database = base.Database
+
+
+def connect(conn_params, isolation_level=None):
+    """Open a psycopg2 connection set up like Django's backend does
+
+    The client encoding is UTF8 from the start, as Django sets it, so that
+    DISCARD ALL on release keeps it.
+    """
+    connection = Database.connect(**{'client_encoding': 'UTF8', **conn_params})
+    if (
+        isolation_level is not None and
+        isolation_level != connection.isolation_level
+    ):
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection,
+        loads=lambda x: x,
+    )
+
+    return connection
+
+
+def reset_session(connection):
+    """Roll back and discard the session state a connection was left with
+
+    DISCARD ALL drops temporary tables, prepared statements, advisory locks
+    and settings changed with SET, so none of them reach the next user.
+    """
+    try:
+        connection.rollback()
+        autocommit = connection.autocommit
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('DISCARD ALL')
+        finally:
+            connection.autocommit = autocommit
+    except Exception:
+        return False
+
+    return connection.get_parameter_status('client_encoding') == (
+        connection.encoding
+    )
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Close pooled connections before dropping a test database"""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL wrapper returning connections to a pool when closed
+
+    Connections are shared by all the threads of the process through one
+    pool per database, configured with the POOL entry of the database
+    settings. Closing the wrapper, as Django does at the end of each
+    request when CONN_MAX_AGE is 0, hands the connection back instead of
+    closing it. Released connections are reset with DISCARD ALL. A wrapper
+    garbage collected without being closed, such as the one of a finished
+    thread, closes its connection to free the pool slot.
+    """
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        """Return the pool of connections opened with conn_params"""
+        options = self.settings_dict.get('POOL', {})
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        key = '{}@{}:{}/{}'.format(
+            conn_params.get('user', ''),
+            conn_params.get('host', ''),
+            conn_params.get('port', ''),
+            conn_params['database'],
+        )
+        return get_pool(
+            key,
+            lambda: connect(conn_params, isolation_level),
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 30),
+            max_age=options.get('MAX_AGE'),
+            reset=reset_session,
+        )
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        try:
+            connection = self.pool.acquire()
+        except PoolTimeout as error:
+            raise Database.OperationalError(str(error)) from error
+        self._release_on_finalize = weakref.finalize(
+            self,
+            self.pool.release,
+            connection,
+            reuse=False,
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level',
+            connection.isolation_level,
+        )
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self._release_on_finalize.detach()
+            with self.wrap_database_errors:
+                self.pool.release(
+                    self.connection,
+                    reuse=not self.in_atomic_block,
+                )
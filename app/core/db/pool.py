@@ -0,0 +1,196 @@
+"""
+Thread safe pool of DB-API connections shared by worker threads
+"""
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection is free before the pool timeout"""
+
+
+def check_connection(conn):
+    """Return if conn still answers queries"""
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+        conn.rollback()
+    except Exception:
+        return False
+
+    return True
+
+
+def reset_connection(conn):
+    """Roll back what a connection left open, return if it can be reused"""
+    try:
+        conn.rollback()
+    except Exception:
+        return False
+
+    return True
+
+
+class ConnectionPool:
+    """Bounded pool handing out connections made by connect
+
+    At most max_size connections are checked out or idle at once, callers
+    wait up to timeout seconds for a free slot. Idle connections are checked
+    with check before they are reused and reset with reset when released,
+    connections failing either, or older than max_age seconds, are closed
+    and replaced by new ones.
+    """
+
+    def __init__(
+        self,
+        connect,
+        max_size=10,
+        timeout=30,
+        max_age=None,
+        check=check_connection,
+        reset=reset_connection,
+    ):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check = check
+        self.reset = reset
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._created_at = {}
+        self._in_use = set()
+        self._metrics = {
+            'created': 0,
+            'reused': 0,
+            'evicted': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def acquire(self):
+        """Return a healthy connection, waiting for a free slot"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count('timeouts')
+            raise PoolTimeout(
+                f'No connection free after {self.timeout}s'
+                f' ({self.max_size} in use)'
+            )
+        self._count('wait_seconds', time.monotonic() - started)
+
+        try:
+            conn = self._reuse_idle()
+            if conn is None:
+                conn = self.connect()
+                self._count('created')
+                with self._lock:
+                    self._created_at[id(conn)] = time.monotonic()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use.add(id(conn))
+
+        return conn
+
+    def release(self, conn, reuse=True):
+        """Return conn to the pool, closing it unless it can be reused"""
+        with self._lock:
+            if id(conn) not in self._in_use:
+                return
+            self._in_use.remove(id(conn))
+
+        try:
+            if reuse and not self._expired(conn) and self.reset(conn):
+                with self._lock:
+                    self._idle.append(conn)
+            else:
+                self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Return the pool size and counters"""
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                **self._metrics,
+            }
+
+    def _reuse_idle(self):
+        """Return the most recently released healthy connection if any"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn = self._idle.pop()
+            if not self._expired(conn) and self.check(conn):
+                self._count('reused')
+                return conn
+            self._discard(conn)
+
+    def _expired(self, conn):
+        """Return if conn is older than max_age"""
+        return self.max_age is not None and (
+            time.monotonic() - self._created_at.get(id(conn), 0)
+            >= self.max_age
+        )
+
+    def _discard(self, conn):
+        """Close conn and forget it"""
+        self._count('evicted')
+        with self._lock:
+            self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _count(self, metric, value=1):
+        """Add value to a counter"""
+        with self._lock:
+            self._metrics[metric] += value
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, **options):
+    """Return the pool for key, creating it with connect and options"""
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(connect, **options)
+
+        return _pools[key]
+
+
+def close_pools():
+    """Close the idle connections of every pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Return the stats of every pool by key"""
+    with _pools_lock:
+        return {key: pool.stats() for key, pool in _pools.items()}
@@ -0,0 +1,90 @@
+"""
+Database routers
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_read_alias():
+    """Return the alias reads are routed to, None for the default"""
+    return _read_alias.get()
+
+
+def set_read_alias(alias):
+    """Route reads to alias, return a token for reset_read_alias"""
+    return _read_alias.set(alias)
+
+
+def reset_read_alias(token):
+    """Restore the alias reads were routed to before set_read_alias"""
+    _read_alias.reset(token)
+
+
+@contextmanager
+def read_from(alias):
+    """Route the reads made inside the block to alias"""
+    token = set_read_alias(alias)
+    try:
+        yield
+    finally:
+        reset_read_alias(token)
+
+
+def _sticky_key(user_id):
+    """Return the cache key marking user_id as reading from the primary"""
+    return f'db-primary:user:{user_id}'
+
+
+def stick_to_primary(user_id):
+    """Keep user_id reading from the primary for the sticky window"""
+    config = settings.DATABASE_REPLICAS
+    if config['ALIASES']:
+        caches[config['CACHE']].set(
+            _sticky_key(user_id),
+            True,
+            timeout=config['STICKY_SECONDS'],
+        )
+
+
+def read_primary_if_sticky(user_id):
+    """Read from the primary for the rest of the request if user_id wrote"""
+    if get_read_alias() is None:
+        return
+    cache = caches[settings.DATABASE_REPLICAS['CACHE']]
+    if cache.get(_sticky_key(user_id)) is not None:
+        set_read_alias(None)
+
+
+class ReplicaRouter:
+    """Route reads to the replica picked for the request, writes to primary
+
+    Reads only go to a replica inside read_from(), which ReplicaMiddleware
+    uses for safe requests. Writes always go to the primary, even for
+    instances that were loaded from a replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        return get_read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS['ALIASES']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS['ALIASES']:
+            return False
+
+        return None
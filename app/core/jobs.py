@@ -0,0 +1,277 @@
+"""
+Background jobs queued in the database and run by worker threads
+"""
+import contextvars
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job, JobStep
+
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+def register(name, max_attempts=3):
+    """Register the decorated function as the handler of name jobs"""
+    def decorator(func):
+        registry[name] = (func, max_attempts)
+        return func
+
+    return decorator
+
+
+def enqueue(name, payload=None, user=None, delay=0):
+    """Queue a job, it is only visible to workers once committed"""
+    if name not in registry:
+        raise ValueError(f'Unknown job {name}')
+
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        max_attempts=registry[name][1],
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempts):
+    """Return the delay in seconds before retrying a failed attempt"""
+    return settings.JOBS['BACKOFF'] * 2 ** (attempts - 1)
+
+
+def claim():
+    """Mark the next due job as running and return it
+
+    The attempt is counted as the job is claimed, so a job that kills its
+    worker still uses up its attempts.
+    """
+    while True:
+        with transaction.atomic():
+            due = Job.objects.filter(
+                status=Job.QUEUED,
+                run_at__lte=timezone.now(),
+            ).order_by('run_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            job = due.only('pk').first()
+            if job is None:
+                return None
+            started_at = timezone.now()
+            claimed = Job.objects.filter(
+                pk=job.pk,
+                status=Job.QUEUED,
+            ).update(
+                status=Job.RUNNING,
+                attempts=F('attempts') + 1,
+                started_at=started_at,
+                heartbeat_at=started_at,
+            )
+        if claimed:
+            return Job.objects.get(pk=job.pk)
+
+
+def run(job):
+    """Run a claimed job, queueing a retry with backoff when it fails"""
+    handler = registry.get(job.name, (None, None))[0]
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for {job.name}')
+        token = _current_job.set(job)
+        try:
+            with transaction.atomic():
+                job.result = handler(**job.payload)
+        finally:
+            _current_job.reset(token)
+    except Exception:
+        logger.exception('Job %s failed on attempt %d', job, job.attempts)
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=backoff(job.attempts)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.SUCCEEDED
+        job.last_error = ''
+        job.finished_at = timezone.now()
+
+    job.save(update_fields=[
+        'result',
+        'last_error',
+        'status',
+        'run_at',
+        'finished_at',
+    ])
+
+    return job
+
+
+def run_step(name, func, *args, **kwargs):
+    """Call func unless the running job already completed step name
+
+    The step is recorded in the transaction of the job, so it only counts
+    as done once the job commits, and a retry or a second worker running
+    the same job skips it instead of repeating side effects.
+    """
+    job = _current_job.get()
+    if job is None:
+        return func(*args, **kwargs)
+
+    try:
+        with transaction.atomic():
+            JobStep.objects.create(job_id=job.pk, name=name)
+    except IntegrityError:
+        logger.info('Skipping step %s of job %s, it already ran', name, job)
+        return None
+
+    return func(*args, **kwargs)
+
+
+def beat(job_ids):
+    """Record that the running jobs job_ids are still alive"""
+    if not job_ids:
+        return 0
+
+    return Job.objects.filter(
+        pk__in=job_ids,
+        status=Job.RUNNING,
+    ).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale():
+    """Queue again running jobs whose worker stopped sending heartbeats
+
+    Stale jobs that used up their attempts fail instead, so a job killing
+    its worker isn't retried forever. Returns how many jobs were handled.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=now - timedelta(
+            seconds=settings.JOBS['STALE_AFTER']
+        ),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        finished_at=now,
+        last_error='The worker stopped while running the job.',
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED,
+        run_at=now,
+    )
+
+    return failed + requeued
+
+
+def run_pending(limit=None):
+    """Run due jobs in the current thread and return how many ran"""
+    count = 0
+    while limit is None or count < limit:
+        job = claim()
+        if job is None:
+            break
+        run(job)
+        count += 1
+
+    return count
+
+
+class Worker:
+    """Pool of threads running queued jobs"""
+
+    def __init__(self, workers=None, poll_interval=None):
+        self.workers = workers or settings.JOBS['WORKERS']
+        self.poll_interval = poll_interval or settings.JOBS['POLL_INTERVAL']
+        self.heartbeat_interval = settings.JOBS['HEARTBEAT_INTERVAL']
+        self.processed = 0
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._finished = threading.Event()
+
+    def run(self, once=False):
+        """Process jobs until stopped, or until the queue is empty"""
+        requeue_stale()
+        self._finished.clear()
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        try:
+            if self.workers == 1:
+                self._loop(once)
+                return self.processed
+
+            with ThreadPoolExecutor(self.workers) as pool:
+                threads = [
+                    pool.submit(self._thread_loop, once)
+                    for _ in range(self.workers)
+                ]
+                try:
+                    for thread in threads:
+                        thread.result()
+                except KeyboardInterrupt:
+                    self.stop()
+                    raise
+        finally:
+            self._finished.set()
+            heartbeat.join()
+
+        return self.processed
+
+    def stop(self):
+        """Let running jobs finish and stop claiming new ones"""
+        self._stopped.set()
+
+    def _heartbeat(self):
+        """Keep running jobs alive and requeue those of dead workers"""
+        try:
+            while not self._finished.wait(self.heartbeat_interval):
+                with self._lock:
+                    running = list(self._running)
+                try:
+                    beat(running)
+                    requeue_stale()
+                except Exception:
+                    logger.exception('Sending job heartbeats failed')
+        finally:
+            connection.close()
+
+    def _thread_loop(self, once):
+        """Process jobs on a thread owning its database connection"""
+        try:
+            self._loop(once)
+        finally:
+            connection.close()
+
+    def _loop(self, once):
+        """Claim and run jobs, waiting for new ones when idle"""
+        while not self._stopped.is_set():
+            job = claim()
+            if job is None:
+                if once:
+                    return
+                self._stopped.wait(self.poll_interval)
+                continue
+            with self._lock:
+                self._running.add(job.pk)
+            try:
+                run(job)
+            finally:
+                with self._lock:
+                    self._running.discard(job.pk)
+                    self.processed += 1
@@ -0,0 +1,38 @@
+"""
+Django command to run the registered benchmarks
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.module_loading import autodiscover_modules
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Run benchmarks inside a transaction that is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks to run')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        autodiscover_modules('benchmarks')
+        names = options['names'] or sorted(benchmark.registry)
+        unknown = set(names) - set(benchmark.registry)
+        if unknown:
+            raise CommandError(
+                f'Unknown benchmarks: {", ".join(sorted(unknown))}'
+            )
+
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            with transaction.atomic():
+                benchmark.registry[name](self._report, options['repeat'])
+                transaction.set_rollback(True)
+
+    def _report(self, label, seconds, queries):
+        """Write one benchmark result line"""
+        self.stdout.write(
+            f'  {label:<40} {seconds * 1000:10.2f} ms {queries:6d} queries'
+        )
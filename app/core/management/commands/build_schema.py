@@ -0,0 +1,31 @@
+"""
+Django command to generate the OpenAPI schema for the current code version
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import code_version, schema_cache
+from core.views import CachedSpectacularAPIView
+
+
+class Command(BaseCommand):
+    help = 'Generate the schema files served by the schema view'
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        if not settings.SCHEMA_CACHE['DIR']:
+            raise CommandError('SCHEMA_CACHE["DIR"] is not set.')
+
+        view = CachedSpectacularAPIView()
+        schema = view.generate_schema()
+        formats = set()
+        for renderer_class in view.renderer_classes:
+            renderer = renderer_class()
+            if renderer.format in formats:
+                continue
+            formats.add(renderer.format)
+            self.stdout.write(f'Wrote {schema_cache.build(renderer, schema)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built the schema for version {code_version()}'
+        ))
@@ -0,0 +1,71 @@
+"""
+Django command to move uploaded files into content addressed storage
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import VARIANTS, generate_variants, variant_name
+
+
+CONTENT_NAME = re.compile(r'[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.?\w*$')
+
+
+class Command(BaseCommand):
+    help = 'Move uploaded images stored under legacy names to their digest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the files that would be moved',
+        )
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        uploads = (
+            (Recipe, 'image', True),
+            (get_user_model(), 'profile_image', False),
+        )
+        for model, field, has_variants in uploads:
+            moved, missing = self.migrate_field(
+                model, field, has_variants, options['dry_run'],
+            )
+            verb = 'Would move' if options['dry_run'] else 'Moved'
+            self.stdout.write(self.style.SUCCESS(
+                f'{verb} {moved} {model.__name__}.{field} files'
+                f' ({missing} missing)'
+            ))
+
+    def migrate_field(self, model, field, has_variants, dry_run):
+        """Re-store every legacy named file of model.field"""
+        moved = missing = 0
+        rows = model.objects.exclude(**{field: ''}).exclude(
+            **{f'{field}__isnull': True}
+        ).only('pk', field)
+        for row in rows.iterator():
+            file = getattr(row, field)
+            if CONTENT_NAME.search(file.name):
+                continue
+            storage = file.storage
+            if not storage.exists(file.name):
+                missing += 1
+                continue
+            moved += 1
+            if dry_run:
+                continue
+
+            old_name = file.name
+            with storage.open(old_name) as content:
+                new_name = storage.save(old_name, content)
+            model.objects.filter(pk=row.pk).update(**{field: new_name})
+            storage.delete(old_name)
+            if has_variants:
+                for variant in VARIANTS:
+                    storage.delete(variant_name(old_name, variant))
+                file.name = new_name
+                generate_variants(file)
+
+        return moved, missing
@@ -0,0 +1,37 @@
+"""
+Django command to run queued background jobs
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of worker threads',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is due instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        worker = Worker(workers=options['workers'])
+        signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+        self.stdout.write(f'Running jobs on {worker.workers} workers')
+        try:
+            processed = worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+            processed = worker.processed
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs'))
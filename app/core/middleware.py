@@ -0,0 +1,296 @@
+"""
+Middleware for the APIs
+"""
+import asyncio
+import hashlib
+import random
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from core.db.routers import (
+    get_read_alias,
+    read_from,
+    reset_read_alias,
+    set_read_alias,
+    stick_to_primary,
+)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+def accepted_encodings(header):
+    """Return the encodings of an Accept-Encoding header and their q"""
+    encodings = {}
+    for part in header.split(','):
+        name, *params = [value.strip() for value in part.split(';')]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[name.lower()] = quality
+
+    return encodings
+
+
+class GzipCompressor:
+    """Incremental gzip compressor"""
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    """Incremental brotli compressor"""
+
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with brotli or gzip as the client accepts
+
+    Responses smaller than MIN_SIZE, responses that are already encoded
+    and content types listed in SKIP_CONTENT_TYPES are sent as they are.
+    Streaming responses are compressed chunk by chunk and flushed after
+    every chunk so clients keep receiving data. ETags are weakened since
+    the body no longer matches the identity representation.
+    """
+
+    def process_response(self, request, response):
+        config = settings.COMPRESSION
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').lower()
+        if any(
+            content_type.startswith(prefix)
+            for prefix in config['SKIP_CONTENT_TYPES']
+        ):
+            return response
+        if not response.streaming and len(response.content) < max(
+            config['MIN_SIZE'], 1,
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding, compressor = self._negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+        if compressor is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self._compress_stream(
+                response.streaming_content,
+                compressor,
+            )
+            del response['Content-Length']
+        else:
+            compressed = compressor.compress(response.content)
+            compressed += compressor.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+
+        return response
+
+    def _negotiate(self, header):
+        """Return the preferred accepted encoding and a compressor
+
+        The client's highest q-value wins, ties go to brotli over gzip.
+        """
+        config = settings.COMPRESSION
+        encodings = accepted_encodings(header)
+        wildcard = encodings.get('*', 0)
+        available = ['gzip'] if brotli is None else ['br', 'gzip']
+        quality = {
+            encoding: encodings.get(encoding, wildcard)
+            for encoding in available
+        }
+        encoding = max(available, key=quality.get)
+        if quality[encoding] <= 0:
+            return None, None
+        if encoding == 'br':
+            return 'br', BrotliCompressor(config['BROTLI_QUALITY'])
+
+        return 'gzip', GzipCompressor(config['GZIP_LEVEL'])
+
+    def _compress_stream(self, chunks, compressor):
+        """Yield the compressed chunks of a streaming response"""
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """Read from a replica during GET and HEAD requests
+
+    Each safe request reads from one replica picked at random, including
+    while its response is streamed, other requests use the primary. After
+    a successful write, its user and session keep reading from the primary
+    for STICKY_SECONDS so they see their own writes while replicas catch
+    up. Sessions are known before the view runs, API users only once they
+    are authenticated, see read_primary_if_sticky(). The markers live in
+    the DATABASE_REPLICAS CACHE, which has to be shared by every worker
+    process, check core.W001 warns about per-process caches.
+
+    The replica is selected and restored around get_response in the same
+    context, under ASGI too, where the hooks of MiddlewareMixin would each
+    run in a context of their own.
+    """
+    safe_methods = ('GET', 'HEAD')
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        token = self._select_replica(self._replica_for(request))
+        try:
+            response = self.get_response(request)
+            alias = get_read_alias()
+        finally:
+            self._restore(token)
+
+        return self._finish(request, response, alias)
+
+    async def __acall__(self, request):
+        replica = await sync_to_async(
+            self._replica_for,
+            thread_sensitive=True,
+        )(request)
+        token = self._select_replica(replica)
+        try:
+            response = await self.get_response(request)
+            alias = get_read_alias()
+        finally:
+            self._restore(token)
+
+        return await sync_to_async(
+            self._finish,
+            thread_sensitive=True,
+        )(request, response, alias)
+
+    def _replica_for(self, request):
+        """Return the replica the request reads from, None for the primary"""
+        config = settings.DATABASE_REPLICAS
+        if (
+            config['ALIASES'] and
+            request.method in self.safe_methods and
+            not self._is_sticky(request)
+        ):
+            return random.choice(config['ALIASES'])
+
+        return None
+
+    def _select_replica(self, replica):
+        """Route reads to replica, return the token restoring the routing"""
+        if replica is None:
+            return None
+
+        return set_read_alias(replica)
+
+    def _restore(self, token):
+        """Route reads back to where they went before _select_replica"""
+        if token is not None:
+            reset_read_alias(token)
+
+    def _finish(self, request, response, alias):
+        """Keep streaming from alias and remember successful writes"""
+        if alias is not None and response.streaming:
+            response.streaming_content = self._stream_from(
+                alias,
+                response.streaming_content,
+            )
+        if (
+            request.method not in self.safe_methods and
+            response.status_code < 400
+        ):
+            self._stick(request, response)
+
+        return response
+
+    def _stream_from(self, alias, chunks):
+        """Keep reading from alias while the response is streamed"""
+        chunks = iter(chunks)
+        while True:
+            with read_from(alias):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def _session_key(self, session_key):
+        """Return the cache key of a session, None without one"""
+        if not session_key:
+            return None
+        digest = hashlib.sha256(session_key.encode()).hexdigest()
+
+        return f'db-primary:session:{digest}'
+
+    def _is_sticky(self, request):
+        """Return if the client's session wrote recently"""
+        key = self._session_key(
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+        )
+        cache = caches[settings.DATABASE_REPLICAS['CACHE']]
+
+        return key is not None and cache.get(key) is not None
+
+    def _stick(self, request, response):
+        """Keep the writing user and session on the primary for a while"""
+        config = settings.DATABASE_REPLICAS
+        if not config['ALIASES']:
+            return
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            stick_to_primary(user.pk)
+        cookie = response.cookies.get(settings.SESSION_COOKIE_NAME)
+        key = self._session_key(
+            cookie.value if cookie is not None
+            else request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        if key is not None:
+            caches[config['CACHE']].set(
+                key,
+                True,
+                timeout=config['STICKY_SECONDS'],
+            )
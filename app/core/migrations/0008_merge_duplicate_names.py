@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-17 07:00
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a user and name into one row"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in [('Tag', 'tags'), ('Ingredient', 'ingredients')]:
+        Model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        item_column = f'{model_name.lower()}_id'
+        duplicates = Model.objects.values('user', 'name').annotate(
+            keep_id=Min('id'),
+            total=Count('id'),
+        ).filter(total__gt=1)
+        for duplicate in duplicates:
+            merged_ids = list(Model.objects.filter(
+                user=duplicate['user'],
+                name=duplicate['name'],
+            ).exclude(id=duplicate['keep_id']).values_list('id', flat=True))
+            linked = set(through.objects.filter(
+                **{item_column: duplicate['keep_id']},
+            ).values_list('recipe_id', flat=True))
+            moved = through.objects.filter(**{f'{item_column}__in': merged_ids})
+            for recipe_id in moved.values_list('recipe_id', flat=True):
+                if recipe_id not in linked:
+                    through.objects.create(
+                        recipe_id=recipe_id,
+                        **{item_column: duplicate['keep_id']},
+                    )
+                    linked.add(recipe_id)
+            moved.delete()
+            Model.objects.filter(id__in=merged_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_user_profile_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
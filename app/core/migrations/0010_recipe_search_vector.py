@@ -0,0 +1,144 @@
+# Generated by Django 3.2.25 on 2026-10-17 09:30
+
+from django.db import migrations
+
+
+FORWARD_SQL = [
+    'ALTER TABLE core_recipe ADD COLUMN search_vector tsvector',
+    '''
+    CREATE FUNCTION core_recipe_search_vector(
+        recipe_id bigint,
+        title text,
+        description text
+    ) RETURNS tsvector LANGUAGE sql STABLE AS $$
+        SELECT setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(t.name, ' ')
+                FROM core_tag t
+                JOIN core_recipe_tags rt ON rt.tag_id = t.id
+                WHERE rt.recipe_id = $1
+            ), '')), 'B')
+            || setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(i.name, ' ')
+                FROM core_ingredient i
+                JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+                WHERE ri.recipe_id = $1
+            ), '')), 'B')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    $$
+    ''',
+    '''
+    CREATE FUNCTION core_recipe_search_vector_row() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := core_recipe_search_vector(
+            NEW.id, NEW.title, NEW.description
+        );
+        RETURN NEW;
+    END
+    $$
+    ''',
+    '''
+    CREATE TRIGGER core_recipe_search_vector_row
+    BEFORE INSERT OR UPDATE OF title, description ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_recipe_search_vector_row()
+    ''',
+    '''
+    CREATE FUNCTION core_recipe_search_vector_links() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE core_recipe
+        SET search_vector = core_recipe_search_vector(id, title, description)
+        WHERE id IN (SELECT recipe_id FROM changed_links);
+        RETURN NULL;
+    END
+    $$
+    ''',
+    '''
+    CREATE FUNCTION core_recipe_search_vector_names() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE core_recipe
+        SET search_vector = core_recipe_search_vector(id, title, description)
+        WHERE id IN (
+            SELECT recipe_id FROM core_recipe_tags
+            WHERE TG_TABLE_NAME = 'core_tag' AND tag_id = NEW.id
+            UNION
+            SELECT recipe_id FROM core_recipe_ingredients
+            WHERE TG_TABLE_NAME = 'core_ingredient' AND ingredient_id = NEW.id
+        );
+        RETURN NULL;
+    END
+    $$
+    ''',
+    'CREATE INDEX core_recipe_search_vector_idx '
+    'ON core_recipe USING gin (search_vector)',
+    'UPDATE core_recipe '
+    'SET search_vector = core_recipe_search_vector(id, title, description)',
+]
+
+for table in ['core_recipe_tags', 'core_recipe_ingredients']:
+    FORWARD_SQL += [
+        f'''
+        CREATE TRIGGER {table}_search_vector_insert
+        AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS changed_links
+        FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_search_vector_links()
+        ''',
+        f'''
+        CREATE TRIGGER {table}_search_vector_delete
+        AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS changed_links
+        FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_search_vector_links()
+        ''',
+    ]
+
+for table in ['core_tag', 'core_ingredient']:
+    FORWARD_SQL.append(f'''
+        CREATE TRIGGER {table}_search_vector_names
+        AFTER UPDATE OF name ON {table}
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION core_recipe_search_vector_names()
+    ''')
+
+REVERSE_SQL = [
+    'DROP TRIGGER core_tag_search_vector_names ON core_tag',
+    'DROP TRIGGER core_ingredient_search_vector_names ON core_ingredient',
+    'DROP TRIGGER core_recipe_tags_search_vector_insert ON core_recipe_tags',
+    'DROP TRIGGER core_recipe_tags_search_vector_delete ON core_recipe_tags',
+    'DROP TRIGGER core_recipe_ingredients_search_vector_insert '
+    'ON core_recipe_ingredients',
+    'DROP TRIGGER core_recipe_ingredients_search_vector_delete '
+    'ON core_recipe_ingredients',
+    'DROP TRIGGER core_recipe_search_vector_row ON core_recipe',
+    'DROP FUNCTION core_recipe_search_vector_names()',
+    'DROP FUNCTION core_recipe_search_vector_links()',
+    'DROP FUNCTION core_recipe_search_vector_row()',
+    'DROP FUNCTION core_recipe_search_vector(bigint, text, text)',
+    'ALTER TABLE core_recipe DROP COLUMN search_vector',
+]
+
+
+def run_on_postgresql(statements):
+    """Return a migration function executing statements on PostgreSQL"""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(FORWARD_SQL),
+            run_on_postgresql(REVERSE_SQL),
+        ),
+    ]
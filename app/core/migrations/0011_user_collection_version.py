@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='collection_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
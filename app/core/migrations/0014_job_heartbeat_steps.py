@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-17 08:39
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def backfill_heartbeats(apps, schema_editor):
+    """Count running jobs as last seen when they were started"""
+    Job = apps.get_model('core', 'Job')
+    Job.objects.filter(status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            backfill_heartbeats,
+            migrations.RunPython.noop,
+        ),
+        migrations.CreateModel(
+            name='JobStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.job')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='jobstep',
+            constraint=models.UniqueConstraint(fields=('job', 'name'), name='unique_job_step'),
+        ),
+    ]
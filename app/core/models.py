@@ -6,12 +6,15 @@ import os
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core.storage import content_addressed_storage
+
 
 def profile_image_file_path(instance, file_name):
     """Generate file path for uploaded image"""
@@ -51,6 +54,76 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def deferred(self, user_id, missing_error=None):
+        """Return the user with user_id without querying the database
+
+        Every field but the id is deferred and loaded in one query the
+        first time one of them is read, or before the user is saved. If
+        the user no longer exists then, missing_error is raised instead of
+        DoesNotExist when it is given.
+        """
+        user = self.model.from_db(self.db, ['id'], [user_id])
+        user._load_deferred_together = True
+        user._missing_error = missing_error
+
+        return user
+
+    def get_collection_version(self, user_id):
+        """Return the version of a user's recipe collection"""
+        return self.filter(pk=user_id).values_list(
+            'collection_version',
+            flat=True,
+        ).first()
+
+    def bump_collection_version(self, user_id):
+        """Mark a user's recipe collection as changed"""
+        self.filter(pk=user_id).update(
+            collection_version=models.F('collection_version') + 1,
+        )
+
+
+class RecipeAttrManager(models.Manager):
+    """Manager for items attached to recipes by name"""
+
+    def get_or_create_names(self, user, names):
+        """Return a name to id map, creating the missing names in bulk"""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+
+        name_ids = dict(
+            self.filter(user=user, name__in=names).values_list('name', 'id')
+        )
+        missing = [name for name in names if name not in name_ids]
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            name_ids.update(
+                self.filter(
+                    user=user,
+                    name__in=missing,
+                ).values_list('name', 'id')
+            )
+
+        return name_ids
+
+    def rename(self, user, names):
+        """Rename the user's items by id in one UPDATE"""
+        if not names:
+            return 0
+
+        return self.filter(user=user, pk__in=names).update(
+            name=models.Case(
+                *[
+                    models.When(pk=pk, then=models.Value(name))
+                    for pk, name in names.items()
+                ],
+                output_field=models.CharField(),
+            )
+        )
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """user model"""
@@ -60,13 +133,39 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     profile_image = models.ImageField(
         null=True,
-        upload_to=profile_image_file_path
+        upload_to=profile_image_file_path,
+        storage=content_addressed_storage,
     )
+    collection_version = models.PositiveBigIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def refresh_from_db(self, using=None, fields=None):
+        """Reload fields, loading every deferred field of deferred users"""
+        if not getattr(self, '_load_deferred_together', False):
+            return super().refresh_from_db(using=using, fields=fields)
+
+        if fields is not None:
+            fields = list(set(fields) | self.get_deferred_fields())
+        try:
+            super().refresh_from_db(using=using, fields=fields)
+        except self.DoesNotExist:
+            if self._missing_error is None:
+                raise
+            raise self._missing_error
+
+    def save(self, *args, **kwargs):
+        """Save the user, loading the fields of deferred users first"""
+        deferred_fields = self.get_deferred_fields()
+        if deferred_fields and getattr(
+            self, '_load_deferred_together', False
+        ):
+            self.refresh_from_db(fields=list(deferred_fields))
+
+        super().save(*args, **kwargs)
+
 
 class Recipe(models.Model):
     """Recipe Model"""
@@ -81,7 +180,16 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=content_addressed_storage,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ]
 
     def __str__(self):
         """Overriding the str opperator"""
@@ -96,6 +204,16 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_user_name',
+            ),
+        ]
+
     def __str__(self):
         """Overriding the str opperator"""
         return self.name
@@ -109,6 +227,102 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_user_name',
+            ),
+        ]
+
     def __str__(self):
         """Overriding the str opperator"""
         return self.name
+
+
+class StoredFile(models.Model):
+    """Reference count of a content addressed file"""
+    name = models.CharField(max_length=255, primary_key=True)
+    reference_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """Overriding the str opperator"""
+        return self.name
+
+
+class Job(models.Model):
+    """Background job queued in the database"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        """Overriding the str opperator"""
+        return f'{self.name} #{self.pk}'
+
+
+class JobStep(models.Model):
+    """Step of a job that already ran, so retries don't run it again"""
+    job = models.ForeignKey(Job, on_delete=models.CASCADE)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['job', 'name'],
+                name='unique_job_step',
+            ),
+        ]
+
+    def __str__(self):
+        """Overriding the str opperator"""
+        return f'{self.job} {self.name}'
+
+
+class ImportCheckpoint(models.Model):
+    """Rows of an import file committed so far, saved with those rows"""
+    name = models.CharField(max_length=1024, unique=True)
+    rows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """Overriding the str opperator"""
+        return f'{self.name} ({self.rows} rows)'
@@ -0,0 +1,91 @@
+"""
+Renderers for the APIs
+"""
+import re
+
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# orjson writes exponents without a sign, 1e16 where json writes 1e+16
+EXPONENT_RE = re.compile(rb'e[-0-9]')
+NUMBER_CHARS = b'-.0123456789'
+BEFORE_VALUE = b':,['
+
+
+def _has_reformatted_floats(ret):
+    """Return if orjson may have written a float unlike json in ret
+
+    json switches to exponents below 1e-4 and from 1e16, orjson writes
+    0.00001 and 1e16 instead. Matches inside strings are only false
+    positives, which cost a render with json.
+    """
+    if b'0.0000' in ret:
+        return True
+    for match in EXPONENT_RE.finditer(ret):
+        start = index = match.start()
+        while index and ret[index - 1] in NUMBER_CHARS:
+            index -= 1
+        if index < start and (not index or ret[index - 1] in BEFORE_VALUE):
+            return True
+
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer encoding with orjson when it is installed
+
+    The output is byte for byte what JSONRenderer produces for compact
+    responses. Values orjson does not encode the same way, such as
+    Decimal, datetimes and lazy strings, are handed to DRF's encoder.
+    Integers wider than 64 bits and floats orjson formats differently
+    make the whole response fall back to JSONRenderer, as do indented
+    output and a missing orjson. The one exception is NaN and infinity,
+    which render as null where JSONRenderer raises ValueError.
+    """
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into compact JSON"""
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data,
+                accepted_media_type,
+                renderer_context,
+            )
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder.default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS
+                    | orjson.OPT_PASSTHROUGH_DATETIME
+                ),
+            )
+        except orjson.JSONEncodeError:
+            ret = None
+        if ret is None or _has_reformatted_floats(ret):
+            return super().render(
+                data,
+                accepted_media_type,
+                renderer_context,
+            )
+
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029',
+            )
+
+        return ret
@@ -0,0 +1,136 @@
+"""
+OpenAPI schema generated once per code version and kept in memory and on disk
+"""
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+import django
+import drf_spectacular
+import rest_framework
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+CachedSchema = namedtuple('CachedSchema', ['content', 'gzipped', 'etag'])
+
+
+@lru_cache(maxsize=None)
+def source_digest():
+    """Return a digest of the project's sources and schema libraries"""
+    digest = hashlib.sha256()
+    for package in [django, rest_framework, drf_spectacular]:
+        digest.update(f'{package.__name__}=={package.__version__}\n'.encode())
+    base_dir = Path(settings.BASE_DIR)
+    for path in sorted(base_dir.rglob('*.py')):
+        relative = path.relative_to(base_dir)
+        if {'tests', 'migrations'} & set(relative.parts):
+            continue
+        digest.update(str(relative).encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()[:16]
+
+
+def code_version():
+    """Return SCHEMA_CACHE['VERSION'], or a digest of the sources"""
+    return settings.SCHEMA_CACHE['VERSION'] or source_digest()
+
+
+class SchemaCache:
+    """Rendered schemas by code version and renderer format
+
+    A schema missing from memory is read from SCHEMA_CACHE['DIR'], where
+    build_schema or an earlier process left it, and is only generated when
+    it isn't there either. A new code version has no file yet, so its
+    schema is generated again.
+    """
+
+    def __init__(self):
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def get(self, renderer, generate):
+        """Return the schema rendered by renderer, generating it if needed"""
+        key = self._key(renderer)
+        schema = self._schemas.get(key)
+        if schema is not None:
+            return schema
+
+        with self._lock:
+            if key not in self._schemas:
+                content = self._read(key)
+                if content is None:
+                    content = renderer.render(generate(), renderer.media_type)
+                    try:
+                        self._write(key, content)
+                    except OSError:
+                        logger.warning('Could not save %s', self.path(key))
+                self._remember(key, content)
+
+            return self._schemas[key]
+
+    def build(self, renderer, data):
+        """Render and save the schema data, return the file written"""
+        key = self._key(renderer)
+        content = renderer.render(data, renderer.media_type)
+        self._write(key, content)
+        with self._lock:
+            self._remember(key, content)
+
+        return self.path(key)
+
+    def clear(self):
+        """Forget the schemas held in memory"""
+        with self._lock:
+            self._schemas.clear()
+
+    def path(self, key):
+        """Return the file of the schema for key, None without a directory"""
+        directory = settings.SCHEMA_CACHE['DIR']
+        if not directory:
+            return None
+        version, renderer_format = key
+
+        return os.path.join(directory, f'schema-{version}.{renderer_format}')
+
+    def _key(self, renderer):
+        """Return the cache key of the renderer's schema"""
+        return code_version(), renderer.format
+
+    def _remember(self, key, content):
+        """Keep content and its gzip encoding in memory"""
+        self._schemas[key] = CachedSchema(
+            content,
+            gzip.compress(content, compresslevel=9),
+            '"%s"' % hashlib.sha256(content).hexdigest()[:32],
+        )
+
+    def _read(self, key):
+        """Return the content of the schema file for key if it exists"""
+        path = self.path(key)
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def _write(self, key, content):
+        """Write the schema file for key atomically"""
+        path = self.path(key)
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+            file.write(content)
+        os.replace(file.name, path)
+
+
+schema_cache = SchemaCache()
@@ -0,0 +1,127 @@
+"""
+Content addressed file storage
+"""
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files by the SHA-256 of their content
+
+    A file saved as 'uploads/recipe/<anything>.jpg' is stored as
+    'uploads/recipe/ab/cd/<digest>.jpg', sharded on the first digest
+    characters so no directory grows without bound. Identical content is
+    stored once and reference counted in StoredFile; deleting a name only
+    removes the file once its last reference is released. Saves and
+    deletes of one digest are serialized by locking its StoredFile row
+    until the file has been moved into place or removed.
+    """
+
+    def content_name(self, name, digest):
+        """Return the sharded storage name for content with digest"""
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+
+        return os.path.join(directory, digest[:2], digest[2:4], digest + ext)
+
+    def _write_temporary(self, directory, content, digest=None):
+        """Write content to a temporary file in directory, hashing it"""
+        directory = self.path(directory)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                if digest is not None:
+                    digest.update(chunk)
+                tmp.write(chunk)
+
+        return tmp.name
+
+    def _move_into_place(self, tmp_path, name, overwrite=False):
+        """Atomically move a temporary file to name unless it exists"""
+        full_path = self.path(name)
+        if not overwrite and os.path.exists(full_path):
+            os.remove(tmp_path)
+            return
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(tmp_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def _save(self, name, content):
+        """Hash content while writing it and store it under its digest"""
+        digest = hashlib.sha256()
+        directory = os.path.dirname(name)
+        tmp_path = self._write_temporary(directory, content, digest)
+        try:
+            name = self.content_name(name, digest.hexdigest())
+            with transaction.atomic():
+                self._add_reference(name)
+                self._move_into_place(tmp_path, name)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return name
+
+    def save_derived(self, name, content, overwrite=False):
+        """Store content derived from a stored file under a fixed name
+
+        An existing file is kept unless overwrite is set, in which case it
+        is atomically replaced.
+        """
+        if overwrite or not self.exists(name):
+            tmp_path = self._write_temporary(os.path.dirname(name), content)
+            self._move_into_place(tmp_path, name, overwrite=overwrite)
+
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        """Keep the requested name, the stored name comes from content"""
+        return name
+
+    def delete(self, name):
+        """Release a reference to name, deleting the last one"""
+        StoredFile = apps.get_model('core', 'StoredFile')
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(
+                name=name,
+            ).first()
+            if stored is not None and stored.reference_count > 1:
+                stored.reference_count = F('reference_count') - 1
+                stored.save(update_fields=['reference_count'])
+                return
+            if stored is not None:
+                stored.delete()
+            super().delete(name)
+
+    def _add_reference(self, name):
+        """Count one more reference to name, locking its row"""
+        StoredFile = apps.get_model('core', 'StoredFile')
+        while True:
+            stored = StoredFile.objects.select_for_update().filter(
+                name=name,
+            ).first()
+            if stored is not None:
+                stored.reference_count = F('reference_count') + 1
+                stored.save(update_fields=['reference_count'])
+                return
+            try:
+                with transaction.atomic():
+                    StoredFile.objects.create(name=name, reference_count=1)
+                return
+            except IntegrityError:
+                continue
+
+
+content_addressed_storage = ContentAddressedStorage()
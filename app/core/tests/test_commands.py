@@ -1,13 +1,24 @@
 """
 Test for Custom django commands
 """
+import os
+from decimal import Decimal
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
+from PIL import Image
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Recipe, Tag
+from core.storage import content_addressed_storage
+from recipe.images import VARIANTS, release_image, variant_name
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -31,3 +42,82 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkCommandTests(TestCase):
+    """Tests for the benchmark command"""
+
+    def test_run_benchmark(self):
+        """Test running a benchmark reports results and rolls back"""
+        out = StringIO()
+
+        call_command('benchmark', 'tag_resolution', repeat=1, stdout=out)
+
+        self.assertIn('batched (100 items)', out.getvalue())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_unknown_benchmark_error(self):
+        """Test running an unknown benchmark raises an error"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark', 'does_not_exist')
+
+
+class MigrateUploadsCommandTests(TestCase):
+    """Tests for the migrate_uploads command"""
+
+    def setUp(self):
+        self.storage = content_addressed_storage
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='PNG')
+        self.legacy = 'uploads/recipe/legacy.png'
+        os.makedirs(os.path.dirname(self.storage.path(self.legacy)),
+                    exist_ok=True)
+        with open(self.storage.path(self.legacy), 'wb') as f:
+            f.write(buffer.getvalue())
+        self.storage.save_derived(
+            variant_name(self.legacy, 'thumbnail'), ContentFile(b'old'),
+        )
+        user = get_user_model().objects.create_user(email='test@example.com')
+        self.recipe = Recipe.objects.create(
+            user=user,
+            title='Sample Recipe',
+            time_minutes=5,
+            price=Decimal('5.00'),
+            image=self.legacy,
+        )
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        release_image(self.storage, self.recipe.image.name)
+        release_image(self.storage, self.legacy)
+
+    def test_migrate_legacy_upload(self):
+        """Test a legacy named upload is moved to its digest name"""
+        out = StringIO()
+
+        call_command('migrate_uploads', stdout=out)
+        call_command('migrate_uploads', stdout=out)
+
+        self.recipe.refresh_from_db()
+        name = self.recipe.image.name
+        self.assertNotEqual(name, self.legacy)
+        self.assertTrue(self.storage.exists(name))
+        self.assertFalse(self.storage.exists(self.legacy))
+        self.assertFalse(self.storage.exists(
+            variant_name(self.legacy, 'thumbnail')
+        ))
+        for variant in VARIANTS:
+            self.assertTrue(self.storage.exists(variant_name(name, variant)))
+        self.assertIn('Moved 1 Recipe.image files', out.getvalue())
+        self.assertIn('Moved 0 Recipe.image files', out.getvalue())
+
+    def test_migrate_dry_run(self):
+        """Test a dry run leaves legacy uploads in place"""
+        out = StringIO()
+
+        call_command('migrate_uploads', dry_run=True, stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, self.legacy)
+        self.assertTrue(self.storage.exists(self.legacy))
+        self.assertIn('Would move 1 Recipe.image files', out.getvalue())
@@ -0,0 +1,220 @@
+"""
+Tests for the database connection pool
+"""
+import gc
+import sqlite3
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+def connect():
+    """Open an in memory SQLite connection usable from any thread"""
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the generic connection pool"""
+
+    def test_connection_reused(self):
+        """Test a released connection is handed out again"""
+        pool = ConnectionPool(connect, max_size=2)
+
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(), conn)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['in_use'], 1)
+        self.assertEqual(stats['idle'], 0)
+
+    def test_broken_connection_evicted(self):
+        """Test idle connections failing the health check are replaced"""
+        pool = ConnectionPool(connect, max_size=2)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()
+
+        new_conn = pool.acquire()
+
+        self.assertIsNot(new_conn, conn)
+        self.assertEqual(new_conn.execute('SELECT 1').fetchone(), (1,))
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['reused'], 0)
+        self.assertEqual(stats['evicted'], 1)
+
+    def test_failed_reset_evicted(self):
+        """Test connections that can't be reset are closed on release"""
+        pool = ConnectionPool(connect, reset=lambda conn: False)
+        conn = pool.acquire()
+
+        pool.release(conn)
+
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['evicted'], 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+    def test_release_without_reuse(self):
+        """Test connections released with reuse=False are closed"""
+        pool = ConnectionPool(connect)
+        conn = pool.acquire()
+
+        pool.release(conn, reuse=False)
+
+        self.assertIsNot(pool.acquire(), conn)
+
+    def test_release_rolls_back(self):
+        """Test uncommitted work is rolled back before reuse"""
+        pool = ConnectionPool(connect, max_size=1)
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE item (name TEXT)')
+        conn.commit()
+        conn.execute("INSERT INTO item VALUES ('pending')")
+
+        pool.release(conn)
+        conn = pool.acquire()
+
+        self.assertEqual(conn.execute('SELECT * FROM item').fetchall(), [])
+
+    def test_max_age(self):
+        """Test connections older than max_age are not reused"""
+        pool = ConnectionPool(connect, max_age=60)
+        with patch('core.db.pool.time.monotonic', return_value=0):
+            conn = pool.acquire()
+            pool.release(conn)
+
+        with patch('core.db.pool.time.monotonic', return_value=61):
+            self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['evicted'], 1)
+
+    def test_bounded(self):
+        """Test acquiring from a full pool times out"""
+        pool = ConnectionPool(connect, max_size=1, timeout=0.01)
+        conn = pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a connect error doesn't use up a slot"""
+        calls = []
+
+        def flaky_connect():
+            calls.append(1)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError('unreachable')
+            return connect()
+
+        pool = ConnectionPool(flaky_connect, max_size=1, timeout=0.01)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire()
+        self.assertIsNotNone(pool.acquire())
+
+    def test_shared_by_threads(self):
+        """Test threads share a bounded set of connections"""
+        pool = ConnectionPool(connect, max_size=3)
+
+        def use_connection(i):
+            conn = pool.acquire()
+            try:
+                return conn.execute('SELECT ?', [i]).fetchone()[0]
+            finally:
+                pool.release(conn)
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(use_connection, range(200)))
+
+        self.assertEqual(results, list(range(200)))
+        stats = pool.stats()
+        self.assertLessEqual(stats['created'], 3)
+        self.assertEqual(stats['created'] + stats['reused'], 200)
+        self.assertEqual(stats['in_use'], 0)
+
+
+@unittest.skipUnless(
+    settings.DATABASES['default']['ENGINE'] == 'core.db.backends.postgresql',
+    'The pooled PostgreSQL backend is not configured',
+)
+class PooledBackendTests(TestCase):
+    """Test the pooled PostgreSQL backend"""
+
+    def _connection(self):
+        """Return a new wrapper for the default database"""
+        wrapper = connections.create_connection('default')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_connection_reused(self):
+        """Test closing a wrapper returns its connection to the pool"""
+        first = self._connection()
+        raw = first.connection
+        first.close()
+
+        second = self._connection()
+
+        self.assertIs(second.connection, raw)
+        with second.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_broken_connection_evicted(self):
+        """Test a connection closed while idle is not handed out"""
+        first = self._connection()
+        raw = first.connection
+        first.close()
+        raw.close()
+
+        second = self._connection()
+
+        self.assertIsNot(second.connection, raw)
+        with second.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_session_state_discarded(self):
+        """Test settings and temporary tables don't outlive a release"""
+        first = self._connection()
+        raw = first.connection
+        with first.cursor() as cursor:
+            cursor.execute("SET application_name TO 'leaked'")
+            cursor.execute('CREATE TEMPORARY TABLE leaked (id int)')
+        first.close()
+
+        second = self._connection()
+
+        self.assertIs(second.connection, raw)
+        with second.cursor() as cursor:
+            cursor.execute('SHOW application_name')
+            self.assertNotEqual(cursor.fetchone(), ('leaked',))
+            cursor.execute("SELECT to_regclass('pg_temp.leaked')")
+            self.assertEqual(cursor.fetchone(), (None,))
+            cursor.execute('SELECT %s', ['Crème'])
+            self.assertEqual(cursor.fetchone(), ('Crème',))
+
+    def test_unclosed_wrapper_frees_slot(self):
+        """Test a wrapper collected without being closed frees its slot"""
+        wrapper = connections.create_connection('default')
+        wrapper.ensure_connection()
+        pool = wrapper.pool
+        in_use = pool.stats()['in_use']
+
+        del wrapper
+        gc.collect()
+
+        self.assertEqual(pool.stats()['in_use'], in_use - 1)
@@ -0,0 +1,245 @@
+"""
+Tests for the background jobs
+"""
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job, JobStep
+
+
+calls = []
+steps = []
+
+
+@jobs.register('test.record', max_attempts=2)
+def record(value):
+    calls.append(value)
+    return {'value': value}
+
+
+@jobs.register('test.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('Job failed')
+
+
+@jobs.register('test.step', max_attempts=2)
+def step(value, fail=False):
+    jobs.run_step('record', steps.append, value)
+    if fail:
+        raise RuntimeError('Job failed')
+
+
+@jobs.register('test.wait')
+def wait():
+    started.set()
+    release.wait(5)
+
+
+started = threading.Event()
+release = threading.Event()
+
+
+@override_settings(JOBS={
+    'WORKERS': 2,
+    'POLL_INTERVAL': 0.01,
+    'BACKOFF': 10,
+    'STALE_AFTER': 60,
+    'HEARTBEAT_INTERVAL': 60,
+})
+class JobTests(TestCase):
+    """Test queueing and running jobs"""
+
+    def setUp(self):
+        calls.clear()
+        steps.clear()
+
+    def test_run_job(self):
+        """Test a queued job runs and stores its result"""
+        job = jobs.enqueue('test.record', {'value': 1})
+
+        self.assertEqual(jobs.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [1])
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.result, {'value': 1})
+        self.assertIsNotNone(job.finished_at)
+
+    def test_enqueue_unknown_job_error(self):
+        """Test queueing a job without a handler raises an error"""
+        with self.assertRaises(ValueError):
+            jobs.enqueue('test.unknown')
+
+    def test_delayed_job_not_due(self):
+        """Test a delayed job is not run before it is due"""
+        jobs.enqueue('test.record', {'value': 1}, delay=60)
+
+        self.assertEqual(jobs.run_pending(), 0)
+        self.assertEqual(calls, [])
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test a failed job is queued again after a backoff"""
+        job = jobs.enqueue('test.fail')
+        before = timezone.now()
+
+        with self.assertLogs('core.jobs', level='ERROR'):
+            jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Job failed', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+
+    def test_job_fails_after_max_attempts(self):
+        """Test a job is marked failed once its attempts are used up"""
+        job = jobs.enqueue('test.fail')
+
+        with self.assertLogs('core.jobs', level='ERROR') as logs:
+            jobs.run_pending()
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_backoff_doubles(self):
+        """Test the retry delay doubles with every attempt"""
+        self.assertEqual(
+            [jobs.backoff(attempt) for attempt in (1, 2, 3)],
+            [10, 20, 40],
+        )
+
+    def test_requeue_stale_jobs(self):
+        """Test jobs left running by a dead worker are queued again"""
+        job = Job.objects.create(
+            name='test.record',
+            payload={'value': 1},
+            status=Job.RUNNING,
+            started_at=timezone.now() - timedelta(minutes=5),
+            heartbeat_at=timezone.now() - timedelta(minutes=5),
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_stale_job_out_of_attempts_failed(self):
+        """Test a job that killed its worker on every attempt fails"""
+        job = Job.objects.create(
+            name='test.record',
+            payload={'value': 1},
+            status=Job.RUNNING,
+            attempts=2,
+            max_attempts=2,
+            started_at=timezone.now() - timedelta(minutes=5),
+            heartbeat_at=timezone.now() - timedelta(minutes=5),
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_claim_counts_attempt(self):
+        """Test an attempt counts as soon as the job is claimed"""
+        job = jobs.enqueue('test.record', {'value': 1})
+
+        claimed = jobs.claim()
+
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.attempts, 1)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+
+    def test_long_running_job_not_requeued(self):
+        """Test a job started long ago but still beating keeps running"""
+        job = Job.objects.create(
+            name='test.record',
+            payload={'value': 1},
+            status=Job.RUNNING,
+            started_at=timezone.now() - timedelta(minutes=5),
+            heartbeat_at=timezone.now() - timedelta(minutes=5),
+        )
+
+        self.assertEqual(jobs.beat([job.pk]), 1)
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+    def test_rerun_job_skips_completed_steps(self):
+        """Test a job run again doesn't repeat a step that committed"""
+        job = jobs.enqueue('test.step', {'value': 1})
+        jobs.run_pending()
+        Job.objects.filter(pk=job.pk).update(status=Job.QUEUED)
+
+        self.assertEqual(jobs.run_pending(), 1)
+
+        self.assertEqual(steps, [1])
+        self.assertEqual(JobStep.objects.filter(job=job).count(), 1)
+
+    def test_failed_job_steps_rerun(self):
+        """Test the steps of a failed attempt run again on retry"""
+        job = jobs.enqueue('test.step', {'value': 1, 'fail': True})
+        jobs.run_pending()
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+        jobs.run_pending()
+
+        self.assertEqual(steps, [1, 1])
+        self.assertFalse(JobStep.objects.filter(job=job).exists())
+
+    def test_run_step_outside_job(self):
+        """Test a step called outside of a job just runs"""
+        jobs.run_step('record', steps.append, 1)
+        jobs.run_step('record', steps.append, 2)
+
+        self.assertEqual(steps, [1, 2])
+
+    def test_worker_sends_heartbeats(self):
+        """Test the worker beats for its running jobs while they run"""
+        started.clear()
+        release.clear()
+        job = jobs.enqueue('test.wait')
+        worker = jobs.Worker(workers=1)
+        worker.heartbeat_interval = 0.01
+        beats = []
+
+        def record_beat(job_ids):
+            beats.append(job_ids)
+            release.set()
+
+        with patch('core.jobs.beat', side_effect=record_beat), \
+                patch('core.jobs.requeue_stale') as requeue_stale:
+            worker.run(once=True)
+
+        self.assertIn([job.pk], beats)
+        self.assertGreater(requeue_stale.call_count, 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+
+    def test_run_workers_once(self):
+        """Test the run_workers command drains due jobs and exits"""
+        jobs.enqueue('test.record', {'value': 1})
+        jobs.enqueue('test.record', {'value': 2})
+        out = StringIO()
+
+        call_command('run_workers', workers=1, once=True, stdout=out)
+
+        self.assertEqual(calls, [1, 2])
+        self.assertIn('Processed 2 jobs', out.getvalue())
@@ -0,0 +1,208 @@
+"""
+Tests for the response compression middleware
+"""
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import middleware
+from core.middleware import CompressionMiddleware, accepted_encodings
+from core.models import Recipe
+
+
+COMPRESSION = {
+    'MIN_SIZE': 200,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'SKIP_CONTENT_TYPES': ['image/', 'application/zip'],
+}
+
+BODY = json.dumps([{'id': i, 'title': 'Recipe'} for i in range(50)]).encode()
+
+
+@override_settings(COMPRESSION=COMPRESSION)
+@patch('core.middleware.brotli', None)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test compressing responses"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _process(self, response, accept='gzip, deflate'):
+        """Run response through the middleware for a request accepting"""
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compress_gzip(self):
+        """Test large responses are compressed with gzip"""
+        res = self._process(
+            HttpResponse(BODY, content_type='application/json'),
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertEqual(gzip.decompress(res.content), BODY)
+
+    def test_small_response_not_compressed(self):
+        """Test responses under MIN_SIZE are sent as they are"""
+        res = self._process(
+            HttpResponse(b'{"id": 1}', content_type='application/json'),
+        )
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'{"id": 1}')
+
+    def test_skipped_content_types(self):
+        """Test already compressed media is not compressed again"""
+        for content_type in ['image/png', 'application/zip']:
+            res = self._process(HttpResponse(BODY, content_type=content_type))
+
+            self.assertFalse(res.has_header('Content-Encoding'))
+            self.assertEqual(res.content, BODY)
+
+    def test_encoded_response_not_compressed(self):
+        """Test responses with a Content-Encoding are left alone"""
+        response = HttpResponse(BODY, content_type='application/json')
+        response['Content-Encoding'] = 'identity'
+
+        res = self._process(response)
+
+        self.assertEqual(res['Content-Encoding'], 'identity')
+        self.assertEqual(res.content, BODY)
+
+    def test_encoding_not_accepted(self):
+        """Test responses are not compressed unless the client accepts it"""
+        for accept in ['', 'identity', 'gzip;q=0', 'br, *;q=0']:
+            res = self._process(
+                HttpResponse(BODY, content_type='application/json'),
+                accept=accept,
+            )
+
+            self.assertFalse(res.has_header('Content-Encoding'))
+            self.assertEqual(res['Vary'], 'Accept-Encoding')
+            self.assertEqual(res.content, BODY)
+
+    def test_etag_weakened(self):
+        """Test strong ETags become weak for compressed responses"""
+        response = HttpResponse(BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+
+        res = self._process(response)
+
+        self.assertEqual(res['ETag'], 'W/"abc"')
+
+    def test_compress_streaming(self):
+        """Test streaming responses are compressed chunk by chunk"""
+        chunks = [BODY[:100], BODY[100:], b'']
+        response = StreamingHttpResponse(
+            iter(chunks),
+            content_type='application/x-ndjson',
+        )
+        response['Content-Length'] = str(len(BODY))
+
+        res = self._process(response)
+        compressed = list(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        self.assertGreater(len(compressed), 1)
+        self.assertEqual(gzip.decompress(b''.join(compressed)), BODY)
+
+    def test_gzip_level(self):
+        """Test the gzip level comes from the settings"""
+        with override_settings(COMPRESSION={**COMPRESSION, 'GZIP_LEVEL': 1}):
+            fast = self._process(
+                HttpResponse(BODY * 20, content_type='application/json'),
+            )
+        best = self._process(
+            HttpResponse(BODY * 20, content_type='application/json'),
+        )
+
+        self.assertEqual(gzip.decompress(fast.content), BODY * 20)
+        self.assertGreater(len(fast.content), len(best.content))
+
+    def test_accepted_encodings(self):
+        """Test parsing Accept-Encoding with quality values"""
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, BR , identity;q=0, *;q=bad'),
+            {'gzip': 0.5, 'br': 1.0, 'identity': 0.0, '*': 0.0},
+        )
+
+
+@unittest.skipUnless(middleware.brotli, 'brotli is not installed')
+@override_settings(COMPRESSION=COMPRESSION)
+class BrotliCompressionTests(SimpleTestCase):
+    """Test compressing responses with brotli"""
+
+    def test_prefer_brotli(self):
+        """Test brotli is used when the client accepts it"""
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        response = HttpResponse(BODY, content_type='application/json')
+
+        res = CompressionMiddleware(lambda request: response)(request)
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(res.content), BODY)
+
+    def test_highest_quality_wins(self):
+        """Test the client's q-values decide, ties prefer brotli"""
+        for header, encoding in [
+            ('br;q=0.1, gzip;q=1.0', 'gzip'),
+            ('gzip;q=0.5, *;q=0.8', 'br'),
+            ('br;q=0, *', 'gzip'),
+            ('gzip;q=0.5, br;q=0.5', 'br'),
+        ]:
+            with self.subTest(header=header):
+                request = RequestFactory().get(
+                    '/',
+                    HTTP_ACCEPT_ENCODING=header,
+                )
+                response = HttpResponse(BODY, content_type='application/json')
+
+                res = CompressionMiddleware(lambda request: response)(request)
+
+                self.assertEqual(res['Content-Encoding'], encoding)
+
+
+@override_settings(COMPRESSION=COMPRESSION)
+@patch('core.middleware.brotli', None)
+class CompressedExportTests(TestCase):
+    """Test compressing the streaming recipe export"""
+
+    def test_export_compressed(self):
+        """Test the export streams gzip compressed NDJSON"""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password',
+        )
+        for i in range(10):
+            Recipe.objects.create(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=5,
+            )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(
+            reverse('recipe:recipe-export'),
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        content = gzip.decompress(b''.join(res.streaming_content))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            [json.loads(line)['title'] for line in content.splitlines()],
+            [f'Recipe {i}' for i in range(10)],
+        )
@@ -0,0 +1,135 @@
+"""
+Tests for the JSON renderer and parser
+"""
+import datetime
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+PAYLOAD = OrderedDict([
+    ('next', 'http://testserver/api/recipe/recipes/?cursor=cD0x'),
+    ('previous', None),
+    ('results', [
+        OrderedDict([
+            ('id', 1),
+            ('title', 'Crème brûlée   "quoted"'),
+            ('price', Decimal('5.50')),
+            ('created', datetime.datetime(
+                2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc,
+            )),
+            ('day', datetime.date(2024, 1, 2)),
+            ('label', gettext_lazy('Recipe')),
+            ('uuid', uuid.UUID('12345678123456781234567812345678')),
+            ('tags', [{'id': 2, 'name': 'Vegan'}]),
+            ('ratio', 0.1),
+            ('published', True),
+        ]),
+    ]),
+])
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the fast JSON renderer"""
+
+    def test_render_matches_json_renderer(self):
+        """Test the rendered bytes match DRF's JSONRenderer"""
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD, 'application/json'),
+            JSONRenderer().render(PAYLOAD, 'application/json'),
+        )
+
+    def test_render_without_orjson(self):
+        """Test rendering falls back to json without orjson"""
+        with patch('core.renderers.orjson', None):
+            rendered = FastJSONRenderer().render(PAYLOAD, 'application/json')
+
+        self.assertEqual(
+            rendered,
+            JSONRenderer().render(PAYLOAD, 'application/json'),
+        )
+
+    def test_render_indented(self):
+        """Test indented media types are rendered by JSONRenderer"""
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD, media_type),
+            JSONRenderer().render(PAYLOAD, media_type),
+        )
+
+    def test_render_numbers_matches_json_renderer(self):
+        """Test floats and integers orjson writes differently match DRF"""
+        for value in [
+            1e16, -1e16, 1.5e300, 1e-05, 5e-324, 0.0001, 1e15, 0.1, -0.0,
+            2 ** 64, -2 ** 63 - 1, 2 ** 63 - 1,
+        ]:
+            for data in [value, [value], {'ratio': value}, {'a': [1, value]}]:
+                with self.subTest(data=data):
+                    self.assertEqual(
+                        FastJSONRenderer().render(data),
+                        JSONRenderer().render(data),
+                    )
+
+    def test_render_exponent_like_strings(self):
+        """Test strings resembling floats don't change the output"""
+        data = {'image': '/media/ab/1e5/0e-3.jpg', 'title': '1e16'}
+        expected = JSONRenderer().render(data)
+
+        with patch.object(JSONRenderer, 'render', side_effect=AssertionError):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_render_nan_as_null(self):
+        """Test NaN and infinity render as null instead of raising"""
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'ratio': float('nan')})
+
+        self.assertEqual(
+            FastJSONRenderer().render(
+                {'ratio': float('nan'), 'limit': float('inf')},
+            ),
+            b'{"ratio":null,"limit":null}',
+        )
+
+    def test_render_none(self):
+        """Test rendering no data returns an empty body"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the fast JSON parser"""
+
+    def test_parse(self):
+        """Test parsing matches DRF's JSONParser"""
+        body = '{"title":"Crème","price":"5.50","tags":[{"name":"a"}]}'
+
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(body.encode())),
+            JSONParser().parse(BytesIO(body.encode())),
+        )
+
+    def test_parse_without_orjson(self):
+        """Test parsing falls back to json without orjson"""
+        with patch('core.parsers.orjson', None):
+            data = FastJSONParser().parse(BytesIO(b'{"id": 1}'))
+
+        self.assertEqual(data, {'id': 1})
+
+    def test_parse_invalid_error(self):
+        """Test invalid JSON and NaN raise a parse error"""
+        for body in [b'{"id": ', b'{"price": NaN}']:
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError):
+                    FastJSONParser().parse(BytesIO(body))
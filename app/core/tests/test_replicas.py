@@ -0,0 +1,422 @@
+"""
+Tests for read replica routing
+"""
+import unittest
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db.routers import (
+    get_read_alias,
+    read_from,
+    read_primary_if_sticky,
+    stick_to_primary,
+)
+from core.checks import check_replica_sticky_cache
+from core.middleware import ReplicaMiddleware
+from core.models import Recipe
+
+
+REPLICAS = {
+    'ALIASES': ['replica'],
+    'STICKY_SECONDS': 5,
+    'CACHE': 'default',
+}
+
+
+class ReplicaCacheCheckTests(SimpleTestCase):
+    """Test the check of the cache keeping clients on the primary"""
+
+    def test_local_cache_warning(self):
+        """Test a per-process sticky cache is reported with replicas"""
+        with override_settings(
+            DATABASE_REPLICAS=REPLICAS,
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }},
+        ):
+            errors = check_replica_sticky_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.W001'])
+
+    def test_shared_cache_or_no_replicas(self):
+        """Test shared caches, and setups without replicas, pass"""
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache',
+        }}
+        with override_settings(DATABASE_REPLICAS=REPLICAS, CACHES=shared):
+            self.assertEqual(check_replica_sticky_cache(None), [])
+
+        with override_settings(
+            DATABASE_REPLICAS={**REPLICAS, 'ALIASES': []},
+        ):
+            self.assertEqual(check_replica_sticky_cache(None), [])
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the replica router"""
+
+    def test_reads_default_outside_requests(self):
+        """Test reads go to the primary unless a replica is selected"""
+        self.assertEqual(Recipe.objects.all().db, 'default')
+
+    def test_read_from(self):
+        """Test reads go to the selected replica"""
+        with read_from('replica'):
+            self.assertEqual(Recipe.objects.all().db, 'replica')
+
+        self.assertIsNone(get_read_alias())
+
+    def test_writes_go_to_primary(self):
+        """Test instances loaded from a replica are saved to the primary"""
+        recipe = Recipe()
+        recipe._state.db = 'replica'
+
+        with read_from('replica'):
+            self.assertEqual(
+                router.db_for_write(Recipe, instance=recipe),
+                'default',
+            )
+
+    def test_relations_allowed(self):
+        """Test relations between primary and replica instances"""
+        first, second = Recipe(), Recipe()
+        first._state.db, second._state.db = 'default', 'replica'
+
+        self.assertTrue(router.allow_relation(first, second))
+
+    def test_no_migrations_on_replicas(self):
+        """Test migrations only run on the primary"""
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertTrue(router.allow_migrate('default', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    """Test routing the reads of requests"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _read_db(self, method, user_id=1, status=200, cookies=None):
+        """Return the database a view reads from for a request
+
+        The view authenticates user_id like the API's authentication
+        classes do, None leaves the request anonymous.
+        """
+        seen = []
+
+        def view(request):
+            if user_id is not None:
+                request.user = get_user_model()(pk=user_id)
+                read_primary_if_sticky(user_id)
+            seen.append(Recipe.objects.all().db)
+            return HttpResponse(status=status)
+
+        request = getattr(self.factory, method.lower())('/')
+        request.COOKIES.update(cookies or {})
+        ReplicaMiddleware(view)(request)
+
+        return seen[0]
+
+    def test_safe_requests_read_replica(self):
+        """Test GET and HEAD requests read from a replica"""
+        self.assertEqual(self._read_db('GET'), 'replica')
+        self.assertEqual(self._read_db('HEAD'), 'replica')
+        self.assertIsNone(get_read_alias())
+
+    def test_unsafe_requests_read_primary(self):
+        """Test other requests read from the primary"""
+        for method in ['POST', 'PUT', 'PATCH', 'DELETE']:
+            self.assertEqual(self._read_db(method), 'default')
+
+    def test_read_your_writes(self):
+        """Test a user reads from the primary after writing"""
+        self._read_db('POST')
+
+        self.assertEqual(self._read_db('GET'), 'default')
+        self.assertEqual(self._read_db('GET', user_id=2), 'replica')
+        self.assertIsNone(get_read_alias())
+
+    def test_stick_to_primary(self):
+        """Test views minting credentials can keep their user on the primary"""
+        stick_to_primary(3)
+
+        self.assertEqual(self._read_db('GET', user_id=3), 'default')
+
+    def test_session_read_your_writes(self):
+        """Test a session reads from the primary after writing"""
+        cookies = {settings.SESSION_COOKIE_NAME: 'abc'}
+        self._read_db('POST', user_id=None, cookies=cookies)
+
+        self.assertEqual(
+            self._read_db('GET', user_id=None, cookies=cookies),
+            'default',
+        )
+        self.assertEqual(self._read_db('GET', user_id=None), 'replica')
+
+    def test_new_session_sticky(self):
+        """Test a session created by a write reads from the primary"""
+        def login(request):
+            response = HttpResponse()
+            response.set_cookie(settings.SESSION_COOKIE_NAME, 'new')
+            return response
+
+        ReplicaMiddleware(login)(self.factory.post('/'))
+
+        self.assertEqual(
+            self._read_db(
+                'GET',
+                user_id=None,
+                cookies={settings.SESSION_COOKIE_NAME: 'new'},
+            ),
+            'default',
+        )
+
+    def test_failed_write_not_sticky(self):
+        """Test rejected writes don't keep the user on the primary"""
+        self._read_db('POST', status=400)
+
+        self.assertEqual(self._read_db('GET'), 'replica')
+
+    def test_anonymous_write_not_sticky(self):
+        """Test writes without a user or session aren't remembered"""
+        self._read_db('POST', user_id=None)
+
+        self.assertEqual(self._read_db('GET', user_id=None), 'replica')
+
+    def test_sticky_window_expires(self):
+        """Test clients go back to replicas after the sticky window"""
+        with override_settings(
+            DATABASE_REPLICAS={**REPLICAS, 'STICKY_SECONDS': 0},
+        ):
+            self._read_db('POST')
+
+        self.assertEqual(self._read_db('GET'), 'replica')
+
+    def test_streaming_reads_replica(self):
+        """Test streamed responses keep reading from the replica"""
+        def chunks():
+            yield Recipe.objects.all().db.encode()
+
+        request = self.factory.get('/')
+        response = ReplicaMiddleware(
+            lambda request: StreamingHttpResponse(chunks())
+        )(request)
+
+        self.assertIsNone(get_read_alias())
+        self.assertEqual(b''.join(response.streaming_content), b'replica')
+
+    def test_async_requests_read_replica(self):
+        """Test the replica is selected and restored under ASGI"""
+        seen = []
+
+        async def view(request):
+            seen.append(Recipe.objects.all().db)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        response = async_to_sync(middleware)(self.factory.get('/'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, ['replica'])
+        self.assertIsNone(get_read_alias())
+
+    def test_async_streaming_reads_replica(self):
+        """Test responses streamed under ASGI keep reading the replica"""
+        def chunks():
+            yield Recipe.objects.all().db.encode()
+
+        async def view(request):
+            return StreamingHttpResponse(chunks())
+
+        response = async_to_sync(ReplicaMiddleware(view))(
+            self.factory.get('/'),
+        )
+
+        self.assertEqual(b''.join(response.streaming_content), b'replica')
+
+    @override_settings(DATABASE_REPLICAS={**REPLICAS, 'ALIASES': []})
+    def test_no_replicas(self):
+        """Test every request reads from the primary without replicas"""
+        self.assertEqual(self._read_db('GET'), 'default')
+
+
+class ReplicaAsgiTests(TransactionTestCase):
+    """Test the APIs under ASGI with replica routing enabled
+
+    The primary stands in for the replica, so the routing runs without a
+    second database. Only the requests see it as a replica, the router
+    wouldn't let the test database be flushed otherwise.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password',
+        )
+        Recipe.objects.create(
+            user=user,
+            title='Recipe',
+            time_minutes=5,
+            price=5,
+        )
+        self.token = Token.objects.create(user=user)
+
+    async def test_list_recipes(self):
+        """Test the sync and async recipe lists read through the router"""
+        for name in ['recipe:recipe-list', 'recipe:async-recipe-list']:
+            with override_settings(
+                DATABASE_REPLICAS={**REPLICAS, 'ALIASES': ['default']},
+            ):
+                res = await self.async_client.get(
+                    reverse(name),
+                    AUTHORIZATION=f'Token {self.token.key}',
+                )
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json()['results'][0]['title'], 'Recipe')
+            self.assertIsNone(get_read_alias())
+
+
+@unittest.skipUnless(
+    settings.DATABASE_REPLICAS['ALIASES'],
+    'No replicas are configured',
+)
+class ReplicaApiTests(TransactionTestCase):
+    """Test the APIs with the configured replicas
+
+    Replicas are test mirrors of the primary using their own connections,
+    so the data has to be committed for them to see it.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_list_recipes(self):
+        """Test listing recipes while reading from a replica"""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password',
+        )
+        Recipe.objects.create(
+            user=user,
+            title='Recipe',
+            time_minutes=5,
+            price=5,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        replica = connections[settings.DATABASE_REPLICAS['ALIASES'][0]]
+
+        with override_settings(DATABASE_REPLICAS={
+            **settings.DATABASE_REPLICAS,
+            'ALIASES': [replica.alias],
+        }), CaptureQueriesContext(replica) as ctx:
+            res = client.get(reverse('recipe:recipe-list'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['results'][0]['title'], 'Recipe')
+        self.assertTrue(ctx.captured_queries)
+
+    async def test_list_recipes_asgi(self):
+        """Test listing recipes from a replica under ASGI"""
+        user = await sync_to_async(get_user_model().objects.create_user)(
+            email='test@example.com',
+            password='password',
+        )
+        await sync_to_async(Recipe.objects.create)(
+            user=user,
+            title='Recipe',
+            time_minutes=5,
+            price=5,
+        )
+        token = await sync_to_async(Token.objects.create)(user=user)
+
+        for name in ['recipe:recipe-list', 'recipe:async-recipe-list']:
+            res = await self.async_client.get(
+                reverse(name),
+                AUTHORIZATION=f'Token {token.key}',
+            )
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json()['results'][0]['title'], 'Recipe')
+
+    def test_new_credentials_read_primary(self):
+        """Test a new user and token are read from the primary at first"""
+        client = APIClient()
+        client.post(reverse('user:create'), {
+            'email': 'test@example.com',
+            'password': 'password',
+            'name': 'Test',
+        })
+        res = client.post(reverse('user:token'), {
+            'email': 'test@example.com',
+            'password': 'password',
+        })
+        client.credentials(HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+
+        with ExitStack() as stack:
+            replicas = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in settings.DATABASE_REPLICAS['ALIASES']
+            ]
+            me = client.get(reverse('user:me'))
+
+        self.assertEqual(me.status_code, 200)
+        for ctx in replicas:
+            self.assertEqual(ctx.captured_queries, [])
+
+    def test_read_your_writes(self):
+        """Test a recipe is read from the primary right after creating it"""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password',
+        )
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        payload = {
+            'title': 'Recipe',
+            'time_minutes': 5,
+            'price': '5.00',
+            'link': 'https://example.com',
+        }
+
+        res = client.post(reverse('recipe:recipe-list'), payload)
+        with ExitStack() as stack:
+            replicas = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in settings.DATABASE_REPLICAS['ALIASES']
+            ]
+            detail = client.get(
+                reverse('recipe:recipe-detail', args=[res.data['id']]),
+            )
+
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data['title'], 'Recipe')
+        for ctx in replicas:
+            self.assertEqual(ctx.captured_queries, [])
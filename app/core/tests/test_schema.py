@@ -0,0 +1,161 @@
+"""
+Tests for the cached OpenAPI schema
+"""
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.views import SpectacularAPIView
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.schema import schema_cache
+
+
+SCHEMA_URL = reverse('api-schema')
+
+
+class CachedSchemaTests(SimpleTestCase):
+    """Test serving the precomputed schema"""
+
+    def setUp(self):
+        self.client = APIClient()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(SCHEMA_CACHE={
+            'VERSION': 'v1',
+            'DIR': self.directory,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema_cache.clear()
+        self.addCleanup(schema_cache.clear)
+
+    def test_schema_matches_generated_schema(self):
+        """Test the cached YAML and JSON schemas match the generated ones"""
+        for accept in ['application/vnd.oai.openapi', 'application/json']:
+            request = APIRequestFactory().get(SCHEMA_URL, HTTP_ACCEPT=accept)
+            expected = SpectacularAPIView.as_view()(request).render()
+
+            res = self.client.get(SCHEMA_URL, HTTP_ACCEPT=accept)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res['Content-Type'], expected['Content-Type'])
+            self.assertEqual(res.content, expected.content)
+
+    def test_schema_generated_once(self):
+        """Test the schema is generated on the first request only"""
+        with patch.object(
+            SchemaGenerator,
+            'get_schema',
+            autospec=True,
+            side_effect=SchemaGenerator.get_schema,
+        ) as mock_get_schema:
+            first = self.client.get(SCHEMA_URL)
+            second = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(mock_get_schema.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match gets a 304"""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=f'W/{etag}')
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+    def test_not_modified_etag_list_and_wildcard(self):
+        """Test If-None-Match lists and * get a 304"""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        for if_none_match in [f'"other", W/{etag}', '*']:
+            res = self.client.get(
+                SCHEMA_URL,
+                HTTP_IF_NONE_MATCH=if_none_match,
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH='"other"')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_gzip(self):
+        """Test the precompressed schema is sent to clients accepting gzip"""
+        plain = self.client.get(SCHEMA_URL)
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+
+    def test_loaded_from_disk(self):
+        """Test a schema saved by another process is not generated again"""
+        content = self.client.get(SCHEMA_URL).content
+        schema_cache.clear()
+
+        with patch.object(SchemaGenerator, 'get_schema') as mock_get_schema:
+            res = self.client.get(SCHEMA_URL)
+
+        mock_get_schema.assert_not_called()
+        self.assertEqual(res.content, content)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, 'schema-v1.yaml'))
+        )
+
+    def test_regenerated_for_new_version(self):
+        """Test a new code version generates the schema again"""
+        self.client.get(SCHEMA_URL)
+
+        with override_settings(SCHEMA_CACHE={
+            'VERSION': 'v2',
+            'DIR': self.directory,
+        }), patch.object(
+            SchemaGenerator,
+            'get_schema',
+            return_value={'openapi': '3.0.3'},
+        ):
+            res = self.client.get(SCHEMA_URL, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(json.loads(res.content), {'openapi': '3.0.3'})
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory, 'schema-v2.json'))
+        )
+
+    def test_schema_without_directory(self):
+        """Test the schema is kept in memory without a directory"""
+        with override_settings(SCHEMA_CACHE={'VERSION': 'v1', 'DIR': None}):
+            res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_build_schema_command(self):
+        """Test build_schema writes a file per format"""
+        out = StringIO()
+
+        call_command('build_schema', stdout=out)
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['schema-v1.json', 'schema-v1.yaml'],
+        )
+        with patch.object(SchemaGenerator, 'get_schema') as mock_get_schema:
+            res = self.client.get(SCHEMA_URL)
+        mock_get_schema.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
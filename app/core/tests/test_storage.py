@@ -0,0 +1,142 @@
+"""
+Tests for the content addressed storage
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing files by content digest"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = ContentAddressedStorage(location=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_names_file_by_digest(self):
+        """Test a saved file is stored under its sharded digest"""
+        digest = hashlib.sha256(b'content').hexdigest()
+
+        name = self.storage.save('uploads/a.JPG', ContentFile(b'content'))
+
+        self.assertEqual(
+            name,
+            f'uploads/{digest[:2]}/{digest[2:4]}/{digest}.jpg',
+        )
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'content')
+
+    def test_identical_content_stored_once(self):
+        """Test saving identical content shares one referenced file"""
+        first = self.storage.save('uploads/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('uploads/b.jpg', ContentFile(b'same'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(StoredFile.objects.get(name=first).reference_count, 2)
+        shard = os.path.dirname(self.storage.path(first))
+        self.assertEqual(len(os.listdir(shard)), 1)
+
+    def test_delete_keeps_file_until_last_reference(self):
+        """Test the file is only removed with its last reference"""
+        name = self.storage.save('uploads/a.jpg', ContentFile(b'same'))
+        self.storage.save('uploads/b.jpg', ContentFile(b'same'))
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_save_derived_keeps_name(self):
+        """Test derived files are stored under the given name"""
+        name = self.storage.save_derived(
+            'uploads/a_thumbnail.jpg', ContentFile(b'thumb'),
+        )
+
+        self.assertEqual(name, 'uploads/a_thumbnail.jpg')
+        self.assertTrue(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_save_derived_overwrite(self):
+        """Test derived files are only replaced when asked to"""
+        name = 'uploads/a_thumbnail.jpg'
+        self.storage.save_derived(name, ContentFile(b'old'))
+
+        self.storage.save_derived(name, ContentFile(b'new'))
+        with self.storage.open(name) as derived:
+            self.assertEqual(derived.read(), b'old')
+
+        self.storage.save_derived(name, ContentFile(b'new'), overwrite=True)
+        with self.storage.open(name) as derived:
+            self.assertEqual(derived.read(), b'new')
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    'Row locks need PostgreSQL',
+)
+class ContentAddressedStorageLockingTests(TransactionTestCase):
+    """Test concurrent saves and deletes of the same content"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def _in_thread(self, func, *args):
+        """Start func in a thread with its own connection"""
+        def run():
+            try:
+                func(*args)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+
+        return thread
+
+    def test_save_waits_for_delete(self):
+        """Test saving content being deleted keeps the new file"""
+        name = self.storage.save('uploads/a.jpg', ContentFile(b'same'))
+        unlinking = threading.Event()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        unlink = FileSystemStorage.delete
+
+        def slow_unlink(storage, name):
+            unlinking.set()
+            release.wait(5)
+            unlink(storage, name)
+
+        with patch.object(FileSystemStorage, 'delete', slow_unlink):
+            deleting = self._in_thread(self.storage.delete, name)
+            unlinking.wait(5)
+            saving = self._in_thread(
+                self.storage.save,
+                'uploads/b.jpg',
+                ContentFile(b'same'),
+            )
+            saving.join(0.2)
+            self.assertTrue(saving.is_alive())
+            release.set()
+            deleting.join(5)
+            saving.join(5)
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).reference_count, 1)
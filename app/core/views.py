@@ -0,0 +1,80 @@
+"""
+Views for the core components
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from rest_framework import status
+
+from core.middleware import accepted_encodings
+from core.schema import schema_cache
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    # Serves the schema generated once per code version. Responses carry an
+    # ETag, answer If-None-Match with 304 and are sent gzip compressed to
+    # clients accepting it. Requests for another language are generated
+    # like SpectacularAPIView does. The docstring is the endpoint's public
+    # description, so it is kept.
+    __doc__ = SpectacularAPIView.__doc__
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if settings.USE_I18N and request.GET.get('lang'):
+            return super().get(request, *args, **kwargs)
+
+        schema = schema_cache.get(
+            request.accepted_renderer,
+            lambda: self.generate_schema(request),
+        )
+        client_etags = [
+            etag.replace('W/', '', 1)
+            for etag in parse_etags(request.headers.get('If-None-Match', ''))
+        ]
+        if schema.etag in client_etags or '*' in client_etags:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif self._accepts_gzip(request):
+            response = HttpResponse(
+                schema.gzipped,
+                content_type=self._content_type(request),
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                schema.content,
+                content_type=self._content_type(request),
+            )
+        response['ETag'] = schema.etag
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+
+        return response
+
+    def generate_schema(self, request=None):
+        """Return the schema generated from the API's views"""
+        generator = self.generator_class(
+            urlconf=self.urlconf,
+            api_version=self.api_version,
+        )
+
+        return generator.get_schema(request=request, public=self.serve_public)
+
+    def _accepts_gzip(self, request):
+        """Return if the client accepts gzip encoded responses"""
+        encodings = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        )
+
+        return encodings.get('gzip', encodings.get('*', 0)) > 0
+
+    def _content_type(self, request):
+        """Return the content type DRF would send for the renderer"""
+        charset = request.accepted_renderer.charset
+        if charset:
+            return f'{request.accepted_media_type}; charset={charset}'
+
+        return request.accepted_media_type
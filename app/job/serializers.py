@@ -0,0 +1,45 @@
+"""
+Serializers for the Job API
+"""
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+
+from rest_framework import serializers
+
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs
+
+    The traceback in last_error stays in the logs and the database, the
+    API only says whether the last attempt failed.
+    """
+    error = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'name',
+            'status',
+            'attempts',
+            'max_attempts',
+            'result',
+            'error',
+            'run_at',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
+
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_error(self, job):
+        """Return a short description of the last failure, if any"""
+        if not job.last_error:
+            return None
+        if job.status == Job.FAILED:
+            return 'The job failed.'
+
+        return 'The last attempt failed, the job will be retried.'
@@ -0,0 +1,100 @@
+"""
+Tests for the Job API
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Job
+
+
+JOBS_URL = reverse('job:job-list')
+
+
+def detail_url(job_id):
+    """Create and return a job detail url"""
+    return reverse('job:job-detail', args=[job_id])
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class PublicJobApiTests(TestCase):
+    """Test unauthenticated API requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test auth is required for retrieving jobs"""
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateJobApiTests(TestCase):
+    """Test authenticated API requests"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_job_status(self):
+        """Test retrieving the status of a job"""
+        job = Job.objects.create(
+            name='recipe.process_image',
+            user=self.user,
+            status=Job.SUCCEEDED,
+            attempts=1,
+            result={'image': 'uploads/recipe/a.jpg'},
+        )
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.SUCCEEDED)
+        self.assertEqual(res.data['attempts'], 1)
+        self.assertEqual(res.data['result'], {'image': 'uploads/recipe/a.jpg'})
+        self.assertIsNone(res.data['error'])
+
+    def test_failed_job_hides_traceback(self):
+        """Test a failed job reports a short error without the traceback"""
+        job = Job.objects.create(
+            name='recipe.process_image',
+            user=self.user,
+            status=Job.FAILED,
+            attempts=3,
+            last_error='Traceback (most recent call last):\n  File "/x.py"',
+        )
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertNotIn('last_error', res.data)
+        self.assertEqual(res.data['error'], 'The job failed.')
+        self.assertNotIn('Traceback', res.content.decode())
+
+    def test_jobs_limited_to_user(self):
+        """Test list of jobs is limited to authenticated user"""
+        other = create_user(email='other@example.com')
+        Job.objects.create(name='recipe.process_image', user=other)
+        job = Job.objects.create(name='recipe.process_image', user=self.user)
+
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [job.id])
+
+    def test_other_user_job_not_found(self):
+        """Test retrieving another user's job returns not found"""
+        other = create_user(email='other@example.com')
+        job = Job.objects.create(name='recipe.process_image', user=other)
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,27 @@
+"""
+Views for the Job API
+"""
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from core.models import Job
+from job import serializers
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """View the status of background jobs"""
+    serializer_class = serializers.JobSerializer
+    queryset = Job.objects.all()
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Retrieve jobs for authenticated user"""
+        return self.queryset.filter(user=self.request.user).order_by('-id')
@@ -0,0 +1,164 @@
+"""
+Benchmarks for the Recipe APIs
+"""
+from decimal import Decimal
+from itertools import count
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.benchmark import register, measure
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.views import RecipeViewSet, TagViewSet
+
+
+def _create_recipe(user):
+    """Create a recipe to attach items to"""
+    return Recipe.objects.create(
+        user=user,
+        title='Benchmark Recipe',
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+
+
+def _resolve_one_by_one(user, recipe, names):
+    """Attach items with one get_or_create and add() per item"""
+    for name in names:
+        tag, created = Tag.objects.get_or_create(user=user, name=name)
+        recipe.tags.add(tag)
+        ingredient, created = Ingredient.objects.get_or_create(
+            user=user,
+            name=name,
+        )
+        recipe.ingredients.add(ingredient)
+
+
+def _resolve_batched(user, recipe, names):
+    """Attach items with one lookup and bulk inserts per relation"""
+    tag_ids = Tag.objects.get_or_create_names(user, names)
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+        for tag_id in tag_ids.values()
+    ])
+    ingredient_ids = Ingredient.objects.get_or_create_names(user, names)
+    Recipe.ingredients.through.objects.bulk_create([
+        Recipe.ingredients.through(
+            recipe_id=recipe.id,
+            ingredient_id=ingredient_id,
+        )
+        for ingredient_id in ingredient_ids.values()
+    ])
+
+
+@register
+def tag_resolution(report, repeat):
+    """Compare resolving recipe tags and ingredients per item and batched"""
+    user = get_user_model().objects.create_user(
+        email='benchmark@example.com',
+        password='password',
+    )
+    runs = count()
+    for size in [1, 10, 100]:
+        for label, resolve in [
+            ('one by one', _resolve_one_by_one),
+            ('batched', _resolve_batched),
+        ]:
+            def run():
+                run_id = next(runs)
+                names = [f'Item {run_id}-{i}' for i in range(size)]
+                resolve(user, _create_recipe(user), names)
+
+            seconds, queries = measure(run, repeat)
+            report(f'{label} ({size} items)', seconds, queries)
+
+
+def _recipe_payload(run_id, size):
+    """Return size recipes sharing tags with an ingredient each"""
+    return [
+        {
+            'title': f'Recipe {run_id}-{i}',
+            'time_minutes': 10,
+            'price': '5.00',
+            'link': 'https://example.com/recipe.pdf',
+            'tags': [{'name': 'Dinner'}, {'name': f'Tag {i % 10}'}],
+            'ingredients': [{'name': f'Ingredient {run_id}-{i}'}],
+        }
+        for i in range(size)
+    ]
+
+
+@register
+@override_settings(ALLOWED_HOSTS=['testserver'])
+def recipe_bulk_create(report, repeat):
+    """Compare creating recipes one POST at a time and in one bulk POST"""
+    user = get_user_model().objects.create_user(
+        email='benchmark@example.com',
+        password='password',
+    )
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    runs = count()
+    for size in [10, 100]:
+        def one_by_one():
+            for recipe in _recipe_payload(next(runs), size):
+                client.post(
+                    reverse('recipe:recipe-list'),
+                    recipe,
+                    format='json',
+                )
+
+        def bulk():
+            client.post(
+                reverse('recipe:recipe-bulk'),
+                _recipe_payload(next(runs), size),
+                format='json',
+            )
+
+        for label, run in [('one by one', one_by_one), ('bulk', bulk)]:
+            seconds, queries = measure(run, repeat)
+            report(
+                f'{label} ({size} recipes, {size / seconds:.0f}/s)',
+                seconds,
+                queries,
+            )
+
+
+@register
+@override_settings(ALLOWED_HOSTS=['testserver'])
+def list_serialization(report, repeat):
+    """Compare list responses built by the serializers and the fast path"""
+    user = get_user_model().objects.create_user(
+        email='benchmark@example.com',
+        password='password',
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+    client.post(
+        reverse('recipe:recipe-bulk'),
+        _recipe_payload('list', 500),
+        format='json',
+    )
+    for label, url, viewset in [
+        ('recipes', reverse('recipe:recipe-list'), RecipeViewSet),
+        ('tags', reverse('recipe:tag-list'), TagViewSet),
+    ]:
+        for path, fast_list in [('serializer', False), ('fast path', True)]:
+            def run():
+                with patch.object(viewset, 'fast_list', fast_list):
+                    client.get(url, {'page_size': 500, 'recipe_count': 1})
+
+            seconds, queries = measure(run, repeat)
+            report(f'{label} ({path})', seconds, queries)
@@ -0,0 +1,70 @@
+"""
+Streaming export of recipe collections
+"""
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import Recipe
+
+
+EXPORT_FIELDS = [
+    'id',
+    'title',
+    'description',
+    'time_minutes',
+    'price',
+    'link',
+    'image',
+]
+
+
+def _related_names(through, field, recipe_ids):
+    """Return the related items of recipe_ids grouped by recipe"""
+    related = defaultdict(list)
+    links = through.objects.filter(recipe_id__in=recipe_ids).order_by(
+        f'{field}__name',
+    ).values_list('recipe_id', f'{field}_id', f'{field}__name')
+    for recipe_id, item_id, name in links:
+        related[recipe_id].append({'id': item_id, 'name': name})
+
+    return related
+
+
+def iter_chunks(rows, chunk_size):
+    """Split an iterator of rows into lists of up to chunk_size rows"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_recipes(queryset, chunk_size=2000, image_url=None):
+    """Yield one NDJSON line per recipe of queryset
+
+    Recipes are read with a server side cursor where the database supports
+    it, and the tags and ingredients of each chunk of recipes are loaded
+    with one query per relation, so memory depends on chunk_size only.
+    """
+    rows = queryset.order_by('id').values(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size,
+    )
+    for chunk in iter_chunks(rows, chunk_size):
+        recipe_ids = [row['id'] for row in chunk]
+        tags = _related_names(Recipe.tags.through, 'tag', recipe_ids)
+        ingredients = _related_names(
+            Recipe.ingredients.through,
+            'ingredient',
+            recipe_ids,
+        )
+        lines = []
+        for row in chunk:
+            row['image'] = image_url(row['image']) if row['image'] else None
+            row['tags'] = tags[row['id']]
+            row['ingredients'] = ingredients[row['id']]
+            lines.append(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        yield ''.join(lines).encode()
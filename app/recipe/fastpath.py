@@ -0,0 +1,153 @@
+"""
+Fast read path building list responses from values() rows
+"""
+from collections import defaultdict
+
+from rest_framework import serializers
+
+
+class FastRepresentation:
+    """Represent querysets like serializer without model instances
+
+    The serializer's fields are inspected once. Columns are represented with
+    the serializer's own fields, and nested many relations are loaded for a
+    whole page with one values_list() query per relation, grouped by the
+    parent id. A serializer overriding to_representation must reproduce
+    it with fast_columns() and fast_to_representation(data, row). supported
+    is False when the serializer has fields or representation this path
+    can't reproduce, in which case the caller keeps the serializer.
+    """
+
+    def __init__(self, serializer, queryset):
+        self.serializer = serializer
+        self.model = queryset.model
+        self.annotations = set(queryset.query.annotations)
+        self.fields = []
+        self.relations = {}
+        self.supported = True
+        if self._overrides_representation(serializer):
+            self.supported = False
+            return
+        columns = {
+            field.name: field.attname
+            for field in self.model._meta.concrete_fields
+        }
+        many_to_many = {field.name for field in self.model._meta.many_to_many}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                nested = self._nested_plan(field, many_to_many)
+                if nested is None:
+                    self.supported = False
+                    return
+                self.relations[name] = (field.source, nested)
+                self.fields.append((name, None, None))
+            elif self._is_simple(field) and field.source in columns:
+                self.fields.append(
+                    (name, columns[field.source], field.to_representation)
+                )
+            elif self._is_simple(field) and field.source in self.annotations:
+                self.fields.append(
+                    (name, field.source, field.to_representation)
+                )
+            else:
+                self.supported = False
+                return
+
+    def _overrides_representation(self, serializer):
+        """Return if serializer changes its data without the fast hooks
+
+        The hooks only count when defined alongside, or below, the last
+        to_representation override of the serializer's class.
+        """
+        for klass in type(serializer).__mro__:
+            if 'fast_to_representation' in vars(klass):
+                return False
+            if 'to_representation' in vars(klass):
+                return klass is not serializers.Serializer
+
+        return False
+
+    def _is_simple(self, field):
+        """Return if field represents one value without other lookups"""
+        return not isinstance(field, (
+            serializers.BaseSerializer,
+            serializers.RelatedField,
+            serializers.ManyRelatedField,
+            serializers.SerializerMethodField,
+            serializers.FileField,
+            serializers.HiddenField,
+        )) and field.source != '*' and '.' not in field.source
+
+    def _nested_plan(self, field, many_to_many):
+        """Return the columns to load for a nested many relation"""
+        if field.source not in many_to_many:
+            return None
+        related = self.model._meta.get_field(field.source).related_model
+        columns = {
+            f.name: f.attname for f in related._meta.concrete_fields
+        }
+        plan = []
+        for name, child in field.child.fields.items():
+            if child.write_only:
+                continue
+            if not self._is_simple(child) or child.source not in columns:
+                return None
+            plan.append((name, columns[child.source], child.to_representation))
+
+        return plan
+
+    def columns(self):
+        """Return the columns and annotations to select for the rows"""
+        extra = getattr(self.serializer, 'fast_columns', list)()
+        return list(dict.fromkeys(
+            ['id']
+            + [column for name, column, represent in self.fields if column]
+            + sorted(self.annotations)
+            + extra
+        ))
+
+    def _related_rows(self, source, plan, ids):
+        """Return the represented related items grouped by parent id"""
+        field = self.model._meta.get_field(source)
+        through = field.remote_field.through
+        parent = field.m2m_field_name()
+        child = field.m2m_reverse_field_name()
+        grouped = defaultdict(list)
+        rows = through.objects.filter(**{f'{parent}__in': ids}).order_by(
+            f'{child}_id',
+        ).values_list(
+            f'{parent}_id',
+            *[f'{child}__{column}' for name, column, represent in plan],
+        )
+        for parent_id, *values in rows:
+            grouped[parent_id].append({
+                name: None if value is None else represent(value)
+                for (name, column, represent), value in zip(plan, values)
+            })
+
+        return grouped
+
+    def represent(self, rows):
+        """Return the serialized data of a list of values() rows"""
+        ids = [row['id'] for row in rows]
+        related = {
+            name: self._related_rows(source, plan, ids) if ids else {}
+            for name, (source, plan) in self.relations.items()
+        }
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, represent in self.fields:
+                if column is None:
+                    item[name] = related[name][row['id']]
+                elif row[column] is None:
+                    item[name] = None
+                else:
+                    item[name] = represent(row[column])
+            if hasattr(self.serializer, 'fast_to_representation'):
+                item = self.serializer.fast_to_representation(item, row)
+            data.append(item)
+
+        return data
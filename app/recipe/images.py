@@ -0,0 +1,90 @@
+"""
+Resized variants of recipe images
+"""
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from django.core.files.base import ContentFile
+
+
+# Bounding box each variant is resized to fit in, keeping the aspect ratio.
+VARIANTS = {
+    'thumbnail': (150, 150),
+    'card': (600, 600),
+    'full': (1600, 1600),
+}
+
+VARIANT_QUALITY = 85
+
+
+def variant_name(name, variant):
+    """Return the storage name of a variant of the image stored at name"""
+    root, ext = os.path.splitext(name)
+
+    return f'{root}_{variant}.jpg'
+
+
+def generate_variants(image, force=False):
+    """Store a resized, re-encoded JPEG of image for every missing variant
+
+    With force, variants that already exist are replaced too.
+    """
+    if not force and all(
+        image.storage.exists(variant_name(image.name, variant))
+        for variant in VARIANTS
+    ):
+        return
+
+    with image.open('rb'):
+        original = ImageOps.exif_transpose(Image.open(image))
+        original = original.convert('RGB')
+
+    for variant, size in VARIANTS.items():
+        resized = original.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        buffer = BytesIO()
+        resized.save(
+            buffer,
+            format='JPEG',
+            quality=VARIANT_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+        image.storage.save_derived(
+            variant_name(image.name, variant),
+            ContentFile(buffer.getvalue()),
+            overwrite=force,
+        )
+
+
+def release_image(storage, name):
+    """Release a stored recipe image and its variants once unreferenced"""
+    storage.delete(name)
+    if not storage.exists(name):
+        for variant in VARIANTS:
+            storage.delete(variant_name(name, variant))
+
+
+def variant_url(image, variant, request=None):
+    """Return the URL of a variant of image or None without an image"""
+    if not image:
+        return None
+
+    url = image.storage.url(variant_name(image.name, variant))
+    if request is not None:
+        return request.build_absolute_uri(url)
+
+    return url
+
+
+def variant_urls(image, request=None):
+    """Return a variant to URL map of image or None without an image"""
+    if not image:
+        return None
+
+    return {
+        variant: variant_url(image, variant, request)
+        for variant in VARIANTS
+    }
@@ -0,0 +1,35 @@
+"""
+Background jobs for the Recipe APIs
+"""
+from core import jobs
+from core.models import Recipe
+from recipe import images
+
+
+@jobs.register('recipe.process_image')
+def process_image(recipe_id, old_image=None):
+    """Generate the variants of a recipe image and release the old one"""
+    storage = Recipe._meta.get_field('image').storage
+    recipe = Recipe.objects.filter(pk=recipe_id).only('id', 'image').first()
+    if recipe is not None and recipe.image:
+        images.generate_variants(recipe.image)
+    if old_image:
+        jobs.run_step(
+            'release_old_image',
+            images.release_image,
+            storage,
+            old_image,
+        )
+
+    return {'image': recipe.image.name if recipe is not None else None}
+
+
+@jobs.register('recipe.release_image')
+def release_image(name):
+    """Release the image of a deleted recipe"""
+    jobs.run_step(
+        'release_image',
+        images.release_image,
+        Recipe._meta.get_field('image').storage,
+        name,
+    )
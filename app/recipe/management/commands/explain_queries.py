@@ -0,0 +1,197 @@
+"""
+Django command to print the query plans of the Recipe APIs
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import views
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the queries run by the recipe APIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='User to plan for, defaults to the user with most recipes',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Plan against this many generated recipes, rolled back after',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries and report actual timings',
+        )
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        with transaction.atomic():
+            if options['seed']:
+                user = self._seed(options['seed'])
+            else:
+                user = self._get_user(options['email'])
+
+            for label, queryset in self._endpoint_queries(user):
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                if options['analyze']:
+                    plan = queryset.explain(analyze=True)
+                else:
+                    plan = queryset.explain()
+                self.stdout.write(plan)
+                self.stdout.write('')
+
+            transaction.set_rollback(True)
+
+    def _get_user(self, email):
+        """Return the user whose data is planned"""
+        users = get_user_model().objects.all()
+        if email:
+            user = users.filter(email=email).first()
+        else:
+            user = users.annotate(
+                recipe_count=Count('recipe'),
+            ).order_by('-recipe_count').first()
+        if user is None:
+            raise CommandError('No matching user, pass --seed to generate one')
+
+        return user
+
+    def _seed(self, count):
+        """Generate a user owning count recipes with tags and ingredients"""
+        user = get_user_model().objects.create_user(
+            email='explain-seed@example.com',
+        )
+        tag_ids = Tag.objects.get_or_create_names(
+            user,
+            [f'Tag {i}' for i in range(50)],
+        )
+        ingredient_ids = Ingredient.objects.get_or_create_names(
+            user,
+            [f'Ingredient {i}' for i in range(200)],
+        )
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user=user,
+                    title=f'Recipe {i}',
+                    time_minutes=i % 120,
+                    price=Decimal('9.99'),
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        recipe_ids = Recipe.objects.filter(user=user).values_list(
+            'id',
+            flat=True,
+        )
+        tag_ids = list(tag_ids.values())
+        ingredient_ids = list(ingredient_ids.values())
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(
+                    recipe_id=recipe_id,
+                    tag_id=tag_ids[recipe_id % len(tag_ids)],
+                )
+                for recipe_id in recipe_ids
+            ],
+            batch_size=1000,
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            [
+                Recipe.ingredients.through(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_ids[recipe_id % len(
+                        ingredient_ids
+                    )],
+                )
+                for recipe_id in recipe_ids
+            ],
+            batch_size=1000,
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        return user
+
+    def _get_queryset(self, viewset, action, user, params=None):
+        """Return the queryset a viewset action runs for user"""
+        request = Request(APIRequestFactory().get('/', params or {}))
+        request.user = user
+        view = viewset(
+            request=request,
+            action=action,
+            args=(),
+            kwargs={},
+            format_kwarg=None,
+        )
+        queryset = view.get_queryset()
+        if action == 'list' and view.paginator is not None:
+            queryset = queryset.order_by(*view.paginator.get_ordering(
+                request,
+                queryset,
+                view,
+            ))[:view.paginator.page_size + 1]
+
+        return queryset
+
+    def _endpoint_queries(self, user):
+        """Return a label and queryset for each endpoint query"""
+        recipe = Recipe.objects.filter(user=user).order_by('-id').first()
+        tag_ids = list(Tag.objects.filter(user=user).values_list(
+            'id',
+            flat=True,
+        )[:3])
+        tag_names = list(Tag.objects.filter(user=user).values_list(
+            'name',
+            flat=True,
+        )[:3])
+        recipe_id = recipe.id if recipe else 0
+
+        return [
+            ('Recipe list', self._get_queryset(
+                views.RecipeViewSet, 'list', user,
+            )),
+            ('Recipe list filtered by tags', self._get_queryset(
+                views.RecipeViewSet,
+                'list',
+                user,
+                {'tags': ','.join(str(tag_id) for tag_id in tag_ids)},
+            )),
+            ('Recipe search', self._get_queryset(
+                views.RecipeViewSet, 'list', user, {'search': 'recipe 7'},
+            )),
+            ('Recipe detail', self._get_queryset(
+                views.RecipeViewSet, 'retrieve', user,
+            ).filter(pk=recipe_id)),
+            ('Tag list', self._get_queryset(
+                views.TagViewSet, 'list', user,
+            )),
+            ('Tag list assigned only', self._get_queryset(
+                views.TagViewSet, 'list', user, {'assigned_only': 1},
+            )),
+            ('Ingredient list', self._get_queryset(
+                views.IngredientViewSet, 'list', user,
+            )),
+            ('Tag name lookup', Tag.objects.filter(
+                user=user,
+                name__in=tag_names,
+            )),
+        ]
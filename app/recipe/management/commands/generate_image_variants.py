@@ -0,0 +1,36 @@
+"""
+Django command to generate the resized variants of recipe images
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import VARIANTS, generate_variants, variant_name
+
+
+class Command(BaseCommand):
+    help = 'Generate missing resized variants of stored recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that already exist',
+        )
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        generated = 0
+        recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        for recipe in recipes.only('id', 'image').iterator():
+            storage = recipe.image.storage
+            missing = not all(
+                storage.exists(variant_name(recipe.image.name, variant))
+                for variant in VARIANTS
+            )
+            if missing or options['force']:
+                generate_variants(recipe.image, force=options['force'])
+                generated += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {generated} recipe images'
+        ))
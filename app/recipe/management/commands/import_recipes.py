@@ -0,0 +1,263 @@
+"""
+Django command to bulk import recipes from NDJSON or CSV files
+"""
+import csv
+import io
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from core.models import (
+    ImportCheckpoint,
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.export import iter_chunks
+from recipe.search import invalidate_user_index
+
+
+RECIPE_COLUMNS = [
+    'id',
+    'user_id',
+    'title',
+    'description',
+    'time_minutes',
+    'price',
+    'link',
+    'image',
+]
+
+
+def read_ndjson(file):
+    """Yield one dict per non blank line"""
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(file):
+    """Yield one dict per row, splitting tags and ingredients on |"""
+    for row in csv.DictReader(file):
+        for field in ['tags', 'ingredients']:
+            row[field] = [
+                name.strip()
+                for name in (row.get(field) or '').split('|')
+                if name.strip()
+            ]
+        yield row
+
+
+def _names(items):
+    """Return the names of items given as names or {'name': ...} dicts"""
+    return [
+        item['name'] if isinstance(item, dict) else item
+        for item in items or []
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from an NDJSON or CSV file in large batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV file to import')
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            help='File format, defaults to the file extension',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email of the owner of rows without a user field',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Name of the checkpoint recording imported rows,'
+                 ' defaults to the absolute PATH',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the rows recorded in the checkpoint',
+        )
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        checkpoint = options['checkpoint'] or os.path.abspath(path)
+        skip = self._read_checkpoint(checkpoint) if options['resume'] else 0
+        self.default_user = options['user']
+        self.user_ids = {}
+        self.name_ids = {}
+        self.users = set()
+
+        reader = read_csv if file_format == 'csv' else read_ndjson
+        imported = skip
+        started = time.monotonic()
+        with open(path, newline='') as file:
+            rows = reader(file)
+            for _ in zip(range(skip), rows):
+                pass
+            for batch in iter_chunks(rows, options['batch_size']):
+                with transaction.atomic():
+                    self._import_batch(batch, imported)
+                    self._write_checkpoint(checkpoint, imported + len(batch))
+                imported += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Imported {imported} rows'
+                    f' ({(imported - skip) / elapsed:.0f} rows/s)'
+                )
+
+        for user_id in self.users:
+            get_user_model().objects.bump_collection_version(user_id)
+            invalidate_user_index(user_id)
+        ImportCheckpoint.objects.filter(name=checkpoint).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported - skip} recipes'
+            f' in {time.monotonic() - started:.1f}s'
+        ))
+
+    def _read_checkpoint(self, checkpoint):
+        """Return the number of rows already imported"""
+        return ImportCheckpoint.objects.filter(name=checkpoint).values_list(
+            'rows',
+            flat=True,
+        ).first() or 0
+
+    def _write_checkpoint(self, checkpoint, rows):
+        """Record the number of rows imported, in the batch's transaction"""
+        ImportCheckpoint.objects.update_or_create(
+            name=checkpoint,
+            defaults={'rows': rows},
+        )
+
+    def _get_user_id(self, email):
+        """Return the id of the user with email, cached"""
+        if email not in self.user_ids:
+            if not email:
+                raise CommandError('Rows without a user need --user.')
+            user = get_user_model().objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f'User {email} does not exist.')
+            self.user_ids[email] = user.id
+
+        return self.user_ids[email]
+
+    def _resolve_names(self, manager, user_id, names):
+        """Return a name to id map, only querying names not seen before"""
+        cache = self.name_ids.setdefault((manager.model, user_id), {})
+        missing = [name for name in names if name not in cache]
+        if missing:
+            cache.update(manager.get_or_create_names(
+                get_user_model()(pk=user_id),
+                missing,
+            ))
+
+        return cache
+
+    def _parse(self, row, number):
+        """Return the recipe column values of row"""
+        try:
+            return {
+                'user_id': self._get_user_id(
+                    row.get('user') or self.default_user
+                ),
+                'title': row['title'],
+                'description': row.get('description') or '',
+                'time_minutes': int(row['time_minutes']),
+                'price': Decimal(str(row['price'])),
+                'link': row.get('link') or '',
+                'image': '',
+            }
+        except (KeyError, ValueError, InvalidOperation) as error:
+            raise CommandError(f'Row {number}: invalid value {error}')
+
+    def _import_batch(self, batch, offset):
+        """Insert a batch of recipes and their tags and ingredients"""
+        recipes = [
+            self._parse(row, offset + i + 1) for i, row in enumerate(batch)
+        ]
+        for recipe, recipe_id in zip(recipes, self._allocate_ids(len(batch))):
+            recipe['id'] = recipe_id
+            self.users.add(recipe['user_id'])
+
+        links = {}
+        for relation, through, field, manager in [
+            ('tags', Recipe.tags.through, 'tag_id', Tag.objects),
+            (
+                'ingredients',
+                Recipe.ingredients.through,
+                'ingredient_id',
+                Ingredient.objects,
+            ),
+        ]:
+            by_user = {}
+            for recipe, row in zip(recipes, batch):
+                by_user.setdefault(recipe['user_id'], set()).update(
+                    _names(row.get(relation))
+                )
+            name_ids = {
+                user_id: self._resolve_names(manager, user_id, names)
+                for user_id, names in by_user.items()
+            }
+            links[through] = (['recipe_id', field], [
+                (recipe['id'], item_id)
+                for recipe, row in zip(recipes, batch)
+                for item_id in {
+                    name_ids[recipe['user_id']][name]
+                    for name in _names(row.get(relation))
+                }
+            ])
+
+        self._insert(Recipe, RECIPE_COLUMNS, [
+            [recipe[column] for column in RECIPE_COLUMNS]
+            for recipe in recipes
+        ])
+        for through, (columns, rows) in links.items():
+            self._insert(through, columns, rows)
+
+    def _allocate_ids(self, count):
+        """Reserve count recipe ids"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT nextval(pg_get_serial_sequence(%s, %s))'
+                    ' FROM generate_series(1, %s)',
+                    [Recipe._meta.db_table, 'id', count],
+                )
+                return [row[0] for row in cursor.fetchall()]
+
+        start = (Recipe.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        return list(range(start, start + count))
+
+    def _insert(self, model, columns, rows):
+        """Insert rows with COPY on PostgreSQL, else with bulk_create"""
+        if not rows:
+            return
+        if connection.vendor != 'postgresql':
+            model.objects.bulk_create(
+                [model(**dict(zip(columns, row))) for row in rows],
+                batch_size=1000,
+            )
+            return
+
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(model._meta.db_table)}'
+                f' ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
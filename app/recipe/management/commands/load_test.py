@@ -0,0 +1,181 @@
+"""
+Django command to load test the sync and async recipe list views
+"""
+import asyncio
+import io
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the latency of the WSGI and ASGI recipe list views under'
+        ' concurrent requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100,
+            help='Recipes owned by the load test user',
+        )
+
+    def handle(self, *args, **options):
+        """Command Code"""
+        user = self._create_user(options['recipes'])
+        authorization = f'Token {Token.objects.create(user=user).key}'
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for label, run in [
+                    ('wsgi', self._run_wsgi),
+                    ('asgi', self._run_asgi),
+                ]:
+                    started = time.perf_counter()
+                    latencies, errors = run(
+                        authorization,
+                        options['requests'],
+                        options['concurrency'],
+                    )
+                    self._report(
+                        label,
+                        time.perf_counter() - started,
+                        latencies,
+                        errors,
+                    )
+        finally:
+            user.delete()
+
+    def _create_user(self, recipes):
+        """Create a throwaway user owning recipes"""
+        user = get_user_model().objects.create_user(
+            email=f'load-test-{uuid.uuid4().hex}@example.com',
+            password=uuid.uuid4().hex,
+        )
+        tag = Tag.objects.create(user=user, name='Load test')
+        created = Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=Decimal('5.00'),
+            )
+            for i in range(recipes)
+        ])
+        if created and created[0].pk is not None:
+            tag.recipe_set.add(*created)
+
+        return user
+
+    def _run_wsgi(self, authorization, requests, concurrency):
+        """Call the WSGI app from a pool of threads like a threaded server"""
+        application = get_wsgi_application()
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': reverse('recipe:recipe-list'),
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_AUTHORIZATION': authorization,
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+        }
+
+        def request(_):
+            started = time.perf_counter()
+            statuses = []
+            response = application(
+                {**environ, 'wsgi.input': io.BytesIO()},
+                lambda status, headers: statuses.append(status),
+            )
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return time.perf_counter() - started, int(statuses[0][:3])
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(request, range(requests)))
+
+        return self._split(results)
+
+    def _run_asgi(self, authorization, requests, concurrency):
+        """Call the ASGI app from concurrent tasks on one event loop"""
+        application = get_asgi_application()
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': reverse('recipe:async-recipe-list'),
+            'query_string': b'',
+            'server': ('testserver', 80),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', authorization.encode()),
+            ],
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def request():
+                statuses = []
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        statuses.append(message['status'])
+
+                async with semaphore:
+                    started = time.perf_counter()
+                    await application(dict(scope), receive, send)
+                    return time.perf_counter() - started, statuses[0]
+
+            return await asyncio.gather(*[
+                request() for _ in range(requests)
+            ])
+
+        return self._split(asyncio.run(run()))
+
+    def _split(self, results):
+        """Return the latencies and the number of failed requests"""
+        latencies = [seconds for seconds, status_code in results]
+        errors = sum(status_code != 200 for seconds, status_code in results)
+
+        return latencies, errors
+
+    def _report(self, label, elapsed, latencies, errors):
+        """Write the throughput and latency percentiles of a run"""
+        cuts = statistics.quantiles(latencies, n=100) if len(
+            latencies
+        ) > 1 else latencies * 99
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(
+            f'  {len(latencies) / elapsed:10.1f} requests/s'
+            f'  p50 {cuts[49] * 1000:8.2f} ms'
+            f'  p95 {cuts[94] * 1000:8.2f} ms'
+            f'  p99 {cuts[98] * 1000:8.2f} ms'
+            f'  max {max(latencies) * 1000:8.2f} ms'
+            f'  {errors} errors'
+        )
@@ -0,0 +1,105 @@
+"""
+Mixins for the Recipe APIs
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.utils.http import parse_etags
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.fastpath import FastRepresentation
+
+
+class CollectionVersionMixin:
+    """Version the user's collection on writes and answer conditional GETs
+
+    Every write bumps a per-user collection version. List responses, and
+    any handler wrapped in conditional_response, carry an ETag derived
+    from that version. A request whose If-None-Match matches it gets a 304
+    without running the endpoint's queries or serializers.
+    """
+
+    def bump_collection_version(self):
+        """Mark the authenticated user's collection as changed"""
+        get_user_model().objects.bump_collection_version(self.request.user.pk)
+
+    def get_etag(self, request):
+        """Return the ETag of the current collection version for request"""
+        version = get_user_model().objects.get_collection_version(
+            request.user.pk,
+        )
+        key = ':'.join([
+            str(request.user.pk),
+            str(version),
+            request.get_full_path(),
+            request.accepted_media_type,
+        ])
+
+        return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """Return 304 when the client's ETag matches, else run handler"""
+        etag = self.get_etag(request)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            client_etags = [
+                client_etag.replace('W/', '', 1)
+                for client_etag in parse_etags(if_none_match)
+            ]
+            if etag in client_etags or '*' in client_etags:
+                return Response(
+                    status=status.HTTP_304_NOT_MODIFIED,
+                    headers={'ETag': etag},
+                )
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list,
+            request,
+            *args,
+            **kwargs,
+        )
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.bump_collection_version()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        self.bump_collection_version()
+
+
+class FastListMixin:
+    """Serve list actions from values() rows instead of model instances
+
+    The response is built by FastRepresentation from the list serializer's
+    own fields, so it renders identically to the serializer. Serializers
+    with fields it can't reproduce fall back to the regular list.
+    """
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        representation = FastRepresentation(self.get_serializer(), queryset)
+        if not representation.supported:
+            return super().list(request, *args, **kwargs)
+
+        rows = queryset.prefetch_related(None).values(
+            *representation.columns()
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(representation.represent(page))
+
+        return Response(representation.represent(list(rows)))
@@ -0,0 +1,19 @@
+"""
+Pagination for the Recipe APIs
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Opaque keyset pagination over the recipe id"""
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        """Order search results by relevance before the id"""
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-id')
+
+        return super().get_ordering(request, queryset, view)
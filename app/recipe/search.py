@@ -0,0 +1,170 @@
+"""
+Full text search for recipes
+"""
+import re
+import threading
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import BooleanField, Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+
+from core.models import Recipe
+
+
+SEARCH_CONFIG = 'english'
+
+# Ranks are scaled to integers so cursor pagination can compare them.
+RANK_SCALE = 1000000
+
+# Field weights of the in-process index, matching the ts_rank defaults
+# for the A (title), B (tags and ingredients) and C (description) labels.
+TITLE_WEIGHT = 1.0
+NAME_WEIGHT = 0.4
+DESCRIPTION_WEIGHT = 0.2
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lower case search terms"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+    """In-process inverted index of one user's recipes"""
+
+    def __init__(self):
+        self.postings = defaultdict(lambda: defaultdict(float))
+
+    def add(self, recipe_id, text, weight):
+        """Index the terms of text for recipe_id with weight"""
+        for term in tokenize(text):
+            self.postings[term][recipe_id] += weight
+
+    def search(self, query):
+        """Return a recipe id to score map of recipes matching every term"""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        matches = None
+        for term in terms:
+            postings = self.postings.get(term, {})
+            if matches is None:
+                matches = set(postings)
+            else:
+                matches &= set(postings)
+
+        return {
+            recipe_id: sum(self.postings[term][recipe_id] for term in terms)
+            for recipe_id in matches
+        }
+
+
+# Least recently used last. A user's generation changes whenever their
+# index is invalidated, so a build that raced a write isn't cached.
+_indexes = OrderedDict()
+_generations = defaultdict(int)
+_indexes_lock = threading.Lock()
+
+
+def _drop_user_index(user_id):
+    """Drop the index of a user and discard the builds in progress"""
+    with _indexes_lock:
+        _generations[user_id] += 1
+        _indexes.pop(user_id, None)
+
+
+def invalidate_user_index(user_id):
+    """Drop the in-process index of a user so it is rebuilt on next use
+
+    It is dropped again when the current transaction commits, as indexes
+    built before then read the rows as they were before the write.
+    """
+    _drop_user_index(user_id)
+    transaction.on_commit(lambda: _drop_user_index(user_id))
+
+
+def build_user_index(user_id, using):
+    """Build the in-process index of a user's recipes"""
+    index = InvertedIndex()
+    recipes = Recipe.objects.using(using).filter(user_id=user_id)
+    for recipe_id, title, description in recipes.values_list(
+        'id',
+        'title',
+        'description',
+    ):
+        index.add(recipe_id, title, TITLE_WEIGHT)
+        index.add(recipe_id, description, DESCRIPTION_WEIGHT)
+    for field_name in ['tags', 'ingredients']:
+        links = getattr(Recipe, field_name).through.objects.using(using)
+        item = getattr(Recipe, field_name).field.m2m_reverse_field_name()
+        for recipe_id, name in links.filter(
+            recipe__user_id=user_id,
+        ).values_list('recipe_id', f'{item}__name'):
+            index.add(recipe_id, name, NAME_WEIGHT)
+
+    return index
+
+
+def get_user_index(user_id, using):
+    """Return the in-process index of a user, building it when missing"""
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            _indexes.move_to_end(user_id)
+            return index
+        generation = _generations.get(user_id, 0)
+
+    index = build_user_index(user_id, using)
+    with _indexes_lock:
+        if _generations.get(user_id, 0) == generation:
+            _indexes[user_id] = index
+            while len(_indexes) > settings.SEARCH_INDEX['MAX_USERS']:
+                _indexes.popitem(last=False)
+
+    return index
+
+
+def _search_postgresql(queryset, query):
+    """Filter and rank recipes with the indexed search vector"""
+    vector = f'{Recipe._meta.db_table}.search_vector'
+    tsquery = 'websearch_to_tsquery(%s, %s)'
+    params = (SEARCH_CONFIG, query)
+
+    return queryset.filter(
+        RawSQL(f'{vector} @@ {tsquery}', params, output_field=BooleanField())
+    ).annotate(search_rank=RawSQL(
+        f'(ts_rank({vector}, {tsquery}) * {RANK_SCALE})::bigint',
+        params,
+        output_field=IntegerField(),
+    ))
+
+
+def _search_index(queryset, query, user_id):
+    """Filter and rank recipes with the in-process inverted index"""
+    scores = get_user_index(user_id, queryset.db).search(query)
+
+    return queryset.filter(pk__in=scores).annotate(search_rank=Case(
+        *[
+            When(pk=recipe_id, then=Value(round(score * RANK_SCALE)))
+            for recipe_id, score in scores.items()
+        ],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def search_recipes(queryset, query, user_id):
+    """Return the recipes of user_id matching query, ranked as search_rank
+
+    PostgreSQL uses the trigger maintained search_vector column and its
+    GIN index. Other databases fall back to an in-process inverted index.
+    """
+    queryset = queryset.filter(user_id=user_id)
+    if connections[queryset.db].vendor == 'postgresql':
+        return _search_postgresql(queryset, query)
+
+    return _search_index(queryset, query, user_id)
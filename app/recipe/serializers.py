@@ -1,16 +1,45 @@
 """
 Serilaizers for RECIPE APIS
 """
+from django.db import connection, transaction
+from django.db.models.fields.files import FieldFile
+
+from drf_spectacular.utils import extend_schema_field
+from drf_spectacular.types import OpenApiTypes
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
 )
+from recipe import images
+from recipe.search import invalidate_user_index
+
+
+class RecipeAttrSerializer(serializers.ModelSerializer):
+    """Base serializer for items attached to recipes by name"""
 
+    def validate_name(self, value):
+        """Reject renaming an item to a name the user already has"""
+        if self.root is not self:
+            return value
 
-class IngredientSerializer(serializers.ModelSerializer):
+        items = self.Meta.model.objects.filter(
+            user=self.context['request'].user,
+            name=value,
+        )
+        if self.instance is not None:
+            items = items.exclude(pk=self.instance.pk)
+        if items.exists():
+            raise serializers.ValidationError('This name is already in use.')
+
+        return value
+
+
+class IngredientSerializer(RecipeAttrSerializer):
     """Serilazer for Ingredients"""
 
     class Meta:
@@ -19,7 +48,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(RecipeAttrSerializer):
     """Serilazer for Tags"""
 
     class Meta:
@@ -28,7 +57,175 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeAttrBulkRenameSerializer(serializers.ListSerializer):
+    """Serializer validating a batch of renames together"""
+    max_length = 500
+
+    def validate(self, attrs):
+        """Reject unknown ids and names that are used twice"""
+        if not attrs:
+            raise serializers.ValidationError('Expected at least one item.')
+        if len(attrs) > self.max_length:
+            raise serializers.ValidationError(
+                f'Ensure this list has at most {self.max_length} items.'
+            )
+
+        names = {item['id']: item['name'] for item in attrs}
+        if len(names) != len(attrs):
+            raise serializers.ValidationError('Each id can be renamed once.')
+        if len(set(names.values())) != len(names):
+            raise serializers.ValidationError('Each name can be used once.')
+
+        items = self.child.Meta.model.objects.filter(
+            user=self.context['request'].user,
+        )
+        unknown = set(names) - set(
+            items.filter(pk__in=names).values_list('id', flat=True)
+        )
+        if unknown:
+            raise serializers.ValidationError(
+                f'Unknown ids: {", ".join(map(str, sorted(unknown)))}.'
+            )
+        conflicts = [
+            name
+            for pk, name in items.filter(
+                name__in=names.values(),
+            ).values_list('id', 'name')
+            if names.get(pk) != name
+        ]
+        if conflicts:
+            raise serializers.ValidationError(
+                f'Names already in use: {", ".join(sorted(conflicts))}.'
+            )
+
+        return attrs
+
+
+class RecipeAttrRenameSerializer(RecipeAttrSerializer):
+    """Base serializer renaming items by id in bulk"""
+    id = serializers.IntegerField()
+
+    class Meta:
+        fields = ['id', 'name']
+        list_serializer_class = RecipeAttrBulkRenameSerializer
+
+
+class IngredientRenameSerializer(RecipeAttrRenameSerializer):
+    """Serilazer for renaming Ingredients in bulk"""
+
+    class Meta(RecipeAttrRenameSerializer.Meta):
+        model = Ingredient
+
+
+class TagRenameSerializer(RecipeAttrRenameSerializer):
+    """Serilazer for renaming Tags in bulk"""
+
+    class Meta(RecipeAttrRenameSerializer.Meta):
+        model = Tag
+
+
+class RecipeAttrBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for deleting items by id in bulk"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=500,
+    )
+
+
+class IngredientRecipeCountSerializer(IngredientSerializer):
+    """Serializer for Ingredients with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+
+
+class TagRecipeCountSerializer(TagSerializer):
+    """Serializer for Tags with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+
+
+class RecipeBulkSerializer(serializers.ListSerializer):
+    """Serializer creating a batch of recipes together"""
+    max_length = 500
+
+    def to_internal_value(self, data):
+        """Reject oversized batches before validating every recipe"""
+        if isinstance(data, list) and len(data) > self.max_length:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Ensure this list has at most {self.max_length} items.'
+                ],
+            })
+
+        return super().to_internal_value(data)
+
+    def _insert_recipes(self, recipes):
+        """Insert recipes, one by one if the database can't return ids"""
+        if connection.features.can_return_rows_from_bulk_insert:
+            return Recipe.objects.bulk_create(recipes)
+
+        for recipe in recipes:
+            recipe.save(force_insert=True)
+
+        return recipes
+
+    def _link(self, through, field, manager, recipes, items):
+        """Resolve the item names of the whole batch and link them"""
+        user = self.context['request'].user
+        item_ids = manager.get_or_create_names(
+            user,
+            [item['name'] for recipe_items in items for item in recipe_items],
+        )
+        through.objects.bulk_create([
+            through(recipe_id=recipe.id, **{field: item_id})
+            for recipe, recipe_items in zip(recipes, items)
+            for item_id in {item_ids[item['name']] for item in recipe_items}
+        ])
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create Recipes"""
+        user = self.context['request'].user
+        tags = [item.pop('tags', []) for item in validated_data]
+        ingredients = [item.pop('ingredients', []) for item in validated_data]
+        recipes = self._insert_recipes([
+            Recipe(user=user, **item) for item in validated_data
+        ])
+        self._link(
+            Recipe.tags.through,
+            'tag_id',
+            Tag.objects,
+            recipes,
+            tags,
+        )
+        self._link(
+            Recipe.ingredients.through,
+            'ingredient_id',
+            Ingredient.objects,
+            recipes,
+            ingredients,
+        )
+        invalidate_user_index(user.id)
+
+        return recipes
+
+
+class SparseFieldsMixin:
+    """Keep only the fields named in the fields argument"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serialzer for recipes"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -39,26 +236,68 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'tags', 'ingredients']
         read_only_fields = ['id']
 
+    def to_representation(self, instance):
+        """Add the requested image variant to list responses"""
+        data = super().to_representation(instance)
+        if not self.context.get('image_size'):
+            return data
+
+        return self._add_image_size(data, instance.image)
+
+    def fast_columns(self):
+        """Return the extra columns fast_to_representation reads"""
+        return ['image'] if self.context.get('image_size') else []
+
+    def fast_to_representation(self, data, row):
+        """Finish the data of a values() row like to_representation"""
+        if not self.context.get('image_size'):
+            return data
+
+        image = FieldFile(None, Recipe._meta.get_field('image'), row['image'])
+        return self._add_image_size(data, image)
+
+    def _add_image_size(self, data, image):
+        """Set the URL of the requested image variant of image on data"""
+        image_size = self.context.get('image_size')
+        if image_size:
+            data['image'] = images.variant_url(
+                image,
+                image_size,
+                self.context.get('request'),
+            )
+
+        return data
+
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed"""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        tag_ids = Tag.objects.get_or_create_names(
+            auth_user,
+            [tag['name'] for tag in tags],
+        )
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for tag_id in tag_ids.values()
+        ])
+        invalidate_user_index(recipe.user_id)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed"""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
+        ingredient_ids = Ingredient.objects.get_or_create_names(
+            auth_user,
+            [ingredient['name'] for ingredient in ingredients],
+        )
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient_id,
             )
-            recipe.ingredients.add(ingredient_obj)
+            for ingredient_id in ingredient_ids.values()
+        ])
+        invalidate_user_index(recipe.user_id)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create Recipe"""
         tags = validated_data.pop('tags', [])
@@ -69,6 +308,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update recipe."""
         tags = validated_data.pop('tags', None)
@@ -88,18 +328,32 @@ class RecipeSerializer(serializers.ModelSerializer):
         return instance
 
 
-class RecipeDetailSerializer(RecipeSerializer):
+class RecipeImageVariantsMixin(serializers.Serializer):
+    """Add the URLs of the resized recipe image variants"""
+    image_variants = serializers.SerializerMethodField()
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_image_variants(self, recipe):
+        return images.variant_urls(recipe.image, self.context.get('request'))
+
+
+class RecipeDetailSerializer(RecipeImageVariantsMixin, RecipeSerializer):
     """Serialzer for recipe detail view"""
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description',
+            'image',
+            'image_variants',
+        ]
 
 
-class RecipeImageSerialzer(serializers.ModelSerializer):
+class RecipeImageSerialzer(RecipeImageVariantsMixin,
+                           serializers.ModelSerializer):
     """Serializer for uploading images to Recipes"""
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_variants']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
@@ -0,0 +1,41 @@
+"""
+Signal handlers for the Recipe APIs
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from core import jobs
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.search import invalidate_user_index
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_search_index(sender, instance, **kwargs):
+    """Drop the search index of the user owning a changed item"""
+    invalidate_user_index(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_search_index(sender, instance, **kwargs):
+    """Drop the search index of a created or deleted user"""
+    invalidate_user_index(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """Release the image of a deleted recipe"""
+    if instance.image:
+        jobs.enqueue('recipe.release_image', {'name': instance.image.name})
@@ -0,0 +1,217 @@
+"""
+Tests for the async recipe read views
+"""
+import asyncio
+import threading
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core.db.routers import get_read_alias
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.views import RecipeViewSet
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+        'link': 'http://example.com/recipe.pdf',
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class AsyncRecipeApiTests(TransactionTestCase):
+    """Test the threaded ASGI read views against the sync API
+
+    The views query from worker threads with their own connections, so
+    the test data has to be committed. They read from the replicas when
+    some are configured.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt'),
+        )
+        self.recipe = create_recipe(user=self.user, title='Second')
+
+    async def _get(self, name, *args, **extra):
+        """Return an async view's response"""
+        extra.setdefault('AUTHORIZATION', f'Token {self.token.key}')
+        return await self.async_client.get(
+            reverse(f'recipe:{name}', args=args),
+            **extra,
+        )
+
+    async def test_list_and_detail_match_sync_api(self):
+        """Test the async views return the sync views' data"""
+        for async_name, sync_name, args in [
+            ('async-recipe-list', 'recipe-list', []),
+            ('async-recipe-detail', 'recipe-detail', [self.recipe.id]),
+            ('async-tag-list', 'tag-list', []),
+            ('async-ingredient-list', 'ingredient-list', []),
+        ]:
+            res = await self._get(async_name, *args)
+            expected = await sync_to_async(self.client.get)(
+                reverse(f'recipe:{sync_name}', args=args),
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.json(), expected.json())
+
+    async def test_query_parameters(self):
+        """Test filters and sparse fields apply to the async list"""
+        url = reverse('recipe:async-recipe-list')
+        res = await self.async_client.get(
+            f'{url}?fields=id,title&search=Second',
+            AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+        self.assertEqual(
+            res.json()['results'],
+            [{'id': self.recipe.id, 'title': 'Second'}],
+        )
+
+    async def test_conditional_list(self):
+        """Test the async list answers conditional requests"""
+        res = await self._get('async-recipe-list')
+
+        res = await self._get('async-recipe-list', IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_authentication_required(self):
+        """Test the async views need a valid token"""
+        res = await self._get('async-recipe-list', AUTHORIZATION='')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+        res = await self._get('async-recipe-list', AUTHORIZATION='Token bad')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.json(), {'detail': 'Invalid token.'})
+
+    async def test_token_resolved_once(self):
+        """Test the token is looked up once, then served from the cache"""
+        with patch.object(
+            CachedTokenAuthentication,
+            'authenticate_credentials',
+            autospec=True,
+            side_effect=CachedTokenAuthentication.authenticate_credentials,
+        ) as mock_authenticate:
+            await self._get('async-recipe-list')
+            await self._get('async-recipe-list')
+
+        self.assertEqual(mock_authenticate.call_count, 1)
+
+    async def test_requests_run_concurrently(self):
+        """Test requests are handled in parallel worker threads"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait_for_each_other(viewset, request, *args, **kwargs):
+            barrier.wait()
+            return Response([])
+
+        with patch.object(
+            RecipeViewSet,
+            'list',
+            autospec=True,
+            side_effect=wait_for_each_other,
+        ):
+            responses = await asyncio.gather(
+                self._get('async-recipe-list'),
+                self._get('async-recipe-list'),
+            )
+
+        self.assertEqual(
+            [res.status_code for res in responses],
+            [status.HTTP_200_OK, status.HTTP_200_OK],
+        )
+
+    def _read_aliases(self):
+        """Record the replica and database each recipe list reads from"""
+        aliases = []
+        list_recipes = RecipeViewSet.list
+
+        def record_alias(viewset, request, *args, **kwargs):
+            aliases.append((get_read_alias(), Recipe.objects.all().db))
+            return list_recipes(viewset, request, *args, **kwargs)
+
+        patcher = patch.object(
+            RecipeViewSet,
+            'list',
+            autospec=True,
+            side_effect=record_alias,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        return aliases
+
+    async def test_worker_thread_reads_replica(self):
+        """Test the worker thread reads from the replica of the request
+
+        The primary stands in for the replica, only the request sees it as
+        one so the test database can still be flushed.
+        """
+        aliases = self._read_aliases()
+
+        with override_settings(DATABASE_REPLICAS={
+            **settings.DATABASE_REPLICAS,
+            'ALIASES': ['default'],
+        }):
+            res = await self._get('async-recipe-list')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(aliases, [('default', 'default')])
+        self.assertIsNone(get_read_alias())
+
+    @unittest.skipUnless(
+        settings.DATABASE_REPLICAS['ALIASES'],
+        'No replicas are configured',
+    )
+    async def test_configured_replica_read(self):
+        """Test the async list reads from a configured replica"""
+        aliases = self._read_aliases()
+
+        res = await self._get('async-recipe-list')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.json()['results']), 2)
+        replica, database = aliases[0]
+        self.assertIn(replica, settings.DATABASE_REPLICAS['ALIASES'])
+        self.assertEqual(database, replica)
@@ -0,0 +1,260 @@
+"""
+Tests for the Recipe management commands
+"""
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+
+from core.models import ImportCheckpoint, Recipe, Tag
+from recipe.images import VARIANTS, release_image, variant_name
+from recipe.management.commands.import_recipes import (
+    Command as ImportCommand,
+)
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """Tests for the explain_queries command"""
+
+    def test_explain_seeded_queries(self):
+        """Test plans are printed for every endpoint and seed rolled back"""
+        out = StringIO()
+
+        call_command('explain_queries', seed=20, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Recipe list filtered by tags', output)
+        self.assertIn('Tag name lookup', output)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_explain_without_users_error(self):
+        """Test explaining without data asks for a seed"""
+        with self.assertRaises(CommandError):
+            call_command('explain_queries')
+
+
+class GenerateImageVariantsCommandTests(TestCase):
+    """Tests for the generate_image_variants command"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='test@example.com')
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='PNG')
+        self.recipe = Recipe.objects.create(
+            user=user,
+            title='Sample Recipe',
+            time_minutes=5,
+            price=Decimal('5.00'),
+            image=SimpleUploadedFile('old.png', buffer.getvalue()),
+        )
+        Recipe.objects.create(
+            user=user,
+            title='No image',
+            time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+    def tearDown(self):
+        release_image(self.recipe.image.storage, self.recipe.image.name)
+
+    def test_generate_missing_variants(self):
+        """Test variants are generated for images without them"""
+        out = StringIO()
+
+        call_command('generate_image_variants', stdout=out)
+        call_command('generate_image_variants', stdout=out)
+
+        storage = self.recipe.image.storage
+        for variant in VARIANTS:
+            self.assertTrue(storage.exists(
+                variant_name(self.recipe.image.name, variant)
+            ))
+        self.assertIn('Generated variants for 1 recipe images', out.getvalue())
+        self.assertIn('Generated variants for 0 recipe images', out.getvalue())
+
+    def test_force_regenerates_variants(self):
+        """Test --force rewrites variants that already exist"""
+        storage = self.recipe.image.storage
+        call_command('generate_image_variants', stdout=StringIO())
+        thumbnail = storage.path(
+            variant_name(self.recipe.image.name, 'thumbnail')
+        )
+        with open(thumbnail, 'wb') as stale:
+            stale.write(b'stale')
+        out = StringIO()
+
+        call_command('generate_image_variants', force=True, stdout=out)
+
+        with Image.open(thumbnail) as img:
+            self.assertEqual(img.format, 'JPEG')
+        self.assertIn('Generated variants for 1 recipe images', out.getvalue())
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Tests for the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+        )
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name, content):
+        """Write an import file and return its path"""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+
+        return path
+
+    def _ndjson(self, count):
+        """Return count NDJSON recipes sharing a tag"""
+        return ''.join(
+            json.dumps({
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '2.50',
+                'tags': [{'name': 'Dinner'}, f'Tag {i}'],
+                'ingredients': ['Salt'],
+            }) + '\n'
+            for i in range(count)
+        )
+
+    def test_import_ndjson(self):
+        """Test importing NDJSON recipes with their relations"""
+        path = self._write('recipes.ndjson', self._ndjson(5))
+        out = StringIO()
+
+        call_command(
+            'import_recipes', path,
+            user='test@example.com', batch_size=2, stdout=out,
+        )
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [recipe.title for recipe in recipes],
+            [f'Recipe {i}' for i in range(5)],
+        )
+        self.assertEqual(
+            sorted(tag.name for tag in recipes[3].tags.all()),
+            ['Dinner', 'Tag 3'],
+        )
+        self.assertEqual(
+            [ing.name for ing in recipes[4].ingredients.all()],
+            ['Salt'],
+        )
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('Imported 5 recipes', out.getvalue())
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_csv(self):
+        """Test importing CSV recipes with | separated names"""
+        path = self._write(
+            'recipes.csv',
+            'title,time_minutes,price,link,tags,ingredients\n'
+            'Soup,20,4.25,,Dinner|Vegan,Salt|Water\n',
+        )
+
+        call_command(
+            'import_recipes', path, user='test@example.com', stdout=StringIO(),
+        )
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Soup')
+        self.assertEqual(recipe.price, Decimal('4.25'))
+        self.assertEqual(recipe.description, '')
+        self.assertEqual(
+            sorted(ing.name for ing in recipe.ingredients.all()),
+            ['Salt', 'Water'],
+        )
+
+    def test_import_resume(self):
+        """Test a resumed import skips the rows already imported"""
+        path = self._write('recipes.ndjson', self._ndjson(4))
+        ImportCheckpoint.objects.create(name=path, rows=3)
+
+        call_command(
+            'import_recipes', path,
+            user='test@example.com', resume=True, stdout=StringIO(),
+        )
+
+        self.assertEqual(
+            [recipe.title for recipe in Recipe.objects.all()],
+            ['Recipe 3'],
+        )
+
+    def test_import_invalid_row_keeps_checkpoint(self):
+        """Test an invalid row stops the import after the last batch"""
+        lines = self._ndjson(3).splitlines()
+        lines[2] = json.dumps({'title': 'Bad', 'time_minutes': 'soon'})
+        path = self._write('recipes.ndjson', '\n'.join(lines))
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_recipes', path,
+                user='test@example.com', batch_size=2, stdout=StringIO(),
+            )
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get(name=path).rows, 2)
+
+    def test_checkpoint_committed_with_batch(self):
+        """Test a failed checkpoint write rolls back its batch too"""
+        path = self._write('recipes.ndjson', self._ndjson(4))
+        write_checkpoint = ImportCommand._write_checkpoint
+
+        def fail_second_batch(command, checkpoint, rows):
+            write_checkpoint(command, checkpoint, rows)
+            if rows > 2:
+                raise RuntimeError('Crashed before commit')
+
+        with patch.object(
+            ImportCommand,
+            '_write_checkpoint',
+            autospec=True,
+            side_effect=fail_second_batch,
+        ), self.assertRaises(RuntimeError):
+            call_command(
+                'import_recipes', path,
+                user='test@example.com', batch_size=2, stdout=StringIO(),
+            )
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get(name=path).rows, 2)
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    """Tests for the load_test command"""
+
+    def test_load_test(self):
+        """Test both apps are measured and the test user is removed"""
+        out = StringIO()
+
+        call_command(
+            'load_test',
+            requests=6,
+            concurrency=3,
+            recipes=3,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('wsgi', output)
+        self.assertIn('asgi', output)
+        self.assertEqual(output.count(' 0 errors'), 2)
+        self.assertFalse(get_user_model().objects.exists())
@@ -0,0 +1,168 @@
+"""
+Tests for conditional GETs on the Recipe APIs
+"""
+from decimal import Decimal
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+from recipe.images import release_image
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Create the url for the detail recipe URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a test recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 35,
+        'price': Decimal('80.65'),
+        'link': 'https://examplelink.com',
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_user(email='test@example.com', password='password'):
+    """Create and return a test user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class ConditionalGetTests(TestCase):
+    """Tests for ETag and If-None-Match handling"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def assertNotModified(self, url, etag, params=None):
+        """Assert a conditional GET of url returns 304 with one query"""
+        with self.assertNumQueries(1):
+            res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag.replace('W/', ''))
+        self.assertEqual(res.content, b'')
+
+    def assertModified(self, url, etag):
+        """Assert a conditional GET of url returns a fresh body"""
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_not_modified(self):
+        """Test listing recipes with a matching ETag returns 304"""
+        create_recipe(self.user)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotModified(RECIPES_URL, res['ETag'])
+        self.assertNotModified(RECIPES_URL, f'W/{res["ETag"]}')
+
+    def test_etag_depends_on_query(self):
+        """Test different query strings get different ETags"""
+        res1 = self.client.get(RECIPES_URL)
+        res2 = self.client.get(RECIPES_URL, {'page_size': 1})
+
+        self.assertNotEqual(res1['ETag'], res2['ETag'])
+        self.assertNotModified(RECIPES_URL, res2['ETag'], {'page_size': 1})
+
+    def test_create_recipe_modifies(self):
+        """Test creating a recipe changes the ETag"""
+        res = self.client.get(RECIPES_URL)
+
+        payload = {
+            'title': 'New Recipe',
+            'time_minutes': 5,
+            'price': '5.00',
+            'link': 'https://examplelink.com',
+        }
+        self.client.post(RECIPES_URL, payload)
+
+        self.assertModified(RECIPES_URL, res['ETag'])
+
+    def test_update_and_delete_recipe_modify(self):
+        """Test updating and deleting a recipe change the ETag"""
+        recipe = create_recipe(self.user)
+        url = detail_url(recipe.id)
+        res = self.client.get(url)
+        self.assertNotModified(url, res['ETag'])
+
+        self.client.patch(url, {'title': 'New title'})
+        self.assertModified(url, res['ETag'])
+
+        res = self.client.get(RECIPES_URL)
+        self.client.delete(url)
+        self.assertModified(RECIPES_URL, res['ETag'])
+
+    def test_upload_image_modifies(self):
+        """Test uploading a recipe image changes the ETag"""
+        recipe = create_recipe(self.user)
+        url = detail_url(recipe.id)
+        res = self.client.get(url)
+
+        upload_url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(
+                upload_url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.assertModified(url, res['ETag'])
+        recipe.refresh_from_db()
+        release_image(recipe.image.storage, recipe.image.name)
+
+    def test_tag_writes_modify(self):
+        """Test updating and deleting tags change the ETags"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tag_url = reverse('recipe:tag-detail', args=[tag.id])
+        res = self.client.get(TAGS_URL)
+        recipes_res = self.client.get(RECIPES_URL)
+        self.assertNotModified(TAGS_URL, res['ETag'])
+
+        self.client.patch(tag_url, {'name': 'Vegetarian'})
+        self.assertModified(TAGS_URL, res['ETag'])
+        self.assertModified(RECIPES_URL, recipes_res['ETag'])
+
+        res = self.client.get(TAGS_URL)
+        self.client.delete(tag_url)
+        self.assertModified(TAGS_URL, res['ETag'])
+
+    def test_other_user_writes_do_not_modify(self):
+        """Test another user's writes keep the ETag valid"""
+        res = self.client.get(RECIPES_URL)
+
+        other_client = APIClient()
+        other_client.force_authenticate(create_user(email='o@example.com'))
+        payload = {
+            'title': 'New Recipe',
+            'time_minutes': 5,
+            'price': '5.00',
+            'link': 'https://examplelink.com',
+        }
+        other_client.post(RECIPES_URL, payload)
+
+        self.assertNotModified(RECIPES_URL, res['ETag'])
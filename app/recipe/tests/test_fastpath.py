@@ -0,0 +1,171 @@
+"""
+Tests for the fast read path of the list endpoints
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.fastpath import FastRepresentation
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+from recipe.views import (
+    RecipeViewSet,
+    TagViewSet,
+    IngredientViewSet,
+)
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class FastListEquivalenceTests(TestCase):
+    """Test the fast path renders the same bytes as the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password',
+        )
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Vegan', 'Dinner', 'Dessert', 'Unused']
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Salt', 'Sugar', 'Flour']
+        ]
+        for i in range(7):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i} with "quotes" and ünïcode',
+                description='Sweet soup' if i % 2 else '',
+                time_minutes=i * 5,
+                price=Decimal(i) + Decimal('0.5'),
+                link='' if i % 3 else f'https://example.com/{i}',
+            )
+            recipe.tags.add(*tags[i % 3:3])
+            recipe.ingredients.add(*ingredients[:i % 4])
+        Recipe.objects.filter(title__startswith='Recipe 3').update(
+            image='uploads/recipe/ab/cd/abcd.jpg',
+        )
+        self.tag_id = tags[0].id
+
+    def assertSameContent(self, viewset, url, params=None):
+        """Assert the fast and serializer paths render the same bytes"""
+        fast = self.client.get(url, params)
+        with patch.object(viewset, 'fast_list', False):
+            slow = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+        return fast
+
+    def test_recipe_list_equivalent(self):
+        """Test recipe lists match for every supported parameter"""
+        for params in [
+            {},
+            {'tags': str(self.tag_id)},
+            {'tags': str(self.tag_id), 'match': 'all'},
+            {'search': 'soup'},
+            {'image_size': 'thumbnail'},
+            {'fields': 'id,price,link'},
+            {'expand': 'ingredients'},
+            {'fields': 'title', 'expand': 'tags,ingredients'},
+        ]:
+            with self.subTest(params=params):
+                self.assertSameContent(RecipeViewSet, RECIPES_URL, params)
+
+    def test_recipe_pages_equivalent(self):
+        """Test paginated recipe lists and their cursors match"""
+        res = self.assertSameContent(
+            RecipeViewSet,
+            RECIPES_URL,
+            {'page_size': 3},
+        )
+
+        self.assertSameContent(RecipeViewSet, res.data['next'])
+
+    def test_tag_and_ingredient_lists_equivalent(self):
+        """Test tag and ingredient lists match"""
+        for viewset, url in [
+            (TagViewSet, TAGS_URL),
+            (IngredientViewSet, INGREDIENTS_URL),
+        ]:
+            for params in [
+                {},
+                {'assigned_only': 1},
+                {'recipe_count': 1},
+            ]:
+                with self.subTest(url=url, params=params):
+                    self.assertSameContent(viewset, url, params)
+
+    def test_empty_list_equivalent(self):
+        """Test empty lists match"""
+        Recipe.objects.all().delete()
+
+        self.assertSameContent(RecipeViewSet, RECIPES_URL)
+
+    def test_fast_list_skips_model_instances(self):
+        """Test the fast path never builds model instances"""
+        for model in [Recipe, Tag, Ingredient]:
+            patcher = patch.object(
+                model,
+                'from_db',
+                side_effect=AssertionError,
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        res = self.client.get(RECIPES_URL, {'image_size': 'card'})
+
+        self.assertEqual(len(res.data['results']), 7)
+
+    def test_unsupported_serializer(self):
+        """Test serializers with method fields are left to DRF"""
+        queryset = Recipe.objects.all()
+
+        self.assertTrue(
+            FastRepresentation(RecipeSerializer(), queryset).supported
+        )
+        self.assertFalse(
+            FastRepresentation(RecipeDetailSerializer(), queryset).supported
+        )
+
+    def test_overridden_representation_unsupported(self):
+        """Test serializers changing to_representation are left to DRF"""
+
+        class TitleSerializer(RecipeSerializer):
+            def to_representation(self, instance):
+                data = super().to_representation(instance)
+                data['title'] = data['title'].upper()
+                return data
+
+        self.assertFalse(
+            FastRepresentation(TitleSerializer(), Recipe.objects.all())
+            .supported
+        )
+
+        with patch.object(
+            RecipeViewSet,
+            'get_serializer_class',
+            return_value=TitleSerializer,
+        ):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertTrue(all(
+            recipe['title'].isupper() for recipe in res.data['results']
+        ))
@@ -17,6 +17,8 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+BULK_UPDATE_URL = reverse('recipe:ingredient-bulk-update')
+BULK_DELETE_URL = reverse('recipe:ingredient-bulk-delete')
 
 
 def create_user(email='test@example.com', password='password'):
@@ -137,3 +139,66 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_update_ingredient_duplicate_name_error(self):
+        """Test renaming an ingredient to an existing name returns an error"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        ingredient = Ingredient.objects.create(user=self.user, name='Pepper')
+
+        url = detail_url(ingredient.id)
+        res = self.client.patch(url, {'name': 'Salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.name, 'Pepper')
+
+    def test_retrieve_ingredients_with_recipe_count(self):
+        """Test listing assigned ingredients with their recipe count"""
+        ing1 = Ingredient.objects.create(user=self.user, name='Ingredient 1')
+        Ingredient.objects.create(user=self.user, name='Ingredient 2')
+        recipe = Recipe.objects.create(
+            title='Recipe',
+            time_minutes=5,
+            price='5.05',
+            user=self.user,
+        )
+        recipe.ingredients.add(ing1)
+
+        params = {'assigned_only': 1, 'recipe_count': 1}
+        with self.assertNumQueries(2):
+            res = self.client.get(INGREDIENTS_URL, params)
+
+        self.assertEqual(res.data, [
+            {'id': ing1.id, 'name': ing1.name, 'recipe_count': 1},
+        ])
+
+    def test_bulk_rename_ingredients(self):
+        """Test renaming many ingredients in one request"""
+        ing1 = Ingredient.objects.create(user=self.user, name='salt')
+        ing2 = Ingredient.objects.create(user=self.user, name='pepper')
+        payload = [
+            {'id': ing1.id, 'name': 'Salt'},
+            {'id': ing2.id, 'name': 'pepper'},
+        ]
+
+        res = self.client.post(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ing1.refresh_from_db()
+        ing2.refresh_from_db()
+        self.assertEqual([ing1.name, ing2.name], ['Salt', 'pepper'])
+
+    def test_bulk_delete_ingredients(self):
+        """Test deleting many ingredients in one request"""
+        ing1 = Ingredient.objects.create(user=self.user, name='salt')
+        ing2 = Ingredient.objects.create(user=self.user, name='pepper')
+
+        res = self.client.post(
+            BULK_DELETE_URL,
+            {'ids': [ing1.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 1})
+        self.assertEqual(list(Ingredient.objects.all()), [ing2])
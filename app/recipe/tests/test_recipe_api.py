@@ -2,30 +2,46 @@
 Tests for the Recipe APIS
 """
 from decimal import Decimal
+from unittest.mock import patch
+import json
 import tempfile
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import jobs
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
+    Job,
+    StoredFile,
 )
 
+from recipe.images import (
+    VARIANTS,
+    release_image,
+    variant_name,
+)
 from recipe.serializers import (
+    RecipeBulkSerializer,
     RecipeSerializer,
     RecipeDetailSerializer
 )
+from recipe.views import RecipeViewSet
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def detail_url(recipe_id):
@@ -89,7 +105,7 @@ class PrivateRecipeAPITests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         selializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, selializer.data)
+        self.assertEqual(res.data['results'], selializer.data)
 
     def test_retrieve_recipes_limited_to_user(self):
         """Test retrievinng recipes is limited to authenticated user"""
@@ -103,7 +119,7 @@ class PrivateRecipeAPITests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         selializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, selializer.data)
+        self.assertEqual(res.data['results'], selializer.data)
 
     def test_get_recipe_detail(self):
         """Test revrieving recipe detail"""
@@ -410,9 +426,9 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test Filtering recipes by ingredients"""
@@ -430,9 +446,148 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_all_tags(self):
+        """Test filtering recipes having every requested tag"""
+        tag1 = Tag.objects.create(user=self.user, name='Tag 1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag 2')
+        r1 = create_recipe(user=self.user, title='Recipe 1')
+        r1.tags.add(tag1, tag2)
+        r2 = create_recipe(user=self.user, title='Recipe 2')
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_by_all_tags_and_ingredients(self):
+        """Test match all applies to both tags and ingredients"""
+        tag = Tag.objects.create(user=self.user, name='Tag 1')
+        ing1 = Ingredient.objects.create(user=self.user, name='ingredient 1')
+        ing2 = Ingredient.objects.create(user=self.user, name='ingredient 2')
+        r1 = create_recipe(user=self.user, title='Recipe 1')
+        r1.tags.add(tag)
+        r1.ingredients.add(ing1, ing2)
+        r2 = create_recipe(user=self.user, title='Recipe 2')
+        r2.ingredients.add(ing1, ing2)
+        r3 = create_recipe(user=self.user, title='Recipe 3')
+        r3.tags.add(tag)
+        r3.ingredients.add(ing1)
+
+        params = {
+            'tags': f'{tag.id}',
+            'ingredients': f'{ing1.id},{ing2.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_by_tags_returns_unique_recipes(self):
+        """Test a recipe matching several tags is listed once"""
+        tag1 = Tag.objects.create(user=self.user, name='Tag 1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag 2')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertNotIn('DISTINCT', ctx.captured_queries[1]['sql'])
+
+    def test_filter_invalid_ids_error(self):
+        """Test filtering with malformed ids returns an error"""
+        for params in [
+            {'tags': '1,abc'},
+            {'ingredients': '1,,2'},
+            {'tags': '1', 'match': 'some'},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipePaginationTests(TestCase):
+    """Tests for paginating the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='password')
+        self.client.force_authenticate(self.user)
+
+    def test_paginated_response(self):
+        """Test listing recipes returns a cursor paginated page"""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', res.data)
+        self.assertIsNone(res.data['previous'])
+        self.assertIsNotNone(res.data['next'])
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipes[4].id, recipes[3].id])
+
+    def test_follow_next_cursor(self):
+        """Test walking every page returns every recipe once"""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        ids = []
+        url = RECIPES_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_page_skips_count_query(self):
+        """Test a page is fetched without counting every recipe"""
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(res.data['next'])
+
+        for query in ctx.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_paginate_filtered_recipes(self):
+        """Test paginating recipes filtered by tags"""
+        tag1 = Tag.objects.create(user=self.user, name='Tag 1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag 2')
+        tagged = []
+        for i in range(3):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag1, tag2)
+            tagged.append(recipe)
+        create_recipe(user=self.user, title='Untagged')
+
+        ids = []
+        url = RECIPES_URL + f'?page_size=2&tags={tag1.id},{tag2.id}'
+        while url:
+            res = self.client.get(url)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(tagged)])
 
 
 class ImageUploadTest(TestCase):
@@ -445,7 +600,22 @@ class ImageUploadTest(TestCase):
         self.recipe = create_recipe(user=self.user)
 
     def tearDown(self):
-        self.recipe.image.delete()
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            release_image(self.recipe.image.storage, self.recipe.image.name)
+
+    def _upload_image(self, size=(10, 10)):
+        """Upload a JPEG image of size to the test recipe"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new('RGB', size)
+            img.save(image_file, format='JPEG')
+            image_file.seek(0)
+            payload = {'image': image_file}
+            res = self.client.post(url, payload, format='multipart')
+        jobs.run_pending()
+
+        return res
 
     def test_upload_image(self):
         """"Test uploading an image to a recipe"""
@@ -458,9 +628,69 @@ class ImageUploadTest(TestCase):
             res = self.client.post(url, payload, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        job = Job.objects.get(id=res.data['job'])
+        self.assertEqual(job.name, 'recipe.process_image')
+        self.assertEqual(job.user, self.user)
+        self.assertTrue(res['Location'].endswith(f'/api/job/jobs/{job.id}/'))
+
+    def test_upload_image_variants_generated_by_job(self):
+        """Test variants are generated by the queued job"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            res = self.client.post(
+                url,
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.recipe.refresh_from_db()
+        storage = self.recipe.image.storage
+        thumbnail = variant_name(self.recipe.image.name, 'thumbnail')
+        self.assertFalse(storage.exists(thumbnail))
+
+        self.assertEqual(jobs.run_pending(), 1)
+
+        self.assertTrue(storage.exists(thumbnail))
+        job = Job.objects.get(id=res.data['job'])
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'image': self.recipe.image.name})
+
+    def test_replace_image_releases_old_image(self):
+        """Test replacing an image releases the old file and variants"""
+        self._upload_image(size=(10, 10))
+        self.recipe.refresh_from_db()
+        old_image = self.recipe.image.name
+
+        self._upload_image(size=(20, 20))
+
+        storage = self.recipe.image.storage
+        self.assertFalse(storage.exists(old_image))
+        self.assertFalse(storage.exists(variant_name(old_image, 'card')))
+
+    def test_rerun_job_releases_old_image_once(self):
+        """Test a retried image job doesn't release the old image again"""
+        self._upload_image(size=(10, 10))
+        self.recipe.refresh_from_db()
+        old_image = self.recipe.image.name
+        storage = self.recipe.image.storage
+        StoredFile.objects.filter(name=old_image).update(reference_count=2)
+        self.addCleanup(release_image, storage, old_image)
+
+        self._upload_image(size=(20, 20))
+        job = Job.objects.filter(name='recipe.process_image').latest('id')
+        Job.objects.filter(pk=job.pk).update(status=Job.QUEUED)
+        self.assertEqual(jobs.run_pending(), 1)
+
+        self.assertEqual(
+            StoredFile.objects.get(name=old_image).reference_count,
+            1,
+        )
+        self.assertTrue(storage.exists(old_image))
 
     def test_upload_image_bad_request(self):
         """"Test uploading an invalid image to a recipe"""
@@ -469,3 +699,450 @@ class ImageUploadTest(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_generates_variants(self):
+        """Test uploading an image stores a resized JPEG per variant"""
+        res = self._upload_image(size=(2000, 1000))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(set(res.data['image_variants']), set(VARIANTS))
+        for variant, (width, height) in VARIANTS.items():
+            path = self.recipe.image.storage.path(
+                variant_name(self.recipe.image.name, variant)
+            )
+            self.assertIn(
+                variant_name(self.recipe.image.name, variant),
+                res.data['image_variants'][variant],
+            )
+            with Image.open(path) as img:
+                self.assertEqual(img.format, 'JPEG')
+                self.assertEqual(img.size, (width, width // 2))
+
+    def test_detail_includes_variants(self):
+        """Test the recipe detail includes the image variant URLs"""
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertIsNone(res.data['image_variants'])
+
+        self._upload_image()
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.recipe.refresh_from_db()
+        self.assertTrue(res.data['image_variants']['card'].endswith(
+            variant_name(self.recipe.image.name, 'card')
+        ))
+
+    def test_list_image_size(self):
+        """Test listing recipes with the URL of one image variant"""
+        self._upload_image()
+        self.recipe.refresh_from_db()
+
+        res = self.client.get(RECIPES_URL)
+        self.assertNotIn('image', res.data['results'][0])
+
+        res = self.client.get(RECIPES_URL, {'image_size': 'thumbnail'})
+        self.assertTrue(res.data['results'][0]['image'].endswith(
+            variant_name(self.recipe.image.name, 'thumbnail')
+        ))
+
+        res = self.client.get(RECIPES_URL, {'image_size': 'huge'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeQueryCountTests(TestCase):
+    """Tests for the number of queries run by the recipe APIs"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='password')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """Create recipes with a tag and an ingredient each"""
+        recipes = []
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {recipe.id}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user,
+                    name=f'Ing {recipe.id}',
+                )
+            )
+            recipes.append(recipe)
+
+        return recipes
+
+    def test_list_query_count_independent_of_size(self):
+        """Test listing recipes runs a fixed number of queries"""
+        self._create_recipes(1)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+        self._create_recipes(20)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data['results']), 21)
+
+    def test_filtered_list_query_count(self):
+        """Test filtering recipes runs a fixed number of queries"""
+        recipes = self._create_recipes(5)
+        tag_ids = ','.join(str(r.tags.first().id) for r in recipes)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL, {'tags': tag_ids})
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_detail_query_count(self):
+        """Test retrieving a recipe runs a fixed number of queries"""
+        recipe = self._create_recipes(1)[0]
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_sparse_detail_query_count(self):
+        """Test a sparse retrieve doesn't load deferred columns"""
+        recipe = self._create_recipes(1)[0]
+
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                detail_url(recipe.id),
+                {'fields': 'id,title'},
+            )
+        self.assertEqual(res.data, {'id': recipe.id, 'title': recipe.title})
+
+    def test_create_query_count(self):
+        """Test creating a recipe stays within the query budget"""
+        payload = {
+            'title': 'New Recipe',
+            'time_minutes': 35,
+            'price': Decimal('8.65'),
+            'link': 'https://examplelink.com',
+        }
+
+        with self.assertNumQueries(6):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_with_relations_query_count(self):
+        """Test creating a recipe runs a fixed number of queries"""
+        Tag.objects.create(user=self.user, name='Existing')
+        for count in [1, 10, 100]:
+            payload = {
+                'title': 'New Recipe',
+                'time_minutes': 35,
+                'price': Decimal('8.65'),
+                'link': 'https://examplelink.com',
+                'tags': [{'name': 'Existing'}] + [
+                    {'name': f'Tag {count}-{i}'} for i in range(count)
+                ],
+                'ingredients': [
+                    {'name': f'Ing {count}-{i}'} for i in range(count)
+                ],
+            }
+
+            with self.assertNumQueries(14):
+                res = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['tags']), count + 1)
+            self.assertEqual(len(res.data['ingredients']), count)
+
+    def test_update_query_count(self):
+        """Test updating a recipe stays within the query budget"""
+        recipe = self._create_recipes(1)[0]
+        payload = {
+            'title': 'New Recipe',
+            'time_minutes': 35,
+            'price': Decimal('8.65'),
+            'link': 'https://examplelink.com',
+        }
+
+        with self.assertNumQueries(9):
+            res = self.client.put(detail_url(recipe.id), payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_with_relations_query_count(self):
+        """Test updating a recipe's relations runs a fixed number of queries"""
+        recipe = self._create_recipes(1)[0]
+        for count in [1, 10, 100]:
+            payload = {
+                'tags': [{'name': f'Tag {count}-{i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'Ing {count}-{i}'} for i in range(count)
+                ],
+            }
+
+            with self.assertNumQueries(19):
+                res = self.client.patch(
+                    detail_url(recipe.id),
+                    payload,
+                    format='json',
+                )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(res.data['tags']), count)
+
+
+class RecipeBulkCreateTests(TestCase):
+    """Tests for creating recipes in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='password')
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, count, tags=('Vegan', 'Dinner')):
+        """Return a batch of count recipes sharing tags"""
+        return [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '2.50',
+                'link': 'https://example.com/recipe.pdf',
+                'tags': [{'name': name} for name in tags],
+                'ingredients': [{'name': f'Ingredient {i}'}],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_recipes(self):
+        """Test creating a batch of recipes returns their ids"""
+        res = self.client.post(BULK_URL, self._payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(res.data['ids'], [recipe.id for recipe in recipes])
+        self.assertEqual(
+            [recipe.title for recipe in recipes],
+            ['Recipe 0', 'Recipe 1', 'Recipe 2'],
+        )
+        for i, recipe in enumerate(recipes):
+            self.assertEqual(
+                sorted(tag.name for tag in recipe.tags.all()),
+                ['Dinner', 'Vegan'],
+            )
+            self.assertEqual(
+                [ingredient.name for ingredient in recipe.ingredients.all()],
+                [f'Ingredient {i}'],
+            )
+
+    def test_bulk_create_reuses_names(self):
+        """Test names are resolved once for the batch and reused"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        payload = self._payload(2, tags=('Vegan', 'Vegan', 'Dinner'))
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Recipe.tags.through.objects.count(), 4)
+
+    def test_bulk_create_invalid_creates_nothing(self):
+        """Test an invalid recipe rejects the whole batch"""
+        payload = self._payload(3)
+        payload[1]['time_minutes'] = 'soon'
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('time_minutes', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_too_many_error(self):
+        """Test batches over the size limit are rejected"""
+        max_length = RecipeBulkSerializer.max_length
+
+        res = self.client.post(
+            BULK_URL,
+            self._payload(max_length + 1),
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_many_serializers_not_bulk(self):
+        """Test only the bulk action uses the bulk list serializer"""
+        serializer = RecipeSerializer(many=True, data=self._payload(1))
+
+        self.assertNotIsInstance(serializer, RecipeBulkSerializer)
+
+    @skipUnlessDBFeature('can_return_rows_from_bulk_insert')
+    def test_bulk_create_query_count_constant(self):
+        """Test the number of queries does not grow with the batch"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(
+                BULK_URL,
+                self._payload(2, tags=('Vegan', 'Dinner')),
+                format='json',
+            )
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(
+                BULK_URL,
+                self._payload(50, tags=('Lunch', 'Dessert')),
+                format='json',
+            )
+
+        self.assertEqual(len(small), len(large))
+
+
+class RecipeExportTests(TestCase):
+    """Tests for the streaming recipe export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='password')
+        self.client.force_authenticate(self.user)
+
+    def _export(self, params=None):
+        """Export recipes and return the parsed lines"""
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+
+        content = b''.join(res.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_recipes(self):
+        """Test exporting recipes with their tags and ingredients"""
+        recipe = create_recipe(user=self.user, description='Slow cooked')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        create_recipe(user=create_user(email='other@example.com'))
+
+        lines = self._export()
+
+        self.assertEqual(lines, [{
+            'id': recipe.id,
+            'title': recipe.title,
+            'description': 'Slow cooked',
+            'time_minutes': recipe.time_minutes,
+            'price': str(recipe.price),
+            'link': recipe.link,
+            'image': None,
+            'tags': [{'id': tag.id, 'name': 'Dinner'}],
+            'ingredients': [{'id': ingredient.id, 'name': 'Salt'}],
+        }])
+
+    def test_export_filtered_by_tags(self):
+        """Test the export applies the list filters"""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag)
+        create_recipe(user=self.user)
+
+        lines = self._export({'tags': str(tag.id)})
+
+        self.assertEqual([line['id'] for line in lines], [recipe.id])
+
+    @patch.object(RecipeViewSet, 'export_chunk_size', 2)
+    def test_export_queries_per_chunk(self):
+        """Test relations are loaded once per chunk of recipes"""
+        recipes = []
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+            recipes.append(recipe)
+
+        with CaptureQueriesContext(connection) as ctx:
+            lines = self._export()
+
+        self.assertEqual(
+            [line['id'] for line in lines],
+            [recipe.id for recipe in recipes],
+        )
+        self.assertEqual(lines[4]['tags'][0]['name'], 'Tag 4')
+        relation_queries = [
+            query for query in ctx.captured_queries
+            if 'recipe_tags' in query['sql']
+        ]
+        self.assertEqual(len(relation_queries), 3)
+
+
+class RecipeSparseFieldsTests(TestCase):
+    """Tests for sparse fieldsets and nested expansion"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='test@example.com', password='password')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+
+    def test_list_sparse_fields(self):
+        """Test listing only the requested columns without relations"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': self.recipe.id, 'title': self.recipe.title},
+        ])
+        recipe_queries = [
+            query['sql'] for query in ctx.captured_queries
+            if 'FROM "core_recipe"' in query['sql']
+        ]
+        self.assertEqual(len(recipe_queries), 1)
+        self.assertNotIn('"price"', recipe_queries[0])
+        self.assertFalse(any(
+            'core_tag' in query['sql'] for query in ctx.captured_queries
+        ))
+
+    def test_list_expand_relation(self):
+        """Test expanding one relation skips the other's prefetch"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'expand': 'tags'})
+
+        result = res.data['results'][0]
+        self.assertEqual(result['tags'][0]['name'], 'Vegan')
+        self.assertNotIn('ingredients', result)
+        self.assertIn('price', result)
+        self.assertFalse(any(
+            'core_ingredient' in query['sql']
+            for query in ctx.captured_queries
+        ))
+
+    def test_fields_with_expand(self):
+        """Test fields and expand combine"""
+        res = self.client.get(
+            RECIPES_URL,
+            {'fields': 'title', 'expand': 'ingredients'},
+        )
+
+        self.assertEqual(res.data['results'], [{
+            'title': self.recipe.title,
+            'ingredients': [
+                {'id': self.recipe.ingredients.get().id, 'name': 'Salt'},
+            ],
+        }])
+
+    def test_retrieve_sparse_fields(self):
+        """Test retrieving a recipe with sparse fields"""
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            {'fields': 'description,image_variants'},
+        )
+
+        self.assertEqual(res.data, {
+            'description': self.recipe.description,
+            'image_variants': None,
+        })
+
+    def test_unknown_fields_error(self):
+        """Test requesting unknown fields returns an error"""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,secret'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPES_URL, {'expand': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,246 @@
+"""
+Tests for searching recipes
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import search
+from recipe.search import InvertedIndex
+from recipe.serializers import RecipeSerializer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create the url for the detail recipe URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a test recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 35,
+        'price': Decimal('80.65'),
+        'description': '',
+        'link': 'https://examplelink.com',
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_user(email='test@example.com', password='password'):
+    """Create and return a test user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def result_ids(res):
+    """Return the recipe ids of a list response"""
+    return [recipe['id'] for recipe in res.data['results']]
+
+
+class InvertedIndexTests(SimpleTestCase):
+    """Tests for the in-process inverted index"""
+
+    def test_search_matches_every_term(self):
+        """Test only documents containing every term match"""
+        index = InvertedIndex()
+        index.add(1, 'Tomato soup', 1.0)
+        index.add(2, 'Tomato salad', 1.0)
+
+        self.assertEqual(set(index.search('tomato')), {1, 2})
+        self.assertEqual(set(index.search('TOMATO soup')), {1})
+        self.assertEqual(index.search('pasta'), {})
+        self.assertEqual(index.search(''), {})
+
+    def test_search_scores_by_weight(self):
+        """Test scores add up the weights of matching fields"""
+        index = InvertedIndex()
+        index.add(1, 'Soup', 1.0)
+        index.add(1, 'Spicy soup', 0.2)
+        index.add(2, 'Soup', 0.4)
+
+        scores = index.search('soup')
+
+        self.assertAlmostEqual(scores[1], 1.2)
+        self.assertAlmostEqual(scores[2], 0.4)
+
+
+class RecipeSearchAPITests(TestCase):
+    """Tests for the recipe search parameter"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_search_fields(self):
+        """Test searching titles, descriptions, tags and ingredients"""
+        by_title = create_recipe(self.user, title='Pasta Bake')
+        by_description = create_recipe(
+            self.user,
+            title='Dinner',
+            description='Quick pasta dinner',
+        )
+        by_tag = create_recipe(self.user, title='Lunch')
+        by_tag.tags.add(Tag.objects.create(user=self.user, name='Pasta'))
+        by_ingredient = create_recipe(self.user, title='Supper')
+        by_ingredient.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Pasta'),
+        )
+        create_recipe(self.user, title='Curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'pasta'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(result_ids(res)),
+            {by_title.id, by_description.id, by_tag.id, by_ingredient.id},
+        )
+
+    def test_search_ranked_by_relevance(self):
+        """Test title matches rank above tag and description matches"""
+        by_description = create_recipe(
+            self.user,
+            title='Dinner',
+            description='Curry for dinner',
+        )
+        by_tag = create_recipe(self.user, title='Lunch')
+        by_tag.tags.add(Tag.objects.create(user=self.user, name='Curry'))
+        by_title = create_recipe(self.user, title='Curry')
+
+        res = self.client.get(RECIPES_URL, {'search': 'curry'})
+
+        self.assertEqual(
+            result_ids(res),
+            [by_title.id, by_tag.id, by_description.id],
+        )
+
+    def test_search_limited_to_user(self):
+        """Test searching only returns the authenticated user's recipes"""
+        other_user = create_user(email='other@example.com')
+        create_recipe(other_user, title='Pasta Bake')
+        recipe = create_recipe(self.user, title='Pasta Salad')
+
+        res = self.client.get(RECIPES_URL, {'search': 'pasta'})
+
+        self.assertEqual(result_ids(res), [recipe.id])
+
+    def test_search_with_filters(self):
+        """Test searching combines with the tag filter"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(self.user, title='Pasta Salad')
+        recipe.tags.add(tag)
+        create_recipe(self.user, title='Pasta Bake')
+
+        res = self.client.get(RECIPES_URL, {'search': 'pasta', 'tags': tag.id})
+
+        self.assertEqual(result_ids(res), [recipe.id])
+
+    def test_search_paginated(self):
+        """Test walking every page of search results"""
+        for i in range(3):
+            create_recipe(self.user, title='Soup', description=f'Soup {i}')
+        for i in range(3):
+            create_recipe(self.user, title=f'Stew {i}', description='Soup')
+        create_recipe(self.user, title='Salad')
+
+        ids = []
+        url = RECIPES_URL + '?search=soup&page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(result_ids(res))
+            url = res.data['next']
+
+        res = self.client.get(RECIPES_URL, {'search': 'soup'})
+        self.assertEqual(ids, result_ids(res))
+        self.assertEqual(len(ids), 6)
+
+    def test_search_sees_updates(self):
+        """Test recipes are found by their updated tags"""
+        recipe = create_recipe(self.user, title='Dinner')
+        res = self.client.get(RECIPES_URL, {'search': 'spicy'})
+        self.assertEqual(result_ids(res), [])
+
+        payload = {'tags': [{'name': 'Spicy'}]}
+        self.client.patch(detail_url(recipe.id), payload, format='json')
+        res = self.client.get(RECIPES_URL, {'search': 'spicy'})
+        self.assertEqual(result_ids(res), [recipe.id])
+
+        tag = Tag.objects.get(user=self.user, name='Spicy')
+        tag.name = 'Mild'
+        tag.save()
+        res = self.client.get(RECIPES_URL, {'search': 'spicy'})
+        self.assertEqual(result_ids(res), [])
+
+
+@override_settings(SEARCH_INDEX={'MAX_USERS': 2})
+class UserIndexCacheTests(TestCase):
+    """Tests for the cache of in-process user indexes"""
+
+    def setUp(self):
+        self.user = create_user()
+        for user_id in [1, 2, 3, self.user.id]:
+            search.invalidate_user_index(user_id)
+
+    def test_least_recently_used_evicted(self):
+        """Test only the most recently used indexes are kept"""
+        with patch.object(
+            search,
+            'build_user_index',
+            side_effect=lambda user_id, using: InvertedIndex(),
+        ) as build:
+            first = search.get_user_index(1, 'default')
+            search.get_user_index(2, 'default')
+            self.assertIs(search.get_user_index(1, 'default'), first)
+            search.get_user_index(3, 'default')
+            search.get_user_index(2, 'default')
+
+        self.assertEqual(
+            [call.args[0] for call in build.call_args_list],
+            [1, 2, 3, 2],
+        )
+        self.assertEqual(list(search._indexes), [3, 2])
+
+    def test_index_invalidated_while_building_not_cached(self):
+        """Test an index built while the user's recipes changed is dropped"""
+        def build(user_id, using):
+            search.invalidate_user_index(user_id)
+            return InvertedIndex()
+
+        with patch.object(search, 'build_user_index', side_effect=build):
+            search.get_user_index(1, 'default')
+
+        self.assertNotIn(1, search._indexes)
+
+    def test_linking_items_invalidates_index(self):
+        """Test tags linked without signals still reach the index"""
+        recipe = create_recipe(self.user, title='Dinner')
+        self.assertEqual(
+            search.get_user_index(self.user.id, 'default').search('spicy'),
+            {},
+        )
+        request = APIRequestFactory().post(RECIPES_URL)
+        request.user = self.user
+        serializer = RecipeSerializer(context={'request': request})
+
+        serializer._get_or_create_tags([{'name': 'Spicy'}], recipe)
+
+        self.assertIn(
+            recipe.id,
+            search.get_user_index(self.user.id, 'default').search('spicy'),
+        )
@@ -2,8 +2,10 @@
 Tests for the Tag APIs
 """
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -17,6 +19,8 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+BULK_UPDATE_URL = reverse('recipe:tag-bulk-update')
+BULK_DELETE_URL = reverse('recipe:tag-bulk-delete')
 
 
 def create_user(email='test@example.com', password='password'):
@@ -137,3 +141,158 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_update_tag_duplicate_name_error(self):
+        """Test renaming a tag to an existing name returns an error"""
+        Tag.objects.create(user=self.user, name='vegan')
+        tag = Tag.objects.create(user=self.user, name='dessert')
+
+        url = detail_url(tag.id)
+        res = self.client.patch(url, {'name': 'vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'dessert')
+
+    def test_filter_tags_assigned_single_query(self):
+        """Test listing assigned tags runs one list query without DISTINCT"""
+        tag = Tag.objects.create(user=self.user, name='Tag 1')
+        recipe = Recipe.objects.create(
+            title='Recipe',
+            time_minutes=5,
+            price='5.05',
+            user=self.user,
+        )
+        recipe.tags.add(tag)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(ctx), 2)
+        self.assertNotIn('DISTINCT', ctx.captured_queries[1]['sql'])
+
+    def test_retrieve_tags_with_recipe_count(self):
+        """Test listing tags with the number of recipes using each"""
+        tag1 = Tag.objects.create(user=self.user, name='Tag 1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag 2')
+        for title in ['Recipe 1', 'Recipe 2']:
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price='5.05',
+                user=self.user,
+            )
+            recipe.tags.add(tag1)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(TAGS_URL, {'recipe_count': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': tag2.id, 'name': tag2.name, 'recipe_count': 0},
+            {'id': tag1.id, 'name': tag1.name, 'recipe_count': 2},
+        ])
+
+    def test_filter_tags_invalid_param_error(self):
+        """Test listing tags with a malformed flag returns an error"""
+        res = self.client.get(TAGS_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_rename_tags(self):
+        """Test renaming many tags in one request"""
+        tag1 = Tag.objects.create(user=self.user, name='vegan')
+        tag2 = Tag.objects.create(user=self.user, name='dessert')
+        other = Tag.objects.create(user=create_user('o@example.com'), name='x')
+        payload = [
+            {'id': tag1.id, 'name': 'Vegan'},
+            {'id': tag2.id, 'name': 'Dessert'},
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 2})
+        tag1.refresh_from_db()
+        tag2.refresh_from_db()
+        self.assertEqual([tag1.name, tag2.name], ['Vegan', 'Dessert'])
+        updates = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "core_tag"')
+        ]
+        self.assertEqual(len(updates), 1)
+        other.refresh_from_db()
+        self.assertEqual(other.name, 'x')
+
+    def test_bulk_rename_other_user_tag_error(self):
+        """Test renaming another user's tag is rejected"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        other = Tag.objects.create(user=create_user('o@example.com'), name='x')
+        payload = [
+            {'id': tag.id, 'name': 'Vegan'},
+            {'id': other.id, 'name': 'Mine'},
+        ]
+
+        res = self.client.post(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual([tag.name, other.name], ['vegan', 'x'])
+
+    def test_bulk_rename_conflict_error(self):
+        """Test renaming to a name in use or used twice is rejected"""
+        tag1 = Tag.objects.create(user=self.user, name='vegan')
+        tag2 = Tag.objects.create(user=self.user, name='dessert')
+
+        res = self.client.post(
+            BULK_UPDATE_URL,
+            [{'id': tag2.id, 'name': 'vegan'}],
+            format='json',
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            BULK_UPDATE_URL,
+            [{'id': tag1.id, 'name': 'x'}, {'id': tag2.id, 'name': 'x'}],
+            format='json',
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag2.refresh_from_db()
+        self.assertEqual(tag2.name, 'dessert')
+
+    def test_bulk_delete_tags(self):
+        """Test deleting many tags and their recipe links in one request"""
+        tag1 = Tag.objects.create(user=self.user, name='vegan')
+        tag2 = Tag.objects.create(user=self.user, name='dessert')
+        kept = Tag.objects.create(user=self.user, name='lunch')
+        other = Tag.objects.create(user=create_user('o@example.com'), name='x')
+        recipe = Recipe.objects.create(
+            title='Recipe',
+            time_minutes=5,
+            price='5.05',
+            user=self.user,
+        )
+        recipe.tags.add(tag1, kept)
+
+        res = self.client.post(
+            BULK_DELETE_URL,
+            {'ids': [tag1.id, tag2.id, other.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 2})
+        self.assertEqual(
+            list(Tag.objects.order_by('id')),
+            [kept, other],
+        )
+        self.assertEqual(list(recipe.tags.all()), [kept])
+
+    def test_bulk_delete_requires_ids(self):
+        """Test deleting without ids returns an error"""
+        res = self.client.post(BULK_DELETE_URL, {'ids': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -8,7 +8,7 @@ from django.urls import (
 
 from rest_framework.routers import DefaultRouter
 
-from recipe import views
+from recipe import async_views, views
 
 
 router = DefaultRouter()
@@ -20,4 +20,20 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path(
+        'async/recipes/',
+        async_views.recipe_list,
+        name='async-recipe-list',
+    ),
+    path(
+        'async/recipes/<int:pk>/',
+        async_views.recipe_detail,
+        name='async-recipe-detail',
+    ),
+    path('async/tags/', async_views.tag_list, name='async-tag-list'),
+    path(
+        'async/ingredients/',
+        async_views.ingredient_list,
+        name='async-ingredient-list',
+    ),
 ]
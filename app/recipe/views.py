@@ -1,6 +1,10 @@
 """
 Views for Recipe APIs
 """
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -14,16 +18,40 @@ from rest_framework import (
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.reverse import reverse
 from rest_framework.permissions import IsAuthenticated
 
+from core import jobs
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
 )
-from recipe import serializers
+from recipe import images, serializers
+from recipe.export import export_recipes
+from recipe.mixins import CollectionVersionMixin, FastListMixin
+from recipe.pagination import RecipeCursorPagination
+from recipe.search import invalidate_user_index, search_recipes
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma Seperated List of fields to include',
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description='Comma Seperated List of tags and ingredients to include',
+    ),
+]
 
 
 @extend_schema_view(
@@ -39,35 +67,176 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description='Comma Seperated List of Ids to filter'
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Match recipes having any or all of the ids',
+            ),
+            OpenApiParameter(
+                'image_size',
+                OpenApiTypes.STR, enum=list(images.VARIANTS),
+                description='Include the URL of this image variant',
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Search titles, descriptions, tags and '
+                            'ingredients, ordered by relevance',
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CollectionVersionMixin,
+                    FastListMixin,
+                    viewsets.ModelViewSet):
     """View for managing recipe APIs"""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    prefetch_actions = ['list', 'retrieve', 'update', 'partial_update']
+    sparse_actions = ['list', 'retrieve']
+    expandable_fields = ['tags', 'ingredients']
+    export_chunk_size = 2000
 
-    def _params_to_ints(self, qs):
+    def _params_to_ints(self, qs, param):
         """Convert string to a list of ints"""
-        return [int(str_id) for str_id in qs.split(',')]
+        try:
+            return [int(str_id) for str_id in qs.split(',')]
+        except ValueError:
+            raise ValidationError(
+                {param: 'Expected a comma separated list of ids.'}
+            )
+
+    def _filter_related(self, queryset, field_name, ids, match):
+        """Filter recipes linked to any or all of the ids via field_name"""
+        through = getattr(Recipe, field_name).through
+        item = getattr(Recipe, field_name).field.m2m_reverse_field_name()
+        links = through.objects.filter(**{f'{item}__in': ids})
+        if match == 'all':
+            return queryset.filter(pk__in=links.values('recipe').annotate(
+                matched=Count(item),
+            ).filter(matched=len(set(ids))).values('recipe'))
+
+        return queryset.filter(Exists(links.filter(recipe=OuterRef('pk'))))
+
+    def _split_fields(self, param, available):
+        """Return the comma separated field names of param"""
+        names = [
+            name.strip()
+            for name in self.request.query_params.get(param, '').split(',')
+            if name.strip()
+        ]
+        unknown = set(names) - set(available)
+        if unknown:
+            raise ValidationError(
+                {param: f'Unknown fields: {", ".join(sorted(unknown))}.'}
+            )
+
+        return names
+
+    def _get_sparse_fields(self):
+        """Return the fields requested with fields and expand, or None"""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            params = self.request.query_params
+            if self.action in self.sparse_actions and (
+                params.get('fields') or params.get('expand')
+            ):
+                available = list(self.get_serializer_class()().fields)
+                expand = self._split_fields('expand', self.expandable_fields)
+                if params.get('fields'):
+                    fields = self._split_fields('fields', available)
+                else:
+                    fields = [
+                        name for name in available
+                        if name not in self.expandable_fields
+                    ]
+                self._sparse_fields = [
+                    name for name in available
+                    if name in fields or name in expand
+                ]
+
+        return self._sparse_fields
+
+    def _sparse_columns(self, fields):
+        """Return the model columns needed to serialize fields"""
+        columns = {'id'} | set(fields) & {
+            field.name for field in Recipe._meta.concrete_fields
+        }
+        params = self.request.query_params
+        if 'image_variants' in fields or params.get('image_size'):
+            columns.add('image')
+
+        return sorted(columns)
 
     def get_queryset(self):
         """Retrieve recipes for authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        search = self.request.query_params.get('search')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ['any', 'all']:
+            raise ValidationError({'match': 'Expected any or all.'})
+
         queryset = self.queryset
+        fields = self._get_sparse_fields()
+        if self.action in self.prefetch_actions:
+            queryset = queryset.prefetch_related(*[
+                Prefetch(name, queryset=Recipe._meta.get_field(
+                    name,
+                ).related_model.objects.order_by('id'))
+                for name in self.expandable_fields
+                if fields is None or name in fields
+            ])
+        if fields is not None:
+            queryset = queryset.only(*self._sparse_columns(fields))
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tags, 'tags')
+            queryset = self._filter_related(queryset, 'tags', tag_ids, match)
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_ints(ingredients, 'ingredients')
+            queryset = self._filter_related(
+                queryset,
+                'ingredients',
+                ingredient_ids,
+                match,
+            )
+        if search and self.action == 'list':
+            queryset = search_recipes(queryset, search, self.request.user.id)
+            return queryset.order_by('-search_rank', '-id')
 
         return queryset.filter(
             user=self.request.user
-            ).order_by('-id').distinct()
+            ).order_by('-id')
+
+    def get_serializer_context(self):
+        """Pass the requested image variant to list serializers"""
+        context = super().get_serializer_context()
+        image_size = self.request.query_params.get('image_size')
+        if self.action == 'list' and image_size:
+            if image_size not in images.VARIANTS:
+                variants = ', '.join(images.VARIANTS)
+                raise ValidationError(
+                    {'image_size': f'Expected one of {variants}.'}
+                )
+            context['image_size'] = image_size
+
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        """Trim the serializer to the requested sparse fields"""
+        fields = self._get_sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         """return the right serializer class for request"""
@@ -79,19 +248,88 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs,
+        )
+
     def perform_create(self, serializer):
         """Save new recipe"""
         serializer.save(user=self.request.user)
+        self.bump_collection_version()
+
+    @extend_schema(responses={
+        (200, 'application/x-ndjson'): OpenApiTypes.STR,
+    })
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """Stream every Recipe as newline delimited JSON"""
+        storage = Recipe._meta.get_field('image').storage
+        response = StreamingHttpResponse(
+            export_recipes(
+                self.get_queryset(),
+                chunk_size=self.export_chunk_size,
+                image_url=lambda name: request.build_absolute_uri(
+                    storage.url(name)
+                ),
+            ),
+            content_type='application/x-ndjson',
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"'
+        )
+
+        return response
+
+    @extend_schema(
+        request=serializers.RecipeDetailSerializer(many=True),
+        responses={201: OpenApiTypes.OBJECT},
+    )
+    @action(methods=['POST'], detail=False)
+    def bulk(self, request):
+        """Create a batch of Recipes"""
+        serializer = serializers.RecipeBulkSerializer(
+            child=self.get_serializer(),
+            data=request.data,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save()
+        self.bump_collection_version()
+
+        return Response(
+            {'ids': [recipe.id for recipe in recipes]},
+            status=status.HTTP_201_CREATED,
+        )
 
+    @extend_schema(responses={202: serializers.RecipeImageSerialzer})
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload image to a Recipe"""
         recipe = self.get_object()
+        old_image = recipe.image.name
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            job = jobs.enqueue(
+                'recipe.process_image',
+                {'recipe_id': recipe.id, 'old_image': old_image or None},
+                user=request.user,
+            )
+            self.bump_collection_version()
+            return Response(
+                {**serializer.data, 'job': job.id},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': reverse(
+                    'job:job-detail',
+                    args=[job.id],
+                    request=request,
+                )},
+            )
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -104,37 +342,114 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes',
             ),
+            OpenApiParameter(
+                'recipe_count',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Include the number of recipes using each item',
+            ),
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.UpdateModelMixin,
+class BaseRecipeAttrViewSet(CollectionVersionMixin,
+                            FastListMixin,
+                            mixins.UpdateModelMixin,
                             mixins.DestroyModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base class for recipe attributes"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
 
+    def _param_to_bool(self, param):
+        """Convert a 0/1 query parameter to a bool"""
+        value = self.request.query_params.get(param, '0')
+        if value not in ['0', '1']:
+            raise ValidationError({param: 'Expected 0 or 1.'})
+
+        return value == '1'
+
     def get_queryset(self):
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
+        assigned_only = self._param_to_bool('assigned_only')
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            links = self.queryset.model.recipe_set.through.objects.filter(
+                **{self.queryset.model._meta.model_name: OuterRef('pk')}
+            )
+            queryset = queryset.filter(Exists(links))
+        if self.action == 'list' and self._param_to_bool('recipe_count'):
+            queryset = queryset.annotate(recipe_count=Count('recipe'))
 
         return queryset.filter(
             user=self.request.user
-            ).order_by('-name').distinct()
+            ).order_by('-name')
+
+    def get_serializer_class(self):
+        """return the right serializer class for request"""
+        if self.action == 'list' and self._param_to_bool('recipe_count'):
+            return self.recipe_count_serializer_class
+        elif self.action == 'bulk_update':
+            return self.rename_serializer_class
+        elif self.action == 'bulk_delete':
+            return serializers.RecipeAttrBulkDeleteSerializer
+
+        return self.serializer_class
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    @action(methods=['POST'], detail=False, url_path='bulk-update')
+    def bulk_update(self, request):
+        """Rename many items by id"""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        names = {
+            item['id']: item['name'] for item in serializer.validated_data
+        }
+        try:
+            with transaction.atomic():
+                updated = self.queryset.model.objects.rename(
+                    request.user,
+                    names,
+                )
+        except IntegrityError:
+            raise ValidationError('Names already in use.')
+        invalidate_user_index(request.user.id)
+        self.bump_collection_version()
+
+        return Response({'updated': updated})
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Delete many items by id"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            deleted, per_model = self.queryset.model.objects.filter(
+                user=request.user,
+                pk__in=serializer.validated_data['ids'],
+            ).delete()
+        self.bump_collection_version()
+
+        return Response({
+            'deleted': per_model.get(self.queryset.model._meta.label, 0),
+        })
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """View for managing tag APIs"""
     serializer_class = serializers.TagSerializer
+    recipe_count_serializer_class = serializers.TagRecipeCountSerializer
+    rename_serializer_class = serializers.TagRenameSerializer
     queryset = Tag.objects.all()
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """View for managing ingredient APIs"""
     serializer_class = serializers.IngredientSerializer
+    recipe_count_serializer_class = (
+        serializers.IngredientRecipeCountSerializer
+    )
+    rename_serializer_class = serializers.IngredientRenameSerializer
     queryset = Ingredient.objects.all()
@@ -0,0 +1,228 @@
+"""
+Authentication classes for the APIs
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from core.async_utils import database_sync_to_async
+from core.db.routers import read_from, read_primary_if_sticky
+from user import tokens
+
+
+class TokenCache:
+    """Bounded in-process LRU cache of tokens with a time to live"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        """Cache value for key, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove key from the cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        """Remove every cached token belonging to user_id"""
+        with self._lock:
+            keys = [
+                key for key, (expires_at, (user, token))
+                in self._entries.items() if user.pk == user_id
+            ]
+            for key in keys:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_AUTH_CACHE['MAX_SIZE'],
+    ttl=settings.TOKEN_AUTH_CACHE['TTL'],
+)
+
+
+def get_shared_cache():
+    """Return the shared cache tier or None when it is disabled"""
+    alias = settings.TOKEN_AUTH_CACHE['SHARED_CACHE']
+    if alias is None:
+        return None
+
+    return caches[alias]
+
+
+def shared_cache_key(key):
+    """Return the shared cache key for a token key"""
+    return f'auth-token:{key}'
+
+
+def invalidate_token(key):
+    """Drop a token from every cache tier"""
+    token_cache.delete(key)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete(shared_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches resolved tokens
+
+    Tokens are looked up in the in-process cache first, then in the
+    shared cache when one is configured, and only then in the primary
+    database, where new tokens exist before replicas catch up. Deleting a
+    token or saving its user invalidates both tiers in this process; other
+    processes drop their copy when the TTL runs out.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        shared_cache = get_shared_cache()
+        if cached is None and shared_cache is not None:
+            cached = shared_cache.get(shared_cache_key(key))
+            if cached is not None:
+                token_cache.set(key, cached)
+
+        if cached is None:
+            with read_from(None):
+                cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+            if shared_cache is not None:
+                shared_cache.set(
+                    shared_cache_key(key),
+                    cached,
+                    timeout=token_cache.ttl,
+                )
+
+        user, token = cached
+        read_primary_if_sticky(user.pk)
+        return copy.copy(user), token
+
+
+class TokenKeyAuthentication(TokenAuthentication):
+    """Parse the Authorization header, returning (None, key)"""
+
+    def authenticate_credentials(self, key):
+        return None, key
+
+
+class AsyncTokenAuthentication(CachedTokenAuthentication):
+    """Cached token authentication resolved before async views run
+
+    resolve() checks the in-process cache on the event loop and only looks
+    cache misses up in a worker thread. The outcome is kept on the request,
+    where authenticate() picks it up when the DRF view runs, so the token
+    is only resolved once. Requests that weren't resolved are authenticated
+    like CachedTokenAuthentication does.
+    """
+
+    async def resolve(self, request):
+        """Resolve and remember the token credentials of request"""
+        try:
+            credentials = TokenKeyAuthentication().authenticate(request)
+            if credentials is not None:
+                credentials = await self._resolve_key(credentials[1])
+        except exceptions.AuthenticationFailed as error:
+            credentials = error
+        request.token_credentials = credentials
+
+        return credentials
+
+    async def _resolve_key(self, key):
+        """Return the user and token of key, querying only on cache misses"""
+        cached = token_cache.get(key)
+        if cached is None:
+            return await database_sync_to_async(
+                self.authenticate_credentials
+            )(key)
+
+        user, token = cached
+        return copy.copy(user), token
+
+    def authenticate(self, request):
+        if not hasattr(request._request, 'token_credentials'):
+            return super().authenticate(request)
+
+        credentials = request._request.token_credentials
+        if isinstance(credentials, exceptions.AuthenticationFailed):
+            raise credentials
+        if credentials is not None:
+            read_primary_if_sticky(credentials[0].pk)
+
+        return credentials
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authentication with signed access tokens, without database lookups
+
+    Clients send "Authorization: Bearer <access token>". The token carries
+    the user id, so the user is only loaded when a view reads one of its
+    fields. Whether the user is active isn't checked per request, instead
+    deactivating or deleting a user revokes their tokens. A user deleted
+    in another process fails authentication once it is loaded.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        try:
+            token = tokens.verify(auth[1].decode(), tokens.ACCESS)
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        except tokens.InvalidToken as error:
+            raise exceptions.AuthenticationFailed(str(error))
+
+        read_primary_if_sticky(token.user_id)
+        user = get_user_model().objects.deferred(
+            token.user_id,
+            missing_error=exceptions.AuthenticationFailed(
+                'User inactive or deleted.',
+            ),
+        )
+
+        return user, token
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,47 @@
+"""
+Benchmarks for the User APIs
+"""
+from django.contrib.auth import get_user_model
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmark import register, measure
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    token_cache,
+)
+
+REQUESTS = 1000
+
+
+@register
+def token_authentication(report, repeat):
+    """Compare the authentication overhead of DRF, cached and signed tokens"""
+    user = get_user_model().objects.create_user(
+        email='benchmark@example.com',
+        password='password',
+    )
+    token = Token.objects.create(user=user)
+    access = tokens.issue(user.pk, tokens.ACCESS)
+    token_cache.clear()
+    for label, authentication, header in [
+        ('drf token', TokenAuthentication(), f'Token {token.key}'),
+        ('cached token', CachedTokenAuthentication(), f'Token {token.key}'),
+        ('signed token', SignedTokenAuthentication(), f'Bearer {access}'),
+    ]:
+        request = Request(
+            APIRequestFactory().get('/', HTTP_AUTHORIZATION=header)
+        )
+
+        def run():
+            for _ in range(REQUESTS):
+                authentication.authenticate(request)
+
+        seconds, queries = measure(run, repeat)
+        report(f'{label} ({REQUESTS} requests)', seconds, queries)
+    token_cache.clear()
@@ -0,0 +1,13 @@
+"""
+Background jobs for the User API
+"""
+from django.contrib.auth import get_user_model
+
+from core import jobs
+
+
+@jobs.register('user.release_profile_image')
+def release_profile_image(name):
+    """Release a replaced or deleted profile image"""
+    storage = get_user_model()._meta.get_field('profile_image').storage
+    jobs.run_step('release_profile_image', storage.delete, name)
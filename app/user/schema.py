@@ -0,0 +1,16 @@
+"""
+OpenAPI extensions for the User API
+"""
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    target_class = 'user.authentication.SignedTokenAuthentication'
+    name = 'signedTokenAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {
+            'type': 'http',
+            'scheme': 'bearer',
+            'description': 'Signed access token from /api/user/token/signed/',
+        }
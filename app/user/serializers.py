@@ -9,6 +9,8 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from user import tokens
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer fot the user objct"""
@@ -59,6 +61,48 @@ class AuthTokenSerializer(serializers.Serializer):
         return attrs
 
 
+class SignedTokenSerializer(serializers.Serializer):
+    """Serializer for a pair of signed tokens"""
+    access = serializers.CharField(read_only=True)
+    refresh = serializers.CharField(read_only=True)
+    expires_in = serializers.IntegerField(read_only=True)
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for refreshing signed tokens"""
+    refresh = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        """Validate the refresh token and its user"""
+        try:
+            token = tokens.verify(attrs['refresh'], tokens.REFRESH)
+        except tokens.InvalidToken as error:
+            raise serializers.ValidationError(str(error), code='authorization')
+        user = get_user_model().objects.filter(
+            pk=token.user_id,
+            is_active=True,
+        ).first()
+        if not user:
+            msg = _('Unable to authenticate')
+            raise serializers.ValidationError(msg, code='authorization')
+
+        attrs['token'] = token
+        attrs['user'] = user
+        return attrs
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    """Serializer for revoking a signed token"""
+    token = serializers.CharField(trim_whitespace=False)
+
+    def validate_token(self, value):
+        """Validate the token is a signed token that can still be used"""
+        try:
+            return tokens.verify(value)
+        except tokens.InvalidToken as error:
+            raise serializers.ValidationError(str(error))
+
+
 class ProfileImageSerialzer(serializers.ModelSerializer):
     """Serializer for uploading Profile Images"""
 
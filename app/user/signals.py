@@ -0,0 +1,56 @@
+"""
+Signal handlers for the User API
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core import jobs
+from user import tokens
+from user.authentication import (
+    token_cache,
+    get_shared_cache,
+    invalidate_token,
+)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Drop deleted tokens from the token cache"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached tokens when their user changes or is deactivated"""
+    if created:
+        return
+
+    if not instance.is_active:
+        tokens.denylist.revoke_user(instance.pk)
+    token_cache.delete_user(instance.pk)
+    if get_shared_cache() is not None:
+        keys = Token.objects.filter(user=instance).values_list(
+            'key',
+            flat=True,
+        )
+        for key in keys:
+            invalidate_token(key)
+
+
+@receiver(post_delete, sender=get_user_model())
+def revoke_signed_tokens(sender, instance, **kwargs):
+    """Revoke the signed tokens of a deleted user"""
+    tokens.denylist.revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def release_profile_image(sender, instance, **kwargs):
+    """Release the profile image of a deleted user"""
+    if instance.profile_image:
+        jobs.enqueue(
+            'user.release_profile_image',
+            {'name': instance.profile_image.name},
+        )
@@ -0,0 +1,139 @@
+"""
+Tests for the cached token authentication
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from user.authentication import (
+    CachedTokenAuthentication,
+    TokenCache,
+    token_cache,
+)
+
+ME_URL = reverse('user:me')
+
+
+def create_user(email='test@example.com', password='password'):
+    """Create and return Test user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class TokenCacheTests(TestCase):
+    """Tests for the in-process token cache"""
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache drops the least recently used entry when full"""
+        lru = TokenCache(max_size=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped once their TTL has passed"""
+        patched_monotonic.return_value = 100
+        lru = TokenCache(max_size=2, ttl=60)
+        lru.set('a', 1)
+
+        patched_monotonic.return_value = 159
+        self.assertEqual(lru.get('a'), 1)
+        patched_monotonic.return_value = 160
+        self.assertIsNone(lru.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Tests for the cached token authentication class"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_cached_token_skips_query(self):
+        """Test a cached token is resolved without querying the database"""
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.token)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token removes it from the cache"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user removes their tokens from the cache"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_cached_user_not_shared(self):
+        """Test changes to a returned user do not leak into the cache"""
+        user, token = self.auth.authenticate_credentials(self.token.key)
+        user.name = 'Changed'
+
+        user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user.name, '')
+
+    @override_settings(TOKEN_AUTH_CACHE={
+        'MAX_SIZE': 10,
+        'TTL': 60,
+        'SHARED_CACHE': 'default',
+    })
+    def test_shared_cache_tier(self):
+        """Test tokens are resolved from the shared cache tier"""
+        self.auth.authenticate_credentials(self.token.key)
+        token_cache.clear()
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+        self.user.is_active = False
+        self.user.save()
+        token_cache.clear()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+        cache.clear()
+
+    def test_authenticated_request(self):
+        """Test the API accepts a cached token"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        res = client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
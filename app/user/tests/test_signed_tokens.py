@@ -0,0 +1,397 @@
+"""
+Tests for the signed access tokens
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.request import Request
+
+from user import tokens
+from user.authentication import SignedTokenAuthentication
+
+SIGNED_TOKEN_URL = reverse('user:token-signed')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_user(email='test@example.com', password='password'):
+    """Create and return Test user"""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def bearer_request(token):
+    """Return a request sending token as a bearer token"""
+    return Request(
+        APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    )
+
+
+class SignedTokenTests(SimpleTestCase):
+    """Tests for issuing and verifying signed tokens"""
+
+    def setUp(self):
+        tokens.denylist.clear()
+        self.addCleanup(tokens.denylist.clear)
+
+    def test_verify_issued_token(self):
+        """Test an issued token verifies to its user and kind"""
+        token = tokens.verify(tokens.issue(42, tokens.ACCESS), tokens.ACCESS)
+
+        self.assertEqual(token.user_id, 42)
+        self.assertEqual(token.kind, tokens.ACCESS)
+        self.assertEqual(token.expires_at - token.issued_at, 300)
+
+    def test_tampered_token_rejected(self):
+        """Test changing the payload invalidates the signature"""
+        token = tokens.issue(42, tokens.ACCESS)
+        tampered = token.replace('a.42.', 'a.43.', 1)
+
+        for value in [tampered, token[:-1], '', 'a.b.c', f'{token}\u00e9']:
+            with self.assertRaisesMessage(tokens.InvalidToken, 'Invalid'):
+                tokens.verify(value, tokens.ACCESS)
+
+    def test_token_signed_with_secret_key(self):
+        """Test tokens don't verify under another SECRET_KEY"""
+        token = tokens.issue(42, tokens.ACCESS)
+
+        with override_settings(SECRET_KEY='another-secret-key'):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify(token, tokens.ACCESS)
+
+    def test_wrong_kind_rejected(self):
+        """Test a refresh token isn't accepted as an access token"""
+        token = tokens.issue(42, tokens.REFRESH)
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'type'):
+            tokens.verify(token, tokens.ACCESS)
+
+    @patch('user.tokens.time.time')
+    def test_expired_token_rejected(self, patched_time):
+        """Test tokens are rejected once they expire"""
+        patched_time.return_value = 1000
+        token = tokens.issue(42, tokens.ACCESS)
+
+        patched_time.return_value = 1299
+        tokens.verify(token, tokens.ACCESS)
+        patched_time.return_value = 1300
+        with self.assertRaisesMessage(tokens.InvalidToken, 'expired'):
+            tokens.verify(token, tokens.ACCESS)
+
+    def test_revoked_token_rejected(self):
+        """Test a revoked token is rejected and others are not"""
+        token = tokens.issue(42, tokens.ACCESS)
+        other = tokens.issue(42, tokens.ACCESS)
+
+        signed_token = tokens.verify(token)
+
+        self.assertTrue(tokens.denylist.revoke(signed_token))
+        self.assertFalse(tokens.denylist.revoke(signed_token))
+        with self.assertRaisesMessage(tokens.InvalidToken, 'revoked'):
+            tokens.verify(token, tokens.ACCESS)
+        tokens.verify(other, tokens.ACCESS)
+
+    def test_revoke_user(self):
+        """Test revoking a user rejects the tokens issued to them so far"""
+        token = tokens.issue(42, tokens.REFRESH)
+        other = tokens.issue(43, tokens.REFRESH)
+
+        tokens.denylist.revoke_user(42)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(token)
+        tokens.verify(other)
+
+    @patch('user.tokens.time.time')
+    def test_denylist_bounded(self, patched_time):
+        """Test expired revocations are dropped to stay within max_size"""
+        patched_time.return_value = 1000
+        denylist = tokens.Denylist(max_size=2)
+        first = tokens.verify(tokens.issue(1, tokens.ACCESS))
+        second = tokens.verify(tokens.issue(2, tokens.REFRESH))
+        third = tokens.verify(tokens.issue(3, tokens.REFRESH))
+        denylist.revoke(first)
+        denylist.revoke(second)
+
+        patched_time.return_value = 1300
+        denylist.revoke(third)
+
+        self.assertEqual(len(denylist), 2)
+        self.assertFalse(denylist.is_revoked(first))
+        self.assertTrue(denylist.is_revoked(second))
+        self.assertTrue(denylist.is_revoked(third))
+
+    def test_full_denylist_keeps_revocations(self):
+        """Test unexpired revocations are never dropped to make room"""
+        denylist = tokens.Denylist(max_size=2)
+        revoked = [
+            tokens.verify(tokens.issue(user_id, tokens.REFRESH))
+            for user_id in [1, 2]
+        ]
+        for token in revoked:
+            denylist.revoke(token)
+
+        with self.assertRaises(tokens.DenylistFull):
+            denylist.revoke(tokens.verify(tokens.issue(3, tokens.REFRESH)))
+
+        for token in revoked:
+            self.assertTrue(denylist.is_revoked(token))
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    """Tests for the signed token authentication class"""
+
+    def setUp(self):
+        self.user = create_user()
+        tokens.denylist.clear()
+        self.addCleanup(tokens.denylist.clear)
+
+    def test_authenticate_without_queries(self):
+        """Test the token is verified without querying the database"""
+        request = bearer_request(tokens.issue(self.user.pk, tokens.ACCESS))
+
+        with self.assertNumQueries(0):
+            user, token = SignedTokenAuthentication().authenticate(request)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertTrue(user.is_authenticated)
+
+        self.assertEqual(token.user_id, self.user.pk)
+
+    def test_user_loaded_in_one_query(self):
+        """Test the deferred user loads every field on first access"""
+        request = bearer_request(tokens.issue(self.user.pk, tokens.ACCESS))
+        user, token = SignedTokenAuthentication().authenticate(request)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, self.user.email)
+            self.assertEqual(user.name, self.user.name)
+            self.assertTrue(user.is_active)
+
+    def test_deleted_user_fails_authentication(self):
+        """Test a user deleted in another process fails when it is loaded"""
+        request = bearer_request(tokens.issue(self.user.pk, tokens.ACCESS))
+        user, token = SignedTokenAuthentication().authenticate(request)
+        get_user_model().objects.filter(pk=self.user.pk).delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            user.email
+
+    def test_other_keywords_ignored(self):
+        """Test DRF tokens are left to the other authentication classes"""
+        request = Request(
+            APIRequestFactory().get('/', HTTP_AUTHORIZATION='Token abc')
+        )
+
+        self.assertIsNone(SignedTokenAuthentication().authenticate(request))
+
+    def test_invalid_tokens_fail(self):
+        """Test invalid bearer tokens fail authentication"""
+        for token in [
+            'not-a-token',
+            tokens.issue(self.user.pk, tokens.REFRESH),
+            'a b',
+        ]:
+            with self.assertRaises(AuthenticationFailed):
+                SignedTokenAuthentication().authenticate(bearer_request(token))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class SignedTokenApiTests(TestCase):
+    """Tests for the signed token endpoints"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        tokens.denylist.clear()
+        self.addCleanup(tokens.denylist.clear)
+
+    def _obtain(self):
+        """Return signed tokens for the test user"""
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'password',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res.data
+
+    def test_create_signed_tokens(self):
+        """Test valid credentials return an access and refresh token"""
+        data = self._obtain()
+
+        self.assertEqual(data['expires_in'], 300)
+        self.assertEqual(
+            tokens.verify(data['access'], tokens.ACCESS).user_id,
+            self.user.pk,
+        )
+        self.assertEqual(
+            tokens.verify(data['refresh'], tokens.REFRESH).user_id,
+            self.user.pk,
+        )
+
+    def test_create_signed_tokens_bad_credentials(self):
+        """Test invalid credentials return an error"""
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'wrong',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('access', res.data)
+
+    def test_bearer_token_authenticates(self):
+        """Test endpoints accept the access token"""
+        data = self._obtain()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+
+        me = self.client.get(ME_URL)
+        recipes = self.client.get(RECIPES_URL)
+
+        self.assertEqual(me.status_code, status.HTTP_200_OK)
+        self.assertEqual(me.data['email'], 'test@example.com')
+        self.assertEqual(recipes.status_code, status.HTTP_200_OK)
+
+    def test_update_user_with_bearer_token(self):
+        """Test the deferred user saves every field"""
+        data = self._obtain()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'New Name')
+        self.assertEqual(self.user.email, 'test@example.com')
+        self.assertTrue(self.user.check_password('password'))
+
+    def test_user_deleted_elsewhere(self):
+        """Test tokens of a user deleted by another process are rejected"""
+        data = self._obtain()
+        self.user.delete()
+        tokens.denylist.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+
+        retrieve = self.client.get(ME_URL)
+        update = self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertEqual(retrieve.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(update.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unauthenticated_challenge_unchanged(self):
+        """Test unauthenticated requests are still challenged for a Token"""
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_refresh(self):
+        """Test a refresh token is exchanged once for new tokens"""
+        data = self._obtain()
+
+        res = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+        again = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], data['refresh'])
+        tokens.verify(res.data['access'], tokens.ACCESS)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_refresh(self):
+        """Test only one of two refreshes verified at once gets new tokens"""
+        data = self._obtain()
+
+        with patch.object(
+            tokens.denylist,
+            'is_revoked',
+            side_effect=[False, False, False, True],
+        ):
+            first = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+            second = self.client.post(
+                REFRESH_URL,
+                {'refresh': data['refresh']},
+            )
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('access', second.data)
+
+    def test_refresh_rejects_access_token(self):
+        """Test an access token can't be used to refresh"""
+        data = self._obtain()
+
+        res = self.client.post(REFRESH_URL, {'refresh': data['access']})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_inactive_user(self):
+        """Test inactive users can't refresh their tokens"""
+        data = self._obtain()
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False,
+        )
+
+        res = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke(self):
+        """Test a revoked access token stops authenticating"""
+        data = self._obtain()
+
+        res = self.client.post(REVOKE_URL, {'token': data['access']})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+        me = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(me.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_full_denylist(self):
+        """Test revocations the denylist has no room for are refused"""
+        data = self._obtain()
+
+        with patch.object(tokens.denylist, 'max_size', 0):
+            revoke = self.client.post(REVOKE_URL, {'token': data['access']})
+            refresh = self.client.post(
+                REFRESH_URL,
+                {'refresh': data['refresh']},
+            )
+
+        self.assertEqual(
+            revoke.status_code,
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        self.assertEqual(
+            refresh.status_code,
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        self.assertNotIn('access', refresh.data)
+
+    def test_deactivating_user_revokes_tokens(self):
+        """Test saving an inactive user revokes their signed tokens"""
+        data = self._obtain()
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(data['refresh'])
+
+    def test_tokens_issued_after_revocation(self):
+        """Test revoking a user keeps tokens issued later valid"""
+        with patch('user.tokens.time.time', return_value=time.time() - 5):
+            tokens.denylist.revoke_user(self.user.pk)
+
+        data = self._obtain()
+
+        tokens.verify(data['access'], tokens.ACCESS)
@@ -0,0 +1,182 @@
+"""
+Short lived signed tokens verified without querying the database
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+
+ACCESS = 'a'
+REFRESH = 'r'
+KEY_SALT = 'user.tokens'
+
+SignedToken = namedtuple(
+    'SignedToken',
+    ['kind', 'user_id', 'issued_at', 'expires_at', 'jti'],
+)
+
+
+class InvalidToken(Exception):
+    """Raised for malformed, tampered, expired or revoked tokens"""
+
+
+class DenylistFull(Exception):
+    """Raised when a token can't be revoked without forgetting another"""
+
+
+class Denylist:
+    """Bounded in-process record of revoked tokens
+
+    Revoked tokens are held by id, as integers, until they would have
+    expired anyway. Revoking a user denies every token issued to them
+    until then. Only expired entries are ever dropped, so once max_size
+    unexpired ids are held further revocations fail with DenylistFull.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._tokens = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, token):
+        """Deny the SignedToken token until it expires
+
+        Returns False if the token already was revoked, so of concurrent
+        calls for one token only the first returns True.
+        """
+        jti = int(token.jti, 16)
+        with self._lock:
+            if self.is_revoked(token):
+                return False
+            if len(self._tokens) >= self.max_size:
+                self._prune(time.time())
+            if len(self._tokens) >= self.max_size:
+                raise DenylistFull(
+                    f'{self.max_size} revoked tokens have not expired yet'
+                )
+            self._tokens[jti] = token.expires_at
+
+        return True
+
+    def revoke_user(self, user_id):
+        """Deny the tokens issued to user_id so far"""
+        now = int(time.time())
+        with self._lock:
+            self._users[user_id] = now
+            if len(self._users) > self.max_size:
+                self._prune(now)
+
+    def is_revoked(self, token):
+        """Return if the SignedToken token was revoked"""
+        revoked_at = self._users.get(token.user_id)
+        if revoked_at is not None and token.issued_at <= revoked_at:
+            return True
+
+        return int(token.jti, 16) in self._tokens
+
+    def clear(self):
+        """Forget every revocation"""
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+    def __len__(self):
+        return len(self._tokens) + len(self._users)
+
+    def _prune(self, now):
+        """Drop the revocations of tokens that have expired"""
+        self._tokens = {
+            jti: expires_at for jti, expires_at in self._tokens.items()
+            if expires_at > now
+        }
+        oldest = now - max(lifetime(ACCESS), lifetime(REFRESH))
+        self._users = {
+            user_id: revoked_at for user_id, revoked_at in self._users.items()
+            if revoked_at >= oldest
+        }
+
+
+denylist = Denylist(max_size=settings.SIGNED_TOKENS['DENYLIST_MAX_SIZE'])
+
+
+def lifetime(kind):
+    """Return the lifetime in seconds of tokens of kind"""
+    if kind == ACCESS:
+        return settings.SIGNED_TOKENS['ACCESS_TTL']
+
+    return settings.SIGNED_TOKENS['REFRESH_TTL']
+
+
+@lru_cache(maxsize=4)
+def _signing_key(secret_key):
+    """Return the HMAC key derived from secret_key like salted_hmac does"""
+    return hashlib.sha256(f'{KEY_SALT}{secret_key}'.encode()).digest()
+
+
+def _signature(payload):
+    """Return the HMAC of payload, keyed with the SECRET_KEY"""
+    digest = hmac.digest(
+        _signing_key(settings.SECRET_KEY),
+        payload.encode(),
+        'sha256',
+    )
+
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def issue(user_id, kind):
+    """Return a new token of kind for user_id"""
+    issued_at = int(time.time())
+    payload = '.'.join([
+        kind,
+        str(user_id),
+        str(issued_at),
+        str(issued_at + lifetime(kind)),
+        secrets.token_hex(8),
+    ])
+
+    return f'{payload}.{_signature(payload)}'
+
+
+def issue_pair(user_id):
+    """Return a new access and refresh token for user_id"""
+    return {
+        'access': issue(user_id, ACCESS),
+        'refresh': issue(user_id, REFRESH),
+        'expires_in': lifetime(ACCESS),
+    }
+
+
+def verify(token, kind=None):
+    """Return the SignedToken of a valid token of kind, else raise"""
+    payload, _, signature = token.rpartition('.')
+    if not hmac.compare_digest(
+        signature.encode(),
+        _signature(payload).encode(),
+    ):
+        raise InvalidToken('Invalid token.')
+
+    token_kind, user_id, issued_at, expires_at, jti = payload.split('.')
+    signed_token = SignedToken(
+        token_kind,
+        int(user_id),
+        int(issued_at),
+        int(expires_at),
+        jti,
+    )
+    if kind is not None and signed_token.kind != kind:
+        raise InvalidToken('Invalid token type.')
+    if signed_token.expires_at <= time.time():
+        raise InvalidToken('Token has expired.')
+    if denylist.is_revoked(signed_token):
+        raise InvalidToken('Token has been revoked.')
+
+    return signed_token
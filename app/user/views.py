@@ -3,39 +3,133 @@ Views for the User API
 """
 from rest_framework import (
     generics,
-    authentication,
     permissions,
     status,
 )
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import ValidationError
 from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core import jobs
+from core.db.routers import stick_to_primary
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
     ProfileImageSerialzer,
+    RefreshTokenSerializer,
+    RevokeTokenSerializer,
+    SignedTokenSerializer,
 )
 
 from drf_spectacular.utils import extend_schema
 
 
+def denylist_full_response():
+    """Return the response to revocations the denylist has no room for"""
+    return Response(
+        {'detail': 'Too many revoked tokens, try again later.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
 
+    def perform_create(self, serializer):
+        """Create the user, reading it from the primary for a while"""
+        user = serializer.save()
+        stick_to_primary(user.pk)
+
 
 class CreateTokenView(ObtainAuthToken):
     """Create auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+        stick_to_primary(user.pk)
+
+        return Response({'token': token.key})
+
+
+class CreateSignedTokenView(generics.GenericAPIView):
+    """Create short lived signed access and refresh tokens for user"""
+    serializer_class = AuthTokenSerializer
+
+    @extend_schema(responses={200: SignedTokenSerializer})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        stick_to_primary(user.pk)
+
+        return Response(tokens.issue_pair(user.pk))
+
+
+class RefreshSignedTokenView(generics.GenericAPIView):
+    """Exchange a refresh token for new signed tokens"""
+    serializer_class = RefreshTokenSerializer
+
+    @extend_schema(responses={200: SignedTokenSerializer})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = serializer.validated_data['token']
+        try:
+            revoked = tokens.denylist.revoke(token)
+        except tokens.DenylistFull:
+            return denylist_full_response()
+        if not revoked:
+            raise ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        'Token has been revoked.',
+                    ],
+                },
+                code='authorization',
+            )
+        user = serializer.validated_data['user']
+        stick_to_primary(user.pk)
+
+        return Response(tokens.issue_pair(user.pk))
+
+
+class RevokeSignedTokenView(generics.GenericAPIView):
+    """Revoke a signed access or refresh token"""
+    serializer_class = RevokeTokenSerializer
+
+    @extend_schema(responses={204: None})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            tokens.denylist.revoke(serializer.validated_data['token'])
+        except tokens.DenylistFull:
+            return denylist_full_response()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -45,7 +139,10 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
 
 class UploadUserImageView(APIView):
     """Upload profile image for authenticated user"""
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
@@ -55,6 +152,7 @@ class UploadUserImageView(APIView):
     )
     def post(self, request):
         user = request.user
+        old_image = user.profile_image.name
         serializer = ProfileImageSerialzer(
             user,
             data=request.data,
@@ -63,6 +161,8 @@ class UploadUserImageView(APIView):
 
         if serializer.is_valid():
             serializer.save()
+            if old_image:
+                jobs.enqueue('user.release_profile_image', {'name': old_image})
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)